@@ -1,13 +1,27 @@
 import os
 import json
-from flask import Flask, request, jsonify
+import gzip
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
 # Import our engines
 from recommendation_engine import HelplineRecommender
 from emergency_classifier import EmergencyNLPModel
 from geo_engine import GeoLocationService
-from routing_engine import RoutingEngine
+from routing_engine import RoutingEngine, MAX_ISOCHRONE_MINUTES
+from geojson_utils import (
+    to_geojson_feature, to_geojson_collection, clamp_precision,
+    compact_geometry, encode_polyline, dumps_compact
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
@@ -15,25 +29,52 @@ CORS(app)  # Enable CORS for React frontend
 # --- Initialization ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# 1. Initialize Recommender
-recommender = HelplineRecommender(os.path.join(BASE_DIR, 'helplines.json'))
+# 1. Initialize Routing Engine (shared travel-time core for ranking)
+routing_engine = RoutingEngine()
+
+# 2. Initialize Recommender
+recommender = HelplineRecommender(os.path.join(BASE_DIR, 'helplines.json'), routing_engine=routing_engine)
 
-# 2. Initialize and Train Classifier
+# 3. Initialize and Train Classifier
 classifier = EmergencyNLPModel()
 
-# 3. Initialize Geo Service
-geo_service = GeoLocationService()
-
-# 4. Initialize Routing Engine
-routing_engine = RoutingEngine()
+# 4. Initialize Geo Service
+geo_service = GeoLocationService(routing_engine=routing_engine)
 
 # 5. Initialize Risk Engine
 from risk_engine import RiskEngine
-risk_engine = RiskEngine()
+# Optional zones file (JSON list / GeoJSON FeatureCollection), reloaded when it changes
+risk_engine = RiskEngine(zones_path=os.environ.get('RISK_ZONES_FILE'))
+risk_engine.zone_store.start()
 
 # 6. Initialize Heatmap Engine
-from heatmap_engine import HeatmapEngine
-heatmap_engine = HeatmapEngine()
+from heatmap_engine import HeatmapEngine, MAX_TILE_ZOOM, parse_window
+# Optional bulk incident CSV (lat, lon, type, intensity, timestamp)
+heatmap_engine = HeatmapEngine(incidents_csv=os.environ.get('INCIDENTS_CSV'))
+
+# Hotspot detection runs off the request path: ingestion marks it dirty and a
+# background thread recomputes, so requests only read the published results
+HOTSPOT_REFRESH_SECONDS = 60  # Also catches the hourly window slide and expiry without new reports
+hotspots_dirty = threading.Event()
+latest_hotspots = []
+
+def refresh_hotspots():
+    """Recomputes incident hotspots and publishes them as risk zones."""
+    global latest_hotspots
+    latest_hotspots = heatmap_engine.get_hotspots()
+    return risk_engine.sync_hotspots(latest_hotspots)
+
+def hotspot_refresher():
+    while True:
+        hotspots_dirty.wait(timeout=HOTSPOT_REFRESH_SECONDS)
+        hotspots_dirty.clear()
+        try:
+            refresh_hotspots()
+        except Exception as e:
+            print(f"⚠️ Hotspot refresh failed: {e}")
+
+refresh_hotspots()
+threading.Thread(target=hotspot_refresher, name="hotspot-refresh", daemon=True).start()
 
 def prepare_and_train_classifier():
     """
@@ -156,6 +197,7 @@ def recommend_helplines():
             "category": rec['helpline']['category'],
             "recommendation_score": round(rec['score'], 2),
             "distance_km": rec['distance_km'],
+            "eta_minutes": rec['eta_minutes'],
             "explanation_text": rec['reason']
         })
 
@@ -198,19 +240,58 @@ def verify_firebase_token(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
-# --- GeoJSON Helpers ---
-def to_geojson_feature(geometry, properties):
-    return {
-        "type": "Feature",
-        "geometry": geometry,
-        "properties": properties
-    }
+# --- Compact Output & Compression ---
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = 512
+# Each encoding of a body is a different representation, so it gets its own strong ETag
+ETAG_ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
 
-def to_geojson_collection(features):
-    return {
-        "type": "FeatureCollection",
-        "features": features
-    }
+def get_output_options(data):
+    """
+    Opt-in compact mode for low-bandwidth clients.
+    Input: { "compact": true, "precision": 5 } (or ?compact=1&precision=5)
+    """
+    data = data or {}
+    compact = data.get('compact', request.args.get('compact', False))
+    if isinstance(compact, str):
+        compact = compact.lower() in ('1', 'true', 'yes')
+    precision = clamp_precision(data.get('precision', request.args.get('precision')))
+    return bool(compact), precision
+
+def geo_response(payload, compact):
+    """Compact mode skips the pretty-printing Flask applies in debug mode."""
+    if compact:
+        return Response(dumps_compact(payload), mimetype='application/json')
+    return jsonify(payload)
+
+@app.after_request
+def compress_response(response):
+    """Brotli/gzip-encodes JSON and binary tile responses when the client advertises support."""
+    accept = request.headers.get('Accept-Encoding', '').lower()
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in ('application/json', 'application/octet-stream')):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if HAS_BROTLI and 'br' in accept:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accept:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + ETAG_ENCODING_SUFFIXES[response.headers['Content-Encoding']])
+    response.headers['Content-Length'] = len(response.get_data())
+    response.vary.add('Accept-Encoding')
+    return response
 
 # --- Endpoints ---
 
@@ -234,16 +315,18 @@ def get_nearby_services():
     except ValueError:
         return jsonify({"error": "Invalid coordinates"}), 400
 
+    compact, precision = get_output_options(data)
     raw_results = geo_service.find_nearby_services(lat, lon)
     
     # Convert to GeoJSON
     features = []
     for category, details in raw_results.items():
+        geometry = {
+            "type": "Point",
+            "coordinates": [details['coordinates']['lon'], details['coordinates']['lat']]
+        }
         feature = to_geojson_feature(
-            geometry={
-                "type": "Point",
-                "coordinates": [details['coordinates']['lon'], details['coordinates']['lat']]
-            },
+            geometry=compact_geometry(geometry, precision) if compact else geometry,
             properties={
                 "type": category,
                 "name": details['name'],
@@ -255,7 +338,7 @@ def get_nearby_services():
         )
         features.append(feature)
         
-    return jsonify(to_geojson_collection(features))
+    return geo_response(to_geojson_collection(features), compact)
 
 @app.route('/route', methods=['POST'])
 @verify_firebase_token
@@ -263,8 +346,11 @@ def get_route():
     """
     Endpoint to get emergency route.
     Returns GeoJSON LineString.
+    In compact mode the geometry is sent as an encoded polyline string in
+    properties.encoded_polyline ([lat, lon] order, at properties.precision).
     """
     data = request.json
+    compact, precision = get_output_options(data)
     try:
         route = routing_engine.calculate_route(
             start_lat=float(data['start_lat']),
@@ -274,32 +360,80 @@ def get_route():
             mode=data.get('mode', 'driving')
         )
         
-        # Convert polyline [[lat, lon], ...] to GeoJSON coordinates [[lon, lat], ...]
-        geojson_coords = [[p[1], p[0]] for p in route['polyline']]
-        
-        feature = to_geojson_feature(
-            geometry={
-                "type": "LineString",
-                "coordinates": geojson_coords
-            },
-            properties={
-                "mode": route['mode'],
-                "total_distance": route['total_distance'],
-                "total_time": route['total_time'],
-                "instructions": route['instructions_array']
-            }
-        )
+        properties = {
+            "mode": route['mode'],
+            "total_distance": route['total_distance'],
+            "total_time": route['total_time'],
+            "instructions": route['instructions_array'],
+            # Risk zones the route passes through, with entry/exit distance (km)
+            "risks": risk_engine.risks_along_path(route['polyline'])
+        }
+
+        if compact:
+            properties["encoded_polyline"] = encode_polyline(route['polyline'], precision)
+            properties["precision"] = precision
+            feature = to_geojson_feature(geometry=None, properties=properties)
+        else:
+            # Convert polyline [[lat, lon], ...] to GeoJSON coordinates [[lon, lat], ...]
+            geojson_coords = [[p[1], p[0]] for p in route['polyline']]
+            feature = to_geojson_feature(
+                geometry={
+                    "type": "LineString",
+                    "coordinates": geojson_coords
+                },
+                properties=properties
+            )
         
-        return jsonify(feature)
+        return geo_response(feature, compact)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+@app.route('/coverage', methods=['POST'])
+@verify_firebase_token
+def get_coverage():
+    """
+    Endpoint for responder coverage (isochrones).
+    Input: { "type": "hospital" (optional, all types if omitted),
+             "facility_id": "h1" (optional), "thresholds": [5, 10, 15], "mode": "ambulance" }
+    Returns GeoJSON FeatureCollection of Polygons labelled with facility and minutes.
+    """
+    data = request.json or {}
+    compact, precision = get_output_options(data)
+    mode = data.get('mode', 'ambulance')
+
+    try:
+        thresholds = [float(t) for t in data.get('thresholds', [5, 10, 15])]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid thresholds"}), 400
+    if not thresholds or min(thresholds) <= 0 or max(thresholds) > MAX_ISOCHRONE_MINUTES:
+        return jsonify({"error": f"Thresholds must be between 0 and {MAX_ISOCHRONE_MINUTES} minutes"}), 400
+
+    places = geo_service.places_db
+    if data.get('facility_id'):
+        places = [p for p in places if p['id'] == data['facility_id']]
+        if not places:
+            return jsonify({"error": "Unknown facility"}), 404
+    facility_types = [data['type']] if data.get('type') else None
+
+    layer = routing_engine.coverage_layer(places, facility_types=facility_types, thresholds=thresholds, mode=mode)
+
+    features = []
+    for collection in layer.values():
+        for feature in collection['features']:
+            if compact:
+                feature = to_geojson_feature(compact_geometry(feature['geometry'], precision), feature['properties'])
+            features.append(feature)
+
+    return geo_response(to_geojson_collection(features), compact)
+
 @app.route('/heatmap', methods=['POST'])
 @verify_firebase_token
 def get_heatmap_data():
     """
     Endpoint to get heatmap data.
-    Returns GeoJSON FeatureCollection of Points with intensity.
+    Optional "window" ("1h", "24h", "7d" or seconds) limits it to recent reports.
+    Returns GeoJSON FeatureCollection of Points with intensity; "synthetic": true
+    means no reports have been ingested yet and the points are demo data.
     """
     data = request.json
     lat = data.get('lat')
@@ -314,30 +448,87 @@ def get_heatmap_data():
     except ValueError:
         return jsonify({"error": "Invalid coordinates"}), 400
 
-    points = heatmap_engine.generate_heatmap_data(lat, lon)
+    try:
+        window_seconds = parse_window(data.get('window'))
+    except ValueError:
+        return jsonify({"error": "Invalid window"}), 400
+
+    compact, precision = get_output_options(data)
+    points = heatmap_engine.generate_heatmap_data(lat, lon, window_seconds=window_seconds)
     
     features = []
     for p in points:
+        if compact:
+            geometry = {"type": "Point", "coordinates": [round(p['lon'], precision), round(p['lat'], precision)]}
+            properties = {"intensity": round(p['intensity'], 2), "type": p['type'], "timestamp": int(p['timestamp'])}
+        else:
+            geometry = {"type": "Point", "coordinates": [p['lon'], p['lat']]}
+            properties = {"intensity": p['intensity'], "type": p['type'], "timestamp": p['timestamp']}
+        if 'count' in p:
+            properties["count"] = p['count']
+        features.append(to_geojson_feature(geometry=geometry, properties=properties))
+        
+    collection = to_geojson_collection(features)
+    # Demo points (nothing ingested yet) must never pass for real reports
+    collection["synthetic"] = any(p.get('synthetic') for p in points)
+    return geo_response(collection, compact)
+
+@app.route('/heatmap/tiles/<int:z>/<int:x>/<int:y>.bin', methods=['GET'])
+@verify_firebase_token
+def get_heatmap_tile(z, x, y):
+    """
+    Endpoint for binary heatmap tiles (Web Mercator z/x/y).
+    Optional ?type=fire filters by crisis type.
+    Returns packed uint16 intensities (see TilePyramid.get_tile), 204 if the tile is empty.
+    """
+    if z < 0 or z > MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Invalid tile"}), 400
+
+    payload, etag = heatmap_engine.get_tile(z, x, y, request.args.get('type'))
+    if payload is None:
+        return Response(status=204)
+
+    # The client may hold any encoding of the tile (compress_response suffixes its ETag)
+    variants = [etag] + [etag + suffix for suffix in ETAG_ENCODING_SUFFIXES.values()]
+    matched = next((tag for tag in variants if tag in request.if_none_match), None)
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = Response(payload, mimetype='application/octet-stream')
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@app.route('/heatmap/hotspots', methods=['GET'])
+@verify_firebase_token
+def get_heatmap_hotspots():
+    """
+    Endpoint for the hotspot layer: statistically significant clusters of
+    reports from the last 24 hours (Getis-Ord Gi*).
+    Returns GeoJSON FeatureCollection of zone Polygons with hotspot properties.
+    """
+    compact, precision = get_output_options(None)
+
+    features = []
+    for hotspot in latest_hotspots:
+        geometry = risk_engine.get_zone_geometry(hotspot['id'])
+        if geometry is None:
+            # Not yet in the published zone snapshot: fall back to the centre point
+            geometry = {"type": "Point", "coordinates": [hotspot['lon'], hotspot['lat']]}
         features.append(to_geojson_feature(
-            geometry={
-                "type": "Point",
-                "coordinates": [p['lon'], p['lat']]
-            },
-            properties={
-                "intensity": p['intensity'],
-                "type": p['type'],
-                "timestamp": p['timestamp']
-            }
+            geometry=compact_geometry(geometry, precision) if compact else geometry,
+            properties={k: v for k, v in hotspot.items() if k not in ('lat', 'lon')}
         ))
-        
-    return jsonify(to_geojson_collection(features))
+
+    return geo_response(to_geojson_collection(features), compact)
 
 @app.route('/alerts', methods=['POST'])
 @verify_firebase_token
 def get_alerts():
     """
     Endpoint to check risk zones.
-    Returns GeoJSON FeatureCollection of Polygons/Points (Zones).
+    Returns GeoJSON FeatureCollection of zone Polygons/MultiPolygons.
     """
     data = request.json
     lat = data.get('lat')
@@ -352,20 +543,40 @@ def get_alerts():
     except ValueError:
         return jsonify({"error": "Invalid coordinates"}), 400
 
+    compact, precision = get_output_options(data)
     alerts = risk_engine.check_risks(lat, lon)
     
     features = []
     for alert in alerts:
-        # Mocking a circle polygon or just a point for the zone center
+        # Zone outline (circular zones come back as a polygon approximation)
+        geometry = risk_engine.get_zone_geometry(alert['zone_id'])
         features.append(to_geojson_feature(
-            geometry={
-                "type": "Point",
-                "coordinates": [lon, lat] # Simplified: Alert at user location or zone center
-            },
+            geometry=compact_geometry(geometry, precision) if compact else geometry,
             properties=alert
         ))
         
-    return jsonify(to_geojson_collection(features))
+    return geo_response(to_geojson_collection(features), compact)
+
+@app.route('/zones', methods=['POST'])
+@verify_firebase_token
+def update_zones():
+    """
+    Endpoint to push risk zone updates (e.g. during floods).
+    Input: { "add": [zone, ...], "modify": [{"id": "z1", ...}], "expire": ["z2", {"id": "z3", "at": "2025-07-01T18:00:00Z"}],
+             "remove": ["z4"] }
+    Zones are validated first; an invalid update is rejected whole (400).
+    The spatial index is rebuilt in the background; alerts switch over within seconds.
+    """
+    data = request.json or {}
+    if not any(key in data for key in ('add', 'modify', 'expire', 'remove')):
+        return jsonify({"error": "Expected add, modify, expire or remove"}), 400
+
+    try:
+        version = risk_engine.zone_store.apply_delta(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid zone update: {e}"}), 400
+
+    return jsonify({"status": "accepted", "version": version})
 
 @app.route('/helplines', methods=['GET'])
 def get_all_helplines():
@@ -376,12 +587,22 @@ def get_all_helplines():
 def submit_feedback():
     """
     Endpoint to collect user feedback for RLHF (Reinforcement Learning from Human Feedback).
-    Input: { "message": "...", "selected_helpline": "...", "rating": 5 }
+    Input: { "message": "...", "selected_helpline": "...", "rating": 5, "lat": ..., "lon": ... }
+    Located feedback is also recorded as an incident report for the heatmap.
     """
     data = request.json
     # In a real app, save this to a database (Firebase/SQL)
     # For now, we'll just log it
     print(f"📝 FEEDBACK RECEIVED: {json.dumps(data)}")
+
+    try:
+        if data.get('message') and data.get('lat') is not None and data.get('lon') is not None:
+            prediction = classifier.predict(data['message'])
+            heatmap_engine.ingest(float(data['lat']), float(data['lon']), prediction['label'],
+                                  intensity=prediction['confidence'])
+            hotspots_dirty.set()
+    except (TypeError, ValueError) as e:
+        print(f"⚠️ Feedback location ignored: {e}")
     
     return jsonify({
         "status": "success",
@@ -389,11 +610,14 @@ def submit_feedback():
     })
 
 # 7. Initialize Audio Engine
-from audio_engine import AudioEngine
+from audio_engine import AudioEngine, decode_audio
 audio_engine = None
 try:
     # Initialize with a small model for speed on CPU
-    audio_engine = AudioEngine(model_size="tiny", device="cpu")
+    # WHISPER_WORKERS > 0 moves inference into a pool of worker processes
+    audio_engine = AudioEngine(model_size="tiny", device="cpu",
+                               workers=int(os.environ.get('WHISPER_WORKERS', 0)),
+                               timeout=float(os.environ.get('WHISPER_TIMEOUT', 30)))
 except Exception as e:
     print(f"⚠️ Audio Engine failed to load (Check dependencies): {e}")
 
@@ -405,16 +629,105 @@ conversation_engine = ConversationEngine(classifier, recommender)
 from emotion_engine import EmotionEngine
 emotion_engine = None
 try:
-    emotion_engine = EmotionEngine()
+    emotion_engine = EmotionEngine(mode=os.environ.get('EMOTION_MODE', 'full'))  # "int8": quantized, "lite": prosody features only
 except Exception as e:
     print(f"⚠️ Emotion Engine failed to load: {e}")
 
+# 10. Initialize Translation Engine (persistent cache; reply templates pre-translated in the background)
+from translation_engine import TranslationEngine
+translation_engine = TranslationEngine(cache_path=os.environ.get('TRANSLATION_CACHE'),
+                                       timeout=float(os.environ.get('TRANSLATE_TIMEOUT', 2)))
+
+# Local language identification for lang='auto' (no translator round trip)
+from language_detector import LanguageDetector
+language_detector = LanguageDetector()
+
 # 11. Initialize TTS Engine
 from tts_engine import TTSEngine
-tts_engine = TTSEngine()
+tts_engine = TTSEngine(cache_dir=os.environ.get('TTS_CACHE_DIR'))
+
+def warm_up_replies():
+    """
+    Deploy-time warm-up: pre-translate every reply template into all
+    supported languages, then (TTS_WARMUP=1) pre-render each one at every
+    urgency tier so templated replies need no synthesis.
+    """
+    templates = conversation_engine.response_templates()
+    translation_engine.precompute(templates)
+    if os.environ.get('TTS_WARMUP') != '1':
+        return
+    replies = {}
+    for lang in translation_engine.supported_languages:
+        translations = [translation_engine.translate(t, target_lang=lang, source_lang='en') for t in templates]
+        # Only exact cached translations: those are the texts replies will carry
+        replies[lang] = [t['translated_text'] for t in translations if t['cached']]
+    tts_engine.warm_up_sync(replies)
+
+threading.Thread(target=warm_up_replies, name="reply-warmup", daemon=True).start()
 
 # --- Voice Assistant Endpoint ---
 
+# Streaming uploads are read in 100 ms pieces (16-bit mono 16 kHz PCM)
+STREAM_CHUNK_BYTES = 3200
+MAX_STREAM_SECONDS = 120                         # Longest utterance one stream may send
+MAX_STREAM_BYTES = MAX_STREAM_SECONDS * 16000 * 2  # 16-bit mono 16 kHz PCM
+
+# Independent audio stages (transcription, emotion) run side by side on the shared buffer.
+# Both spend their time in native code that releases the GIL, so threads are enough.
+STAGE_TIMEOUTS = {
+    "transcription": float(os.environ.get('TRANSCRIBE_TIMEOUT', 30)),
+    "emotion": float(os.environ.get('EMOTION_TIMEOUT', 2))
+}
+STAGE_CONCURRENCY = int(os.environ.get('STAGE_CONCURRENCY', 4))  # In-flight calls per stage
+NEUTRAL_EMOTION = {"primary_emotion": "neutral", "scores": {}}
+stage_executor = ThreadPoolExecutor(max_workers=STAGE_CONCURRENCY * len(STAGE_TIMEOUTS),
+                                    thread_name_prefix='voice-stage')
+stage_slots = {name: threading.BoundedSemaphore(STAGE_CONCURRENCY) for name in STAGE_TIMEOUTS}
+
+def run_stages(stages):
+    """
+    Runs independent pipeline stages concurrently.
+    stages: {name: (fn, args, fallback)}. Each stage has STAGE_TIMEOUTS[name]
+    seconds from the common start; a stage that times out, raises, or finds
+    all its slots busy (earlier calls still stuck) yields its fallback
+    instead of holding up the response.
+    Returns (results, timings_ms).
+    """
+    start = time.perf_counter()
+    futures, results, timings, finished = {}, {}, {}, {}
+
+    def timed(name, fn, args):
+        try:
+            return fn(*args)
+        finally:
+            finished[name] = round((time.perf_counter() - start) * 1000, 1)
+            stage_slots[name].release()
+
+    for name, (fn, args, fallback) in stages.items():
+        if stage_slots[name].acquire(blocking=False):
+            futures[name] = stage_executor.submit(timed, name, fn, args)
+        else:
+            print(f"⚠️ Stage '{name}' saturated, using fallback")
+            results[name] = fallback
+
+    for name, future in futures.items():
+        fallback = stages[name][2]
+        remaining = STAGE_TIMEOUTS[name] - (time.perf_counter() - start)
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+            timings[name] = finished.get(name)
+        except FutureTimeout:
+            # The call keeps its slot until it finishes; the request moves on
+            print(f"⚠️ Stage '{name}' timed out after {STAGE_TIMEOUTS[name]}s, using fallback")
+            results[name] = fallback
+            timings[name] = None
+        except Exception as e:
+            timings[name] = finished.get(name)
+            print(f"⚠️ Stage '{name}' failed: {e}")
+            results[name] = fallback
+
+    return results, timings
+
 @app.route('/voice-assist', methods=['POST'])
 @verify_firebase_token
 def voice_assistant():
@@ -426,39 +739,40 @@ def voice_assistant():
     lang = 'en'
     user_lat = None
     user_lon = None
-    emotion_data = {"primary_emotion": "neutral", "scores": {}}
+    emotion_data = NEUTRAL_EMOTION
+    stage_timings = None
+    spoken_lang, spoken_confidence = None, 0.0
 
     # Handle Multipart (Audio + Text)
     if request.content_type and request.content_type.startswith('multipart/form-data'):
         lang = request.form.get('lang', 'en')
-        user_lat = request.form.get('lat')
-        user_lon = request.form.get('lon')
+        user_lat = request.form.get('lat', type=float)
+        user_lon = request.form.get('lon', type=float)
         text = request.form.get('text', '') # Fallback text from frontend
 
         if 'audio' in request.files and audio_engine:
-            file = request.files['audio']
-            temp_filename = f"temp_{os.urandom(4).hex()}.wav"
-            temp_path = os.path.join(BASE_DIR, temp_filename)
             try:
-                file.save(temp_path)
+                # Decode the upload once, in memory; both stages share the buffer
+                samples = decode_audio(request.files['audio'].read())
                 
-                # 1. Transcribe
-                result = audio_engine.transcribe(temp_path)
+                # 1. Transcribe and 2. Detect Emotion (if engine loaded), concurrently
+                stages = {"transcription": (audio_engine.transcribe, (samples,), {"error": "Transcription timed out"})}
+                if emotion_engine:
+                    stages["emotion"] = (emotion_engine.detect_emotion, (samples,), NEUTRAL_EMOTION)
+                results, stage_timings = run_stages(stages)
+                emotion_data = results.get("emotion", NEUTRAL_EMOTION)
+
+                result = results["transcription"]
                 if "error" not in result:
                     text = result['text'] # Override fallback text if successful
+                    spoken_lang = result.get('language')
+                    spoken_confidence = result.get('language_probability', 0.0)
                     print(f"🎙️ Transcribed: {text}")
                 else:
                     print(f"⚠️ Transcription failed, using fallback text: {result['error']}")
-                
-                # 2. Detect Emotion (if engine loaded)
-                if emotion_engine:
-                    emotion_data = emotion_engine.detect_emotion(temp_path)
                     
             except Exception as e:
                 print(f"⚠️ Audio processing error: {e}")
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
     else:
         # Handle JSON (Text only)
         data = request.json
@@ -469,14 +783,32 @@ def voice_assistant():
 
     if not text:
         return jsonify({"error": "No speech detected"}), 400
-    # 3. Translate to English (if needed)
+
+    final_response = build_voice_response(text, lang, user_lat, user_lon, emotion_data,
+                                          spoken_lang=spoken_lang, spoken_confidence=spoken_confidence)
+    if stage_timings is not None:
+        final_response["stage_timings"] = stage_timings
+    return jsonify(final_response)
+
+def build_voice_response(text, lang, user_lat, user_lon, emotion_data, spoken_lang=None, spoken_confidence=0.0):
+    """
+    Shared tail of the voice endpoints: identify the language, translate,
+    classify, adjust urgency, record the incident, translate back and
+    synthesize the reply. spoken_lang is Whisper's language guess, if any.
+    """
+    # 3. Identify the language in-process ('auto'), then translate to English only if needed
+    detection = None
     detected_lang = lang
-    if lang == 'auto' or lang != 'en':
-        translation = translation_engine.translate(text, target_lang='en')
+    if lang == 'auto':
+        detection = language_detector.detect(text, hint=spoken_lang, hint_confidence=spoken_confidence)
+        detected_lang = detection['lang']
+
+    english_text = text
+    if detected_lang != 'en' and not conversation_engine.is_routable(text):
+        # Romanized input goes out as 'auto': the translator handles transliteration
+        source_lang = 'auto' if detection and detection['script'] != 'native' else detected_lang
+        translation = translation_engine.translate(text, target_lang='en', source_lang=source_lang)
         english_text = translation['translated_text']
-        detected_lang = translation['src_lang']
-    else:
-        english_text = text
 
     # 4. Crisis Classification & Response Generation
     response_data = conversation_engine.process_query(english_text, user_lat, user_lon)
@@ -487,12 +819,22 @@ def voice_assistant():
         # Regenerate response if urgency changed significantly? 
         # For now, we keep the text response but the TTS will pick up the new urgency score.
 
+    # Record located emergencies as incident reports for the heatmap
+    if response_data['intent'] != 'unknown' and user_lat is not None and user_lon is not None:
+        try:
+            heatmap_engine.ingest(float(user_lat), float(user_lon), response_data['intent'],
+                                  intensity=max(response_data['urgency'], 0.3))
+            hotspots_dirty.set()
+        except (TypeError, ValueError):
+            pass
+
     # 5. Translate Response back to User's Language
     spoken_reply_en = response_data['response']
     spoken_reply_final = spoken_reply_en
     
     if detected_lang != 'en':
-        reply_trans = translation_engine.translate(spoken_reply_en, target_lang=detected_lang)
+        # Template sentences are cached, so this is a local lookup
+        reply_trans = translation_engine.translate(spoken_reply_en, target_lang=detected_lang, source_lang='en')
         spoken_reply_final = reply_trans['translated_text']
 
     # 6. Generate TTS Audio (with urgency tone)
@@ -513,10 +855,77 @@ def voice_assistant():
         "audio_base64": audio_base64,
         "original_text": text,
         "translated_text": english_text,
-        "detected_lang": detected_lang
+        "detected_lang": detected_lang,
+        "language_detection": detection
     }
 
-    return jsonify(final_response)
+    return final_response
+
+@app.route('/voice-assist/stream', methods=['POST'])
+@verify_firebase_token
+def voice_assistant_stream():
+    """
+    Streaming Voice Assistant.
+    Body: raw 16-bit little-endian mono 16 kHz PCM, sent with chunked transfer
+    encoding while the user speaks. Query: ?lang=en&lat=..&lon=..
+    Returns newline-delimited JSON events as they happen:
+      {"event": "partial", "text": ..., "segment": {...}}   after each speech segment
+      {"event": "early_intent", ...}                        first time an emergency keyword is heard
+      {"event": "truncated", "max_seconds": ...}            audio past MAX_STREAM_SECONDS was ignored
+      {"event": "final", ...}                               the full /voice-assist response
+    """
+    if not audio_engine:
+        return jsonify({"error": "Audio engine unavailable"}), 503
+    if request.content_length and request.content_length > MAX_STREAM_BYTES:
+        return jsonify({"error": f"Audio longer than {MAX_STREAM_SECONDS} seconds"}), 413
+
+    lang = request.args.get('lang', 'en')
+    user_lat = request.args.get('lat', type=float)
+    user_lon = request.args.get('lon', type=float)
+    stream = request.stream
+
+    def events():
+        session = audio_engine.stream(language=None if lang == 'auto' else lang)
+        early_sent = False
+
+        def on_segments(segments):
+            nonlocal early_sent
+            for segment in segments:
+                yield json.dumps({"event": "partial", "text": session.text, "segment": segment}) + "\n"
+            # Classify as soon as an emergency keyword shows up in the partial transcript
+            if segments and not early_sent and lang in ('en', 'auto'):
+                keywords = conversation_engine.find_emergency_keywords(session.text)
+                if keywords:
+                    early_sent = True
+                    early = conversation_engine.process_query(session.text, user_lat, user_lon)
+                    yield json.dumps({"event": "early_intent", "keywords": keywords, **early}) + "\n"
+
+        received = 0
+        while True:
+            if received >= MAX_STREAM_BYTES:
+                # Chunked uploads have no length up front: end the utterance here
+                if stream.read(1):
+                    yield json.dumps({"event": "truncated", "max_seconds": MAX_STREAM_SECONDS}) + "\n"
+                break
+            chunk = stream.read(min(STREAM_CHUNK_BYTES, MAX_STREAM_BYTES - received))
+            if not chunk:
+                break
+            received += len(chunk)
+            yield from on_segments(session.feed(chunk))
+        yield from on_segments(session.finish())
+
+        if not session.text:
+            yield json.dumps({"event": "error", "error": "No speech detected"}) + "\n"
+            return
+
+        emotion_data = NEUTRAL_EMOTION
+        if emotion_engine:
+            results, _ = run_stages({"emotion": (emotion_engine.detect_emotion, (session.samples,), NEUTRAL_EMOTION)})
+            emotion_data = results["emotion"]
+        result = build_voice_response(session.text, lang, user_lat, user_lon, emotion_data)
+        yield json.dumps({"event": "final", **result}) + "\n"
+
+    return Response(stream_with_context(events()), mimetype='application/x-ndjson')
 
 
 
@@ -540,7 +949,12 @@ def send_sms():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "online", "model_vocab_size": len(classifier.vocab)})
+    status = {"status": "online", "model_vocab_size": len(classifier.vocab)}
+    if audio_engine and audio_engine.stats():
+        status["transcription"] = audio_engine.stats()
+    status["translation"] = translation_engine.stats()
+    status["tts_cache"] = tts_engine.cache.stats()
+    return jsonify(status)
 
 @app.route('/news', methods=['GET'])
 def get_crime_news():
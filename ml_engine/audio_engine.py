@@ -1,10 +1,12 @@
+import io
 import os
 import time
 import logging
+from collections import deque
 import speech_recognition as sr
 from pydub import AudioSegment
 import numpy as np
-from better_profanity import profanity
+from keyword_matcher import KeywordMatcher
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,23 +20,274 @@ except ImportError:
     HAS_WHISPER = False
     logger.warning("⚠️ faster-whisper not found. Using Google Speech Recognition as fallback.")
 
-# Try to import noisereduce
-try:
-    import noisereduce as nr
-    HAS_NOISEREDUCE = True
-except ImportError:
-    HAS_NOISEREDUCE = False
-    logger.warning("⚠️ noisereduce not found. Skipping noise reduction.")
+from transcription_pool import TranscriptionPool, DEFAULT_TIMEOUT
+
+SAMPLE_RATE = 16000
+
+# Streaming VAD: energy over fixed frames against an adaptive noise floor
+VAD_FRAME_MS = 30
+VAD_SPEECH_DB = 10.0        # Frame counts as speech this far above the noise floor
+VAD_MIN_LEVEL_DB = -50.0    # ... and above this absolute level (dBFS)
+VAD_SILENCE_MS = 600        # Trailing silence that closes a speech segment
+VAD_MIN_SPEECH_MS = 250     # Shorter bursts are treated as clicks/noise
+MAX_SEGMENT_SECONDS = 15.0  # Long speech is cut so partials keep flowing
+VAD_NOISE_SEED_FRAMES = 10  # Frames whose quiet end seeds the noise floor (300 ms)
+STREAM_KEEP_SECONDS = 30.0  # Most recent audio a stream keeps for whole-utterance stages
+
+# Noise reduction only runs on clips with speech and an SNR below this
+DENOISE_SNR_DB = 20.0
+GATE_FRAME = 512            # STFT frame (32 ms), hop is half of it
+GATE_THRESHOLD = 2.0        # Bins below this multiple of the noise magnitude are gated
+GATE_PROP_DECREASE = 0.8    # How much gated bins are attenuated
+GATE_NOISE_QUANTILE = 0.2   # Quietest share of frames in a block that update the noise profile
+
+def decode_audio(source):
+    """
+    Decodes audio (raw bytes, a file path or file-like object) once into a
+    mono 16 kHz float32 NumPy buffer in [-1, 1]. Nothing is written to disk.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        # WAV uploads take pydub's in-process path; other formats go through ffmpeg
+        audio_format = "wav" if source[:4] == b"RIFF" else None
+        audio = AudioSegment.from_file(io.BytesIO(source), format=audio_format)
+    else:
+        audio = AudioSegment.from_file(source)
+
+    audio = audio.set_channels(1).set_frame_rate(SAMPLE_RATE)
+    samples = np.array(audio.get_array_of_samples())
+    # Normalize to float32 range [-1, 1] whatever the sample width
+    return samples.astype(np.float32) / float(1 << (8 * audio.sample_width - 1))
+
+def to_audio_data(samples):
+    """16-bit PCM speech_recognition.AudioData for a float32 buffer (in memory, no temp file)."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    return sr.AudioData(pcm.tobytes(), SAMPLE_RATE, 2)
+
+def estimate_quality(samples):
+    """
+    Cheap SNR / speech activity estimate from frame energies.
+    Noise level is the 10th percentile frame energy, speech level the 90th.
+    Returns {snr_db, speech_ratio, noise_db}.
+    """
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    count = len(samples) // frame
+    if count < 2:
+        return {"snr_db": 0.0, "speech_ratio": 0.0, "noise_db": -100.0}
+
+    frames = samples[:count * frame].reshape(count, frame)
+    levels = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+    noise_db, speech_db = np.percentile(levels, [10, 90])
+    speech = levels > max(noise_db + VAD_SPEECH_DB, VAD_MIN_LEVEL_DB)
+    return {
+        "snr_db": round(float(speech_db - noise_db), 1),
+        "speech_ratio": round(float(speech.mean()), 3),
+        "noise_db": round(float(noise_db), 1)
+    }
+
+def needs_denoise(quality):
+    return quality["speech_ratio"] > 0 and quality["snr_db"] < DENOISE_SNR_DB
+
+class SpectralGate:
+    """
+    Streaming spectral-gating noise reduction on fixed GATE_FRAME frames
+    (sqrt-Hann analysis/synthesis, 50% overlap). Each chunk's frames are
+    processed as one matrix; the per-bin noise profile is refreshed from the
+    quietest frames of every chunk. Output lags input by one hop.
+    """
+
+    def __init__(self, frame=GATE_FRAME, threshold=GATE_THRESHOLD, prop_decrease=GATE_PROP_DECREASE):
+        self.frame = frame
+        self.hop = frame // 2
+        self.threshold = threshold
+        self.floor_gain = 1.0 - prop_decrease
+        # Periodic sqrt-Hann: squared windows at 50% overlap sum to one
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+        self.noise = None
+        self._input = np.zeros(self.hop, dtype=np.float32)   # Priming hop, then unframed input
+        self._overlap = np.zeros(self.hop, dtype=np.float32)
+        self._last_gain = None
+
+    def process(self, chunk):
+        """Denoises the next chunk of samples; returns as many output samples as are complete."""
+        data = np.concatenate([self._input, np.asarray(chunk, dtype=np.float32)])
+        count = (len(data) - self.frame) // self.hop + 1 if len(data) >= self.frame else 0
+        if count <= 0:
+            self._input = data
+            return np.zeros(0, dtype=np.float32)
+
+        starts = np.arange(count) * self.hop
+        frames = data[starts[:, None] + np.arange(self.frame)] * self.window
+        spectrum = np.fft.rfft(frames, axis=1)
+        magnitude = np.abs(spectrum)
+        self._update_noise(magnitude)
+
+        gain = np.where(magnitude > self.noise * self.threshold, 1.0, self.floor_gain)
+        # Smooth the mask over neighbouring bins and the previous frame to avoid musical noise
+        gain = (gain + np.roll(gain, 1, axis=1) + np.roll(gain, -1, axis=1)) / 3
+        previous = np.vstack([gain[:1] if self._last_gain is None else self._last_gain[None], gain[:-1]])
+        self._last_gain = gain[-1]
+        gain = np.maximum(gain, (gain + previous) / 2)
+
+        cleaned = np.fft.irfft(spectrum * gain, n=self.frame, axis=1).astype(np.float32) * self.window
+        # Overlap-add the frames back together
+        output = np.zeros((count + 1) * self.hop, dtype=np.float32)
+        output[:self.hop] += self._overlap
+        halves = cleaned.reshape(count, 2, self.hop)
+        output[:count * self.hop] += halves[:, 0].ravel()
+        output[self.hop:] += halves[:, 1].ravel()
+
+        self._overlap = output[count * self.hop:]
+        self._input = data[count * self.hop:]
+        return output[:count * self.hop]
+
+    def flush(self):
+        """Pushes the buffered tail through; returns the remaining output."""
+        return self.process(np.zeros(self.frame, dtype=np.float32))
+
+    def _update_noise(self, magnitude):
+        energy = magnitude.sum(axis=1)
+        quiet = energy <= np.quantile(energy, GATE_NOISE_QUANTILE)
+        estimate = magnitude[quiet].mean(axis=0)
+        self.noise = estimate if self.noise is None else 0.8 * self.noise + 0.2 * np.minimum(estimate, self.noise * 4)
+
+def spectral_gate(samples):
+    """Denoises a whole clip with SpectralGate (same length out, delay removed)."""
+    gate = SpectralGate()
+    output = np.concatenate([gate.process(samples), gate.flush()])
+    return output[gate.hop:gate.hop + len(samples)]
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of a live stream of 16-bit little-endian mono
+    16 kHz PCM. Frames are classified as speech/silence on the fly by energy;
+    each completed speech segment is transcribed as soon as it closes, so
+    partial text is available while the caller is still talking. Only the
+    last STREAM_KEEP_SECONDS of audio are kept.
+    """
+
+    def __init__(self, engine, language=None):
+        self.engine = engine
+        self.language = language
+        self.frame_size = SAMPLE_RATE * VAD_FRAME_MS // 1000
+        self.segments = []
+        self._pending = b""           # Bytes not yet forming a whole frame
+        self._frames = deque(maxlen=int(STREAM_KEEP_SECONDS * 1000 / VAD_FRAME_MS))  # For whole-utterance stages
+        self._seed = []               # (frame, level) held back until the noise floor is seeded
+        self._speech = []             # Frames of the open speech segment
+        self._speech_start = None     # Frame index the open segment started at
+        self._silent_frames = 0
+        self._frame_index = 0
+        self._noise_db = None
+
+    @property
+    def text(self):
+        return " ".join(seg["text"] for seg in self.segments if seg["text"]).strip()
+
+    @property
+    def samples(self):
+        """The last STREAM_KEEP_SECONDS received as one float32 buffer."""
+        return np.concatenate(self._frames) if self._frames else np.zeros(0, dtype=np.float32)
+
+    def feed(self, chunk):
+        """Adds PCM bytes; returns the segments completed by this chunk."""
+        data = self._pending + chunk
+        usable = len(data) - len(data) % (2 * self.frame_size)
+        self._pending = data[usable:]
+        if not usable:
+            return []
+
+        frames = (np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0).reshape(-1, self.frame_size)
+        levels = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        completed = []
+        for frame, level in zip(frames, levels):
+            self._frames.append(frame)
+            if self._noise_db is None:
+                self._seed.append((frame, float(level)))
+                if len(self._seed) == VAD_NOISE_SEED_FRAMES:
+                    completed.extend(self._seed_noise_floor())
+                continue
+            completed.extend(self._step(frame, float(level)))
+        return completed
+
+    def finish(self):
+        """Flushes the open segment at end of stream; returns the segments that closed."""
+        completed = self._seed_noise_floor() if self._seed else []
+        if self._speech:
+            completed.extend(self._close_segment())
+        return completed
+
+    def _seed_noise_floor(self):
+        """Starts the noise floor at the quiet end (10th percentile) of the first frames, then classifies them."""
+        seed, self._seed = self._seed, []
+        self._noise_db = float(np.percentile([level for _, level in seed], 10))
+        completed = []
+        for frame, level in seed:
+            completed.extend(self._step(frame, level))
+        return completed
+
+    def _step(self, frame, level):
+        completed = self._push(frame, level)
+        self._frame_index += 1
+        return completed
+
+    def _push(self, frame, level):
+        is_speech = level > max(self._noise_db + VAD_SPEECH_DB, VAD_MIN_LEVEL_DB)
+        if not is_speech:
+            # Noise floor follows quiet frames quickly, loud ones slowly
+            rate = 0.1 if level < self._noise_db else 0.01
+            self._noise_db += rate * (level - self._noise_db)
+
+        if is_speech:
+            if not self._speech:
+                self._speech_start = self._frame_index
+            self._speech.append(frame)
+            self._silent_frames = 0
+        elif self._speech:
+            self._speech.append(frame)
+            self._silent_frames += 1
+
+        if not self._speech:
+            return []
+        if (self._silent_frames * VAD_FRAME_MS >= VAD_SILENCE_MS
+                or len(self._speech) * VAD_FRAME_MS >= MAX_SEGMENT_SECONDS * 1000):
+            return self._close_segment()
+        return []
+
+    def _close_segment(self):
+        voiced = len(self._speech) - self._silent_frames
+        audio = np.concatenate(self._speech)
+        start = self._speech_start * VAD_FRAME_MS / 1000
+        self._speech, self._silent_frames = [], 0
+        if voiced * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+            return []
+
+        # Previous text as prompt keeps spelling/context consistent across segments
+        text = self.engine.transcribe_segment(audio, language=self.language, prompt=self.text or None)
+        segment = {"start": round(start, 2), "end": round(start + len(audio) / SAMPLE_RATE, 2), "text": text}
+        self.segments.append(segment)
+        return [segment]
 
 class AudioEngine:
-    def __init__(self, model_size="tiny", device="cpu", compute_type="int8"):
+    def __init__(self, model_size="tiny", device="cpu", compute_type="int8", workers=0, timeout=None):
         """
         Initialize the STT model.
+        With workers > 0, Whisper runs in a TranscriptionPool of that many
+        processes instead of on the calling thread (timeout: seconds per call).
         """
         self.model = None
+        self.pool = None
+        self.timeout = timeout
         self.recognizer = sr.Recognizer()
         
-        if HAS_WHISPER:
+        if HAS_WHISPER and workers:
+            logger.info(f"Starting {workers} Whisper workers: {model_size} on {device}...")
+            try:
+                self.pool = TranscriptionPool(model_size, device=device, compute_type=compute_type,
+                                              workers=workers, timeout=timeout or DEFAULT_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Failed to start Whisper workers: {e}")
+                self.pool = None
+        elif HAS_WHISPER:
             logger.info(f"Loading Whisper model: {model_size} on {device}...")
             try:
                 self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
@@ -43,106 +296,97 @@ class AudioEngine:
                 logger.error(f"Failed to load Whisper model: {e}")
                 self.model = None
         
-        # Initialize profanity filter
-        profanity.load_censor_words()
+        # Initialize profanity filter (compiled once, one pass per transcript)
+        self.matcher = KeywordMatcher()
 
-    def preprocess_audio(self, file_path):
+    def preprocess_audio(self, audio, timings=None, quality=None):
         """
-        Load audio, convert to mono/16kHz, and apply noise reduction.
-        Returns a numpy array of the audio data (for Whisper) or path to processed file (for SR).
+        Decode (unless audio is already a decoded buffer), estimate quality and
+        apply noise reduction only to noisy clips with speech in them.
+        Stage durations (ms) go into timings and the estimate into quality, if given.
+        Returns the float32 mono 16 kHz samples, or None if decoding failed.
         """
+        timings = {} if timings is None else timings
         try:
-            # Load audio using pydub
-            audio = AudioSegment.from_file(file_path)
-            
-            # Convert to mono and set frame rate to 16kHz
-            audio = audio.set_channels(1).set_frame_rate(16000)
-            
-            # Export processed audio to a temp file for SR or if we need to read samples
-            processed_path = file_path.replace(".wav", "_processed.wav")
-            audio.export(processed_path, format="wav")
-            
-            if HAS_WHISPER and self.model:
-                # Convert to numpy array for Whisper
-                samples = np.array(audio.get_array_of_samples())
-                
-                # Normalize to float32 range [-1, 1]
-                if audio.sample_width == 2:
-                    samples = samples.astype(np.float32) / 32768.0
-                elif audio.sample_width == 4:
-                    samples = samples.astype(np.float32) / 2147483648.0
-                
-                # Apply Noise Reduction if available
-                if HAS_NOISEREDUCE:
-                    samples = nr.reduce_noise(y=samples, sr=16000, prop_decrease=0.8)
-                
-                return samples
-            
-            return processed_path
-            
+            stage = time.perf_counter()
+            if not isinstance(audio, np.ndarray):
+                audio = decode_audio(audio)
+                timings["decode"] = round((time.perf_counter() - stage) * 1000, 1)
+                stage = time.perf_counter()
+
+            estimate = estimate_quality(audio)
+            timings["quality"] = round((time.perf_counter() - stage) * 1000, 1)
+            estimate["denoised"] = needs_denoise(estimate)
+
+            samples = audio
+            if estimate["denoised"]:
+                # Returns a new buffer: the caller's one is shared with emotion detection
+                stage = time.perf_counter()
+                samples = spectral_gate(audio)
+                timings["denoise"] = round((time.perf_counter() - stage) * 1000, 1)
+
+            if quality is not None:
+                quality.update(estimate)
+            return samples
+
         except Exception as e:
             logger.error(f"Error in preprocessing: {e}")
             return None
 
-    def transcribe(self, file_path, beam_size=5):
+    def transcribe(self, audio, beam_size=5):
         """
-        Transcribe the audio file.
+        Transcribe audio: a decoded buffer (see decode_audio), raw bytes or a file path.
         Returns a dictionary with text, segments, and metadata.
         """
         start_time = time.time()
+        timings, quality = {}, {}
         
         # Preprocess
-        processed_data = self.preprocess_audio(file_path)
+        processed_data = self.preprocess_audio(audio, timings, quality)
+        if processed_data is None:
+            return {"error": "Could not decode audio"}
         
         # 1. Try Whisper
-        if HAS_WHISPER and self.model and isinstance(processed_data, np.ndarray):
+        if HAS_WHISPER and (self.pool or self.model):
             try:
-                segments, info = self.model.transcribe(
-                    processed_data, 
-                    beam_size=beam_size,
-                    language=None, 
-                    vad_filter=True
-                )
-
-                full_text = []
-                transcribed_segments = []
-                
-                for segment in segments:
-                    clean_text = profanity.censor(segment.text)
-                    full_text.append(clean_text)
-                    transcribed_segments.append({
-                        "start": segment.start,
-                        "end": segment.end,
-                        "text": clean_text,
-                        "confidence": segment.avg_logprob
-                    })
-
-                final_text = " ".join(full_text).strip()
+                stage = time.perf_counter()
+                result = self._whisper(processed_data, beam_size=beam_size, language=None, vad_filter=True)
+                timings["inference"] = round((time.perf_counter() - stage) * 1000, 1)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                if "queue_time" in result:
+                    # Split pool wall time into waiting and decoding
+                    timings["queue"] = round(result["queue_time"] * 1000, 1)
+                    timings["inference"] = round(result["inference_time"] * 1000, 1)
+
+                clean_texts = self.matcher.censor_segments([segment["text"] for segment in result["segments"]])
+                transcribed_segments = [{**segment, "text": text} for segment, text in zip(result["segments"], clean_texts)]
+
+                final_text = " ".join(clean_texts).strip()
                 processing_time = time.time() - start_time
 
-                return {
+                response = {
                     "text": final_text,
-                    "language": info.language,
-                    "language_probability": info.language_probability,
+                    "language": result["language"],
+                    "language_probability": result["language_probability"],
                     "segments": transcribed_segments,
-                    "duration": info.duration,
-                    "processing_time": round(processing_time, 2)
+                    "duration": result["duration"],
+                    "processing_time": round(processing_time, 2),
+                    "audio_quality": quality,
+                    "timings": timings
                 }
+                return response
             except Exception as e:
                 logger.error(f"Whisper transcription failed: {e}")
                 # Fallback to SR
 
         # 2. Fallback to Google Speech Recognition
         try:
-            # Use processed path if available, else original
-            source_path = processed_data if isinstance(processed_data, str) else file_path
-            
-            with sr.AudioFile(source_path) as source:
-                audio = self.recognizer.record(source)
-            
-            # Recognize
-            text = self.recognizer.recognize_google(audio)
-            clean_text = profanity.censor(text)
+            # Recognize (the buffer is handed over as in-memory PCM)
+            stage = time.perf_counter()
+            text = self.recognizer.recognize_google(to_audio_data(processed_data))
+            timings["inference"] = round((time.perf_counter() - stage) * 1000, 1)
+            clean_text = self.matcher.censor(text)
             
             processing_time = time.time() - start_time
             
@@ -151,8 +395,10 @@ class AudioEngine:
                 "language": "auto", # Google auto-detects but doesn't return lang code easily in this method
                 "language_probability": 1.0,
                 "segments": [],
-                "duration": 0, # SR doesn't give duration
-                "processing_time": round(processing_time, 2)
+                "duration": round(len(processed_data) / SAMPLE_RATE, 2),
+                "processing_time": round(processing_time, 2),
+                "audio_quality": quality,
+                "timings": timings
             }
             
         except sr.UnknownValueError:
@@ -163,6 +409,53 @@ class AudioEngine:
             logger.error(f"Transcription failed: {e}")
             return {"error": str(e)}
 
+    def transcribe_segment(self, samples, language=None, prompt=None):
+        """
+        Fast transcription of one short speech segment (already VAD-trimmed).
+        Returns the censored text ('' if nothing was recognized).
+        """
+        if HAS_WHISPER and (self.pool or self.model):
+            try:
+                result = self._whisper(samples, beam_size=1, language=language, initial_prompt=prompt, vad_filter=False)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                return self.matcher.censor(" ".join(segment["text"].strip() for segment in result["segments"])).strip()
+            except Exception as e:
+                logger.error(f"Whisper segment transcription failed: {e}")
+
+        try:
+            return self.matcher.censor(self.recognizer.recognize_google(to_audio_data(samples)))
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            logger.error(f"Segment transcription failed: {e}")
+            return ""
+
+    def _whisper(self, samples, **options):
+        """
+        Runs Whisper in the worker pool (if any) or inline.
+        Returns {segments: [{start, end, text, confidence}], language, language_probability, duration} or {error}.
+        """
+        if self.pool:
+            return self.pool.transcribe(samples, timeout=self.timeout, **options)
+
+        segments, info = self.model.transcribe(samples, **options)
+        return {
+            "segments": [{"start": segment.start, "end": segment.end, "text": segment.text,
+                          "confidence": segment.avg_logprob} for segment in segments],
+            "language": info.language,
+            "language_probability": info.language_probability,
+            "duration": info.duration
+        }
+
+    def stats(self):
+        """Transcription queue depth/latency when a worker pool is running."""
+        return self.pool.stats() if self.pool else None
+
+    def stream(self, language=None):
+        """Starts an incremental transcription session (see StreamingTranscriber)."""
+        return StreamingTranscriber(self, language=language)
+
 if __name__ == "__main__":
     engine = AudioEngine()
     # print(engine.transcribe("test_audio.wav"))
@@ -1,8 +1,17 @@
 import re
 import logging
+from keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+SAFETY_TIPS = {
+    "police": "Move to a safe location if possible.",
+    "fire_station": "Evacuate immediately and stay low.",
+    "ambulance": "Stay calm. Do not eat or drink anything.",
+    "women_safety": "Stay on the line. Move to a crowded area if you can.",
+}
+UNKNOWN_RESPONSE = "I cannot provide medical or legal advice. For emergencies, please say 'Police', 'Ambulance', or 'Fire'."
+
 class ConversationEngine:
     def __init__(self, classifier, recommender):
         self.classifier = classifier
@@ -23,20 +32,36 @@ class ConversationEngine:
             "ambulance": ["ambulance", "hospital", "blood", "heart", "pain", "injury", "broken", "unconscious", "faint", "breath", "bleeding"],
         }
 
-    def analyze_urgency(self, text):
+        # Critical keywords that force a category even against the classifier
+        self.override_keywords = {
+            "fire_station": ["fire"],
+            "women_safety": ["rape", "stalker", "husband"],
+            "police": ["gun", "robber", "thief", "kill"],
+        }
+
+        # All keyword lists compiled into one matcher: a single pass per query
+        self.matcher = KeywordMatcher({
+            "urgency": self.urgency_keywords,
+            **self.intent_keywords,
+            **{f"override:{category}": words for category, words in self.override_keywords.items()}
+        }, profanity_words=[])
+
+    def analyze_urgency(self, text, scan=None):
         """
         Analyze text for urgency based on keywords and patterns.
+        scan: an earlier self.matcher.scan(text) result, to avoid rescanning.
         Returns a score 0.0 to 1.0.
         """
-        text_lower = text.lower()
+        scan = scan or self.matcher.scan(text)
         score = 0.0
         
         # Keyword matching
-        matches = sum(1 for word in self.urgency_keywords if word in text_lower)
+        matches = len(scan["hits"]["urgency"])
         score += min(matches * 0.2, 0.8) # Cap at 0.8 from keywords
         
         # Repetition (e.g., "help help")
-        if len(set(text_lower.split())) < len(text_lower.split()) * 0.6:
+        words = text.lower().split()
+        if len(set(words)) < len(words) * 0.6:
             score += 0.1
             
         # Exclamation marks (if present in STT)
@@ -45,6 +70,14 @@ class ConversationEngine:
             
         return min(score, 1.0)
 
+    def find_emergency_keywords(self, text):
+        """
+        Strong intent keywords present in text, e.g. {"fire_station": ["fire", "smoke"]}.
+        Used on partial transcripts to start classification early.
+        """
+        hits = self.matcher.scan(text)["hits"]
+        return {category: hits[category] for category in self.intent_keywords if hits[category]}
+
     def normalize_text(self, text):
         """
         Clean up broken speech, stutters, and fillers.
@@ -55,47 +88,49 @@ class ConversationEngine:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
-    def _refine_intent(self, predicted_intent, text):
+    def _refine_intent(self, predicted_intent, text, scan=None):
         """
         Cross-check classifier prediction with strong keywords.
         This helps correct bias (e.g., 'fire' being classified as 'ambulance').
         """
-        text_lower = text.lower()
+        scan = scan or self.matcher.scan(text)
         
         # Check for strong keyword matches in other categories
-        scores = {cat: 0 for cat in self.intent_keywords}
-        
-        for category, keywords in self.intent_keywords.items():
-            for word in keywords:
-                if word in text_lower:
-                    scores[category] += 1
+        scores = {cat: len(scan["hits"][cat]) for cat in self.intent_keywords}
         
         # Find category with max keyword hits
         best_keyword_match = max(scores, key=scores.get)
         max_hits = scores[best_keyword_match]
         
         # If the classifier's choice has 0 keyword support, but another category has strong support, switch.
-        if scores[predicted_intent] == 0 and max_hits > 0:
+        if scores.get(predicted_intent, 0) == 0 and max_hits > 0:
             logger.info(f"Overriding classifier ({predicted_intent}) with keyword match ({best_keyword_match})")
             return best_keyword_match
             
         # Specific overrides for critical keywords
-        if "fire" in text_lower and predicted_intent != "fire_station":
-            return "fire_station"
-        if any(w in text_lower for w in ["rape", "stalker", "husband"]) and predicted_intent != "women_safety":
-            return "women_safety"
-        if any(w in text_lower for w in ["gun", "robber", "thief", "kill"]) and predicted_intent != "police":
-            return "police"
+        for category in self.override_keywords:
+            if scan["hits"][f"override:{category}"] and predicted_intent != category:
+                return category
             
         return predicted_intent
 
+    def is_routable(self, text):
+        """
+        True if the raw text already names a critical category (override
+        keywords, e.g. code-mixed "aag lagi hai, fire!"), so it can be routed
+        without translating it first.
+        """
+        scan = self.matcher.scan(self.normalize_text(text))
+        return any(scan["hits"][f"override:{category}"] for category in self.override_keywords)
+
     def process_query(self, text, user_lat=None, user_lon=None):
         """
         Main method to process a user query.
         Handles broken language, detects intent, and formulates a response.
         """
         clean_text = self.normalize_text(text)
-        urgency_score = self.analyze_urgency(clean_text)
+        scan = self.matcher.scan(clean_text)
+        urgency_score = self.analyze_urgency(clean_text, scan)
         
         # 1. Classify Intent
         prediction = self.classifier.predict(clean_text)
@@ -103,7 +138,7 @@ class ConversationEngine:
         confidence = prediction['confidence']
         
         # Refine intent using keywords to fix bias
-        intent = self._refine_intent(intent, clean_text)
+        intent = self._refine_intent(intent, clean_text, scan)
         
         # 2. Heuristic Fallback for Low Confidence / Incomplete Sentences
         if confidence < 0.4 and intent == prediction['label']: # Only fallback if refinement didn't already switch it
@@ -111,8 +146,8 @@ class ConversationEngine:
             best_match = None
             max_hits = 0
             
-            for category, keywords in self.intent_keywords.items():
-                hits = sum(1 for k in keywords if k in clean_text.lower())
+            for category in self.intent_keywords:
+                hits = len(scan["hits"][category])
                 if hits > max_hits:
                     max_hits = hits
                     best_match = category
@@ -157,18 +192,10 @@ class ConversationEngine:
         Generate a spoken response tailored to the situation.
         Strictly follows safety protocols: No medical/legal/therapy advice.
         """
-        safety_tip = ""
-        if intent == "police":
-            safety_tip = "Move to a safe location if possible."
-        elif intent == "fire_station":
-            safety_tip = "Evacuate immediately and stay low."
-        elif intent == "ambulance":
-            safety_tip = "Stay calm. Do not eat or drink anything."
-        elif intent == "women_safety":
-            safety_tip = "Stay on the line. Move to a crowded area if you can."
+        safety_tip = SAFETY_TIPS.get(intent, "")
 
         if intent == "unknown":
-            return "I cannot provide medical or legal advice. For emergencies, please say 'Police', 'Ambulance', or 'Fire'."
+            return UNKNOWN_RESPONSE
             
         if helpline:
             # High Urgency or Low Urgency: ALWAYS ask for confirmation.
@@ -176,3 +203,17 @@ class ConversationEngine:
             return f"I have located {helpline['name']}. {safety_tip} Shall I call them for you?"
         else:
             return f"I detected a {intent} situation. {safety_tip} Please dial 112 immediately."
+
+    def response_templates(self):
+        """
+        Every reply _generate_response can produce (the response set is finite:
+        intents x safety tips x known helplines), for pre-translation.
+        """
+        intents = set(self.intent_keywords) | set(getattr(self.classifier, 'classes', ())) | {"police"}
+        helplines = getattr(self.recommender, 'helplines', [])
+        templates = {UNKNOWN_RESPONSE}
+        for intent in intents:
+            templates.add(self._generate_response(intent, 1.0, None))
+            for helpline in helplines:
+                templates.add(self._generate_response(intent, 1.0, helpline))
+        return sorted(templates)
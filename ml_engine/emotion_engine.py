@@ -1,37 +1,191 @@
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+SAMPLE_RATE = 16000
+
+# Prosody tier: 30 ms frames every 10 ms, pitch searched between 60 and 400 Hz
+PROSODY_FRAME = 480
+PROSODY_HOP = 160
+PITCH_MIN_HZ = 60
+PITCH_MAX_HZ = 400
+VOICING_THRESHOLD = 0.3     # Normalized autocorrelation peak for a voiced frame
+SILENCE_DB = -50.0
+
+PROSODY_FEATURES = ["energy_db", "energy_std_db", "zcr", "pitch_st", "pitch_std_st", "speech_rate", "voiced_ratio"]
+# Typical conversational speech (feature standardization)
+PROSODY_MEAN = np.array([-25.0, 6.0, 0.08, 8.0, 2.0, 4.0, 0.6])
+PROSODY_STD = np.array([6.0, 3.0, 0.04, 5.0, 1.0, 1.5, 0.2])
+# Linear model over standardized features -> sigmoid. Loud, high, variable
+# and fast speech raises arousal; raised, unstable pitch and breathy/noisy
+# voicing (high ZCR) drive distress. Refit with fit_prosody_model().
+PROSODY_MODEL = {
+    "arousal": (np.array([0.9, 0.3, 0.2, 0.7, 0.6, 0.5, 0.0]), 0.0),
+    "distress": (np.array([0.5, 0.4, 0.4, 0.8, 0.7, 0.3, -0.2]), -0.5),
+}
+DISTRESS_THRESHOLD = 0.6
+AROUSAL_THRESHOLD = 0.7
+
+# Classifier input cap: longer clips are reduced to EMOTION_WINDOWS evenly
+# spaced windows that together last EMOTION_MAX_SECONDS
+EMOTION_MAX_SECONDS = 8.0
+EMOTION_WINDOWS = 4
+DISTRESS_LABELS = ['ang', 'fear', 'sad', 'anger', 'sadness', 'fearful']
+
+def limit_duration(samples, sampling_rate=SAMPLE_RATE, max_seconds=EMOTION_MAX_SECONDS, windows=EMOTION_WINDOWS):
+    """
+    Caps the classifier input (attention cost grows with length): clips over
+    max_seconds become a decimated view of `windows` evenly spaced excerpts,
+    so the start, middle and end of a long call are all heard.
+    """
+    limit = int(max_seconds * sampling_rate)
+    if len(samples) <= limit:
+        return samples
+    width = limit // windows
+    starts = np.linspace(0, len(samples) - width, windows).astype(int)
+    return np.concatenate([samples[start:start + width] for start in starts])
+
+def extract_prosody(samples, sampling_rate=SAMPLE_RATE):
+    """
+    Prosodic features of a mono float32 clip, all frames at once:
+    RMS energy (mean/std, dB), zero-crossing rate, autocorrelation pitch
+    (mean/std in semitones re 100 Hz), speech rate (energy peaks per second
+    of talk) and voiced ratio. Returns a vector ordered as PROSODY_FEATURES,
+    or None if the clip is too short or silent.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) < PROSODY_FRAME * 4:
+        return None
+    count = (len(samples) - PROSODY_FRAME) // PROSODY_HOP + 1
+    frames = np.lib.stride_tricks.sliding_window_view(samples, PROSODY_FRAME)[::PROSODY_HOP][:count]
+
+    energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+    active = energy_db > max(SILENCE_DB, np.percentile(energy_db, 10) + 6)
+    if active.sum() < 5:
+        return None
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+
+    # Autocorrelation of every frame via one batched FFT
+    windowed = (frames - frames.mean(axis=1, keepdims=True)) * np.hanning(PROSODY_FRAME)
+    power = np.abs(np.fft.rfft(windowed, n=2 * PROSODY_FRAME, axis=1)) ** 2
+    autocorr = np.fft.irfft(power, axis=1)[:, :PROSODY_FRAME]
+    autocorr /= autocorr[:, :1] + 1e-10
+    min_lag, max_lag = sampling_rate // PITCH_MAX_HZ, sampling_rate // PITCH_MIN_HZ
+    lags = np.argmax(autocorr[:, min_lag:max_lag], axis=1) + min_lag
+    strength = autocorr[np.arange(count), lags]
+    voiced = active & (strength > VOICING_THRESHOLD)
+
+    if voiced.sum() >= 3:
+        pitch_st = 12 * np.log2(sampling_rate / lags[voiced] / 100.0)
+        low, median, high = np.percentile(pitch_st, [25, 50, 75])
+        pitch_mean, pitch_std = float(median), float((high - low) / 1.35)  # Robust to octave errors
+    else:
+        pitch_mean, pitch_std = PROSODY_MEAN[3], PROSODY_MEAN[4]
+
+    # Syllable nuclei ~ local maxima of the smoothed energy envelope (>= 100 ms apart)
+    envelope = np.convolve(energy_db, np.ones(5) / 5, mode='same')
+    neighbourhood = np.lib.stride_tricks.sliding_window_view(np.pad(envelope, 5, mode='edge'), 11).max(axis=1)
+    peaks = (envelope == neighbourhood) & active & (envelope > np.median(envelope[active]) - 3)
+    peaks[1:] &= ~peaks[:-1]  # One peak per flat top
+    active_idx = np.flatnonzero(active)
+    talk_seconds = (active_idx[-1] - active_idx[0] + 1) * PROSODY_HOP / sampling_rate
+
+    return np.array([
+        float(energy_db[active].mean()),
+        float(energy_db[active].std()),
+        float(zcr[active].mean()),
+        pitch_mean,
+        pitch_std,
+        float(peaks.sum() / talk_seconds),
+        float(voiced.sum() / active.sum())
+    ])
+
+def score_prosody(features, model=None):
+    """Arousal and distress (0-1) from a feature vector with the linear model."""
+    model = model or PROSODY_MODEL
+    z = (features - PROSODY_MEAN) / PROSODY_STD
+    return {name: float(1 / (1 + np.exp(-(weights @ z + bias)))) for name, (weights, bias) in model.items()}
+
+def fit_prosody_model(feature_rows, targets, ridge=1.0):
+    """
+    Refits PROSODY_MODEL-style coefficients on labeled clips.
+    feature_rows: (n, len(PROSODY_FEATURES)); targets: {name: (n,) values in 0-1}.
+    Ridge regression on the logit of the (clipped) targets.
+    """
+    z = (np.asarray(feature_rows, dtype=np.float64) - PROSODY_MEAN) / PROSODY_STD
+    design = np.hstack([z, np.ones((len(z), 1))])
+    penalty = ridge * np.eye(design.shape[1])
+    penalty[-1, -1] = 0.0
+    model = {}
+    for name, values in targets.items():
+        y = np.clip(np.asarray(values, dtype=np.float64), 0.02, 0.98)
+        coef = np.linalg.solve(design.T @ design + penalty, design.T @ np.log(y / (1 - y)))
+        model[name] = (coef[:-1], float(coef[-1]))
+    return model
+
 class EmotionEngine:
-    def __init__(self):
+    def __init__(self, mode="full"):
         """
         Initialize Emotion Detection Engine.
-        Uses a pre-trained Hugging Face model for Speech Emotion Recognition (SER).
-        Falls back to keyword/heuristic analysis if model fails.
+        mode="full": pre-trained Hugging Face model for Speech Emotion Recognition (SER),
+        with the prosody tier as fallback. mode="int8": the same model with its
+        linear layers dynamically quantized to int8 (smaller, faster on CPU).
+        mode="lite": prosody tier only (NumPy features + linear model, a few ms
+        of CPU, no model download).
         """
         self.model_name = "superb/wav2vec2-base-superb-er"
         self.classifier = None
-        
-        try:
-            from transformers import pipeline
-            logger.info("Loading Emotion Recognition Model...")
-            self.classifier = pipeline("audio-classification", model=self.model_name)
-            logger.info("Emotion Model Loaded Successfully.")
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to load Emotion Model (ML features unavailable): {e}")
-            self.classifier = None
-
-    def detect_emotion(self, audio_path):
+        self.mode = mode
+
+        if mode in ("full", "int8"):
+            try:
+                from transformers import pipeline
+                logger.info("Loading Emotion Recognition Model...")
+                self.classifier = pipeline("audio-classification", model=self.model_name)
+                logger.info("Emotion Model Loaded Successfully.")
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to load Emotion Model (using prosody features): {e}")
+                self.classifier = None
+
+        if self.classifier is not None and mode == "int8":
+            try:
+                import torch
+                self.classifier.model = torch.quantization.quantize_dynamic(
+                    self.classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                logger.info("Emotion Model quantized to int8.")
+            except Exception as e:
+                logger.warning(f"⚠️ int8 quantization failed, keeping float32 model: {e}")
+                self.mode = "full"
+
+    def model_size_mb(self):
+        """Serialized size of the classifier weights (0 without a model)."""
+        if self.classifier is None:
+            return 0.0
+        import io
+        import torch
+        buffer = io.BytesIO()
+        torch.save(self.classifier.model.state_dict(), buffer)
+        return buffer.tell() / 1e6
+
+    def detect_emotion(self, audio, sampling_rate=16000):
         """
-        Detect emotion from an audio file.
+        Detect emotion from an audio file path or a decoded mono float32 buffer
+        (e.g. the one shared with AudioEngine.transcribe). Buffers longer than
+        EMOTION_MAX_SECONDS are reduced with limit_duration() for the classifier.
         Returns: { "primary_emotion": "fear", "scores": {...} }
+        (the prosody tier adds "arousal" and "distress")
         """
         if self.classifier:
             try:
-                predictions = self.classifier(audio_path, top_k=5)
+                inputs = audio
+                if isinstance(audio, np.ndarray):
+                    inputs = {"raw": limit_duration(audio, sampling_rate), "sampling_rate": sampling_rate}
+                predictions = self.classifier(inputs, top_k=5)
                 scores = {p['label']: p['score'] for p in predictions}
                 primary_emotion = predictions[0]['label']
-                
+
                 logger.info(f"Detected Emotion (ML): {primary_emotion} ({scores[primary_emotion]:.2f})")
                 return {
                     "primary_emotion": primary_emotion,
@@ -40,20 +194,112 @@ class EmotionEngine:
             except Exception as e:
                 logger.error(f"Emotion detection failed: {e}")
 
-        # Fallback: Heuristic / Random (for demo purposes if ML fails)
-        # In a real scenario, we might analyze pitch/volume from audio_path using librosa if available
-        # For now, return neutral to avoid breaking flow
+        # Fallback: prosody tier on the decoded buffer
+        if isinstance(audio, np.ndarray):
+            return self.detect_prosody(audio, sampling_rate)
+
+        # No buffer to analyze: return neutral to avoid breaking flow
         return {"primary_emotion": "neutral", "scores": {}}
 
+    def detect_prosody(self, samples, sampling_rate=16000):
+        """Arousal/distress from prosodic features (see extract_prosody)."""
+        features = extract_prosody(samples, sampling_rate)
+        if features is None:
+            return {"primary_emotion": "neutral", "scores": {}}
+
+        levels = score_prosody(features)
+        distressed = levels["distress"] >= DISTRESS_THRESHOLD
+        logger.info(f"Detected Emotion (prosody): arousal {levels['arousal']:.2f}, distress {levels['distress']:.2f}")
+        return {
+            "primary_emotion": "fear" if distressed else "neutral",
+            "scores": {"fear": round(levels["distress"], 3), "neutral": round(1 - levels["distress"], 3)},
+            "arousal": round(levels["arousal"], 3),
+            "distress": round(levels["distress"], 3),
+            "model": "prosody"
+        }
+
     def adjust_urgency(self, base_urgency, emotion_data):
         """
         Adjust urgency score based on detected emotion.
         """
+        if 'distress' in emotion_data:
+            # Prosody tier: continuous levels instead of a class label
+            boost = 0.3 * emotion_data['distress'] if emotion_data['distress'] >= DISTRESS_THRESHOLD else 0.0
+            if emotion_data.get('arousal', 0.0) >= AROUSAL_THRESHOLD:
+                boost += 0.1
+            return min(base_urgency + boost, 1.0)
+
         emotion = emotion_data.get('primary_emotion', 'neutral')
         score = emotion_data.get('scores', {}).get(emotion, 0.0)
-        
+
         # Boost urgency for high-arousal negative emotions
-        if emotion in ['ang', 'fear', 'sad', 'anger', 'sadness', 'fearful']: 
+        if emotion in DISTRESS_LABELS:
             return min(base_urgency + (score * 0.3 if score else 0.1), 1.0)
-        
+
         return base_urgency
+
+def benchmark_modes(sample_dir, modes=("full", "int8", "lite")):
+    """
+    Accuracy-versus-latency report on a local labeled sample laid out as
+    <sample_dir>/<label>/*.wav (labels as the SER model names them: ang, hap,
+    neu, sad, ...). Exact accuracy needs a class label (full/int8); distress
+    accuracy scores every mode on "is this one of DISTRESS_LABELS".
+    Returns a markdown table.
+    """
+    import os
+    import time
+    from audio_engine import decode_audio
+
+    clips = []
+    for label in sorted(os.listdir(sample_dir)):
+        folder = os.path.join(sample_dir, label)
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                with open(os.path.join(folder, name), "rb") as f:
+                    clips.append((label, decode_audio(f.read())))
+    if not clips:
+        raise ValueError(f"No labeled clips found in {sample_dir}")
+
+    rows = ["| mode | model MB | exact acc | distress acc | p50 ms | p95 ms |", "|---|---|---|---|---|---|"]
+    for mode in modes:
+        engine = EmotionEngine(mode=mode)
+        if mode != "lite" and engine.classifier is None:
+            rows.append(f"| {mode} | unavailable | - | - | - | - |")
+            continue
+        engine.detect_emotion(clips[0][1])  # Warm-up
+        latencies, exact, distress = [], 0, 0
+        for label, samples in clips:
+            start = time.perf_counter()
+            result = engine.detect_emotion(samples)
+            latencies.append((time.perf_counter() - start) * 1000)
+            exact += result["primary_emotion"] == label
+            distress += (result["primary_emotion"] in DISTRESS_LABELS) == (label in DISTRESS_LABELS)
+        exact_text = f"{exact / len(clips):.1%}" if mode != "lite" else "-"
+        rows.append(f"| {engine.mode} | {engine.model_size_mb():.0f} | {exact_text} | {distress / len(clips):.1%} "
+                    f"| {np.percentile(latencies, 50):.1f} | {np.percentile(latencies, 95):.1f} |")
+    return "\n".join([f"{len(clips)} clips from {sample_dir}", ""] + rows)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        # python emotion_engine.py <labeled_dir>: accuracy vs latency per mode
+        print(benchmark_modes(sys.argv[1]))
+        sys.exit(0)
+
+    # Calm low hum vs. loud, high, wavering "scream"-like voicing
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    syllables = (np.sin(2 * np.pi * 4 * t) > 0)
+    calm = 0.05 * np.sin(2 * np.pi * np.cumsum(110 + 5 * np.sin(2 * np.pi * 0.5 * t)) / SAMPLE_RATE) * syllables
+    pitch = 320 + 60 * np.sin(2 * np.pi * 3 * t)
+    scream = 0.6 * np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE) * (np.sin(2 * np.pi * 6 * t) > -0.3)
+    scream += rng.normal(0, 0.05, len(t))
+
+    engine = EmotionEngine(mode="lite")
+    for label, clip in (("calm", calm), ("distressed", scream)):
+        start = time.perf_counter()
+        result = engine.detect_emotion(clip.astype(np.float32))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label}: {result} in {elapsed:.1f} ms -> urgency 0.4 becomes {engine.adjust_urgency(0.4, result):.2f}")
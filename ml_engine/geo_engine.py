@@ -2,8 +2,14 @@ import math
 import random
 from datetime import datetime
 
+# How many straight-line candidates per category get re-ranked by travel time
+RERANK_CANDIDATES = 3
+
 class GeoLocationService:
-    def __init__(self):
+    def __init__(self, routing_engine=None):
+        # Optional RoutingEngine used to rank candidates by real travel time
+        self.routing_engine = routing_engine
+
         # Mock Database of Emergency Centers in major hubs
         # In a real app, this would be a database query or Google Places API call
         self.places_db = [
@@ -49,28 +55,43 @@ class GeoLocationService:
         """
         categories = ["police", "hospital", "women_safety", "fire_station", "child_helpline"]
         results = {}
+        shortlist = {}
 
         for category in categories:
-            # 1. Try to find real match in DB
-            candidates = [p for p in self.places_db if p["type"] == category]
-            nearest = None
-            min_dist = float('inf')
-
-            for place in candidates:
-                dist = self._haversine_distance(user_lat, user_lon, place["lat"], place["lon"])
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest = place
+            # 1. Try to find real matches in DB, closest first (straight line)
+            candidates = [
+                (self._haversine_distance(user_lat, user_lon, place["lat"], place["lon"]), place)
+                for place in self.places_db if place["type"] == category
+            ]
+            candidates.sort(key=lambda c: c[0])
+            candidates = [c for c in candidates[:RERANK_CANDIDATES] if c[0] <= 50]
 
             # 2. If nearest is too far (>50km) or no match, generate synthetic local result
             # This ensures the demo works anywhere the user is located
-            if min_dist > 50 or not nearest:
-                nearest = self._generate_synthetic_place(category, user_lat, user_lon)
-                min_dist = nearest['distance_km'] # Pre-calculated in synthetic
+            if not candidates:
+                synthetic = self._generate_synthetic_place(category, user_lat, user_lon)
+                candidates = [(synthetic['distance_km'], synthetic)] # Pre-calculated in synthetic
 
-            # 3. Format Output
-            eta = self._estimate_eta(min_dist)
-            
+            shortlist[category] = candidates
+
+        # 3. Re-rank every shortlisted candidate by travel time in one batched search
+        etas = {}
+        if self.routing_engine:
+            flat = [(category, place) for category, cands in shortlist.items() for _, place in cands]
+            times = self.routing_engine.travel_times(
+                user_lat, user_lon, [(place["lat"], place["lon"]) for _, place in flat], mode='driving'
+            )
+            etas = {id(place): minutes for (_, place), minutes in zip(flat, times)}
+
+        for category, candidates in shortlist.items():
+            if etas:
+                min_dist, nearest = min(candidates, key=lambda c: etas[id(c[1])])
+                eta = round(etas[id(nearest)])
+            else:
+                min_dist, nearest = candidates[0]
+                eta = self._estimate_eta(min_dist)
+
+            # 4. Format Output
             results[category] = {
                 "name": nearest["name"],
                 "distance_km": round(min_dist, 2),
@@ -78,7 +99,7 @@ class GeoLocationService:
                 "coordinates": {"lat": nearest["lat"], "lon": nearest["lon"]},
                 "rating": nearest["rating"],
                 "availability_status": "Open Now" if nearest["open_24_7"] else "Closes 8 PM",
-                "is_simulated": min_dist > 50 # Flag if we faked it
+                "is_simulated": "id" not in nearest # Flag if we faked it
             }
 
         return results
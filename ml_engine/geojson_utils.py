@@ -0,0 +1,144 @@
+import json
+import gzip
+import time
+
+# Default coordinate precision for compact output (5 decimals ~ 1.1 m)
+DEFAULT_PRECISION = 5
+MIN_PRECISION = 1
+MAX_PRECISION = 7
+
+def to_geojson_feature(geometry, properties):
+    return {
+        "type": "Feature",
+        "geometry": geometry,
+        "properties": properties
+    }
+
+def to_geojson_collection(features):
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+def clamp_precision(precision):
+    """Parses a client supplied precision, falling back to the default."""
+    try:
+        precision = int(precision)
+    except (TypeError, ValueError):
+        return DEFAULT_PRECISION
+    return max(MIN_PRECISION, min(MAX_PRECISION, precision))
+
+def round_coords(coords, precision=DEFAULT_PRECISION):
+    """Rounds a (possibly nested) GeoJSON coordinate array."""
+    if isinstance(coords, (int, float)):
+        return round(coords, precision)
+    return [round_coords(c, precision) for c in coords]
+
+def compact_geometry(geometry, precision=DEFAULT_PRECISION):
+    if not geometry or 'coordinates' not in geometry:
+        return geometry
+    return {**geometry, "coordinates": round_coords(geometry['coordinates'], precision)}
+
+def encode_polyline(points, precision=DEFAULT_PRECISION):
+    """
+    Encodes [[lat, lon], ...] with the Google encoded polyline algorithm.
+    Coordinates are delta-encoded as integers at the given precision, so a
+    typical route point costs 4-8 characters instead of two full floats.
+    """
+    factor = 10 ** precision
+    output = []
+    prev_lat = prev_lon = 0
+
+    for lat, lon in points:
+        lat_i = int(round(lat * factor))
+        lon_i = int(round(lon * factor))
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else (delta << 1)
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+
+    return "".join(output)
+
+def decode_polyline(encoded, precision=DEFAULT_PRECISION):
+    """Decodes an encoded polyline back to [[lat, lon], ...]."""
+    factor = 10 ** precision
+    points = []
+    index = lat = lon = 0
+
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append([lat / factor, lon / factor])
+
+    return points
+
+def dumps_compact(payload):
+    """JSON without whitespace (Flask pretty-prints in debug mode)."""
+    return json.dumps(payload, separators=(',', ':'))
+
+# --- Payload Benchmark ---
+if __name__ == "__main__":
+    import random
+    from routing_engine import RoutingEngine
+
+    def bench(label, fn, runs=200):
+        start = time.perf_counter()
+        for _ in range(runs):
+            body = fn()
+        elapsed_ms = (time.perf_counter() - start) / runs * 1000
+        raw = body.encode('utf-8')
+        print(f"{label:<28} {len(raw):>8} B  gzip {len(gzip.compress(raw)):>7} B  {elapsed_ms:7.3f} ms")
+
+    router = RoutingEngine()
+    route = router.calculate_route(12.9716, 77.5946, 13.2000, 77.7000, 'ambulance')
+    # Bump the vertex count to what a real road geometry looks like
+    polyline = []
+    for a, b in zip(route['polyline'], route['polyline'][1:]):
+        for i in range(40):
+            r = i / 40
+            polyline.append([a[0] + (b[0] - a[0]) * r + random.uniform(-1e-5, 1e-5),
+                             a[1] + (b[1] - a[1]) * r + random.uniform(-1e-5, 1e-5)])
+    polyline.append(route['polyline'][-1])
+    print(f"Route with {len(polyline)} vertices")
+
+    def full_route():
+        coords = [[p[1], p[0]] for p in polyline]
+        return json.dumps(to_geojson_feature({"type": "LineString", "coordinates": coords}, {"mode": "ambulance"}), indent=2)
+
+    def compact_route():
+        return dumps_compact(to_geojson_feature(None, {"mode": "ambulance", "encoded_polyline": encode_polyline(polyline)}))
+
+    bench("route (full GeoJSON)", full_route)
+    bench("route (encoded polyline)", compact_route)
+
+    points = [(12.97 + random.uniform(-0.1, 0.1), 77.59 + random.uniform(-0.1, 0.1), random.random()) for _ in range(130)]
+
+    def full_heatmap():
+        return json.dumps(to_geojson_collection([
+            to_geojson_feature({"type": "Point", "coordinates": [lon, lat]}, {"intensity": w, "timestamp": time.time()})
+            for lat, lon, w in points
+        ]), indent=2)
+
+    def compact_heatmap():
+        return dumps_compact(to_geojson_collection([
+            to_geojson_feature(compact_geometry({"type": "Point", "coordinates": [lon, lat]}, 4),
+                               {"intensity": round(w, 2), "timestamp": int(time.time())})
+            for lat, lon, w in points
+        ]))
+
+    bench("heatmap (full)", full_heatmap)
+    bench("heatmap (compact, 4 dp)", compact_heatmap)
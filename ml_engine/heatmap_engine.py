@@ -1,18 +1,760 @@
+import csv
+import hashlib
+import math
 import random
+import struct
+import threading
 import time
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Incident Grid ---
+# Reports are binned into cells of CELL_DEG (~550 m). Cells are stored in
+# BLOCK_CELLS x BLOCK_CELLS NumPy blocks, allocated only where reports exist.
+CELL_DEG = 0.005
+BLOCK_CELLS = 64
+
+# Summed severity at which a cell is drawn at full heat
+INTENSITY_SATURATION = 5.0
+
+# Time buckets: hourly for the last 2 days, daily for the 30 day retention period
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+HOURLY_BUCKETS = 48
+DAILY_BUCKETS = 30
+
+# Hotspots: Gi* over the last day, neighbourhood of 5x5 cells (~2.5 km)
+HOTSPOT_WINDOW_SECONDS = 86400
+HOTSPOT_RADIUS_CELLS = 2
+HOTSPOT_MIN_REPORTS = 5     # Reports in the neighbourhood before a cell is scored
+HOTSPOT_Z_SCORE = 2.58      # 99% significance
+
+# --- Tile Pyramid ---
+# Web Mercator z/x/y tiles of TILE_BINS x TILE_BINS bins. BASE_ZOOM is the
+# zoom where a bin is about one grid cell; coarser zooms sum their children.
+TILE_BINS = 64
+BASE_ZOOM = 10
+MAX_TILE_ZOOM = BASE_ZOOM + 6
+TILE_MAGIC = b'SHT1'
+TILE_SCALE = 100          # uint16 value = summed severity * scale (scale lowered per tile if it would overflow)
+TILE_CACHE_SIZE = 4096
+
+# Classifier labels / conversation intents -> heatmap crisis types
+CRISIS_TYPE_ALIASES = {
+    "police": "crime",
+    "cyber crime": "crime",
+    "fire_station": "fire",
+    "fire emergency": "fire",
+    "ambulance": "medical",
+    "mental health crisis": "medical",
+    "road accident": "accident",
+    "women_safety": "harassment",
+    "women safety": "harassment",
+    "domestic violence": "harassment",
+    "child helpline": "child_safety"
+}
+
+def normalize_crisis_type(label):
+    key = str(label).strip().lower()
+    return CRISIS_TYPE_ALIASES.get(key, key.replace(" ", "_"))
+
+class BucketRing:
+    """
+    Fixed-size ring of time buckets. Bucket i (covering [i * seconds, (i + 1) * seconds))
+    lives in slot i % size, so rolling forward just recycles the oldest slot.
+    Each bucket maps block key -> {"weight", "count"} arrays.
+    """
+
+    def __init__(self, seconds, size):
+        self.seconds = seconds
+        self.size = size
+        self.slots = [None] * size  # (bucket index, blocks)
+
+    def bucket(self, index, create=True):
+        slot = self.slots[index % self.size]
+        if slot is not None and slot[0] == index:
+            return slot[1]
+        if not create:
+            return None
+        if slot is not None and slot[0] > index:
+            return None  # Older than anything the ring still holds
+        self.slots[index % self.size] = (index, {})
+        return self.slots[index % self.size][1]
+
+    def expire_before(self, index):
+        """Drops buckets older than index; returns their blocks."""
+        expired = []
+        for i, slot in enumerate(self.slots):
+            if slot is not None and slot[0] < index:
+                expired.append(slot[1])
+                self.slots[i] = None
+        return expired
+
+    def buckets_since(self, index):
+        return [slot[1] for slot in self.slots if slot is not None and slot[0] >= index]
+
+class IncidentGrid:
+    """
+    Sparse per-crisis-type grid of aggregated reports.
+    Each block holds summed severity, report count and last report time per
+    cell, so a viewport query touches only the cells it covers.
+    Reports are also binned into hourly and daily ring buffers: time-window
+    queries sum a few buckets, and reports older than the daily ring expire,
+    so memory is bounded by the retention period, not the report count.
+    """
+
+    def __init__(self, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.blocks = {}  # (crisis_type, block_row, block_col) -> {"weight", "count", "last_seen"}
+        self.hourly = BucketRing(HOUR_SECONDS, HOURLY_BUCKETS)
+        self.daily = BucketRing(DAY_SECONDS, DAILY_BUCKETS)
+        self.crisis_types = set()
+        self.total_reports = 0
+        self.on_expire = None  # Called after old buckets leave the totals
+        self._lock = threading.Lock()
+
+    def add(self, lats, lons, crisis_types, weights, timestamps):
+        """Bins a batch of reports (array-likes of equal length) into the grid."""
+        now = time.time()
+        timestamps = np.minimum(np.asarray(timestamps, dtype=np.float64), now)
+        # Anything older than the retention period is dropped on arrival
+        keep = timestamps >= self._retention_start(now)
+        lats = np.asarray(lats, dtype=np.float64)[keep]
+        lons = np.asarray(lons, dtype=np.float64)[keep]
+        weights = np.asarray(weights, dtype=np.float32)[keep]
+        crisis_types = np.asarray(crisis_types, dtype=object)[keep]
+        timestamps = timestamps[keep]
+        if not len(lats):
+            return
+
+        rows = np.floor(lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(lons / self.cell_deg).astype(np.int64)
+        # Flat index of each report inside its block
+        flat = (rows % BLOCK_CELLS) * BLOCK_CELLS + (cols % BLOCK_CELLS)
+        type_names, type_ids = np.unique(crisis_types, return_inverse=True)
+        block_keys = np.stack([type_ids.ravel(), rows // BLOCK_CELLS, cols // BLOCK_CELLS], axis=1)
+
+        with self._lock:
+            expired = self._roll(now)
+
+            def totals(key):
+                return self._block(*key)
+            self._accumulate(totals, block_keys, type_names, flat, weights, timestamps)
+
+            for ring in (self.hourly, self.daily):
+                bucket_ids = np.floor(timestamps / ring.seconds).astype(np.int64)
+                keys = np.concatenate([block_keys, bucket_ids[:, None]], axis=1)
+
+                def in_ring(key, ring=ring):
+                    crisis_type, block_row, block_col, bucket_id = key
+                    bucket = ring.bucket(bucket_id)
+                    if bucket is None:
+                        return None
+                    block = bucket.get((crisis_type, block_row, block_col))
+                    if block is None:
+                        block = bucket[(crisis_type, block_row, block_col)] = self._empty_block(with_last_seen=False)
+                    return block
+                self._accumulate(in_ring, keys, type_names, flat, weights, timestamps)
+
+            self.total_reports += len(lats)
+
+        if expired and self.on_expire:
+            self.on_expire()
+
+    def _accumulate(self, target, keys, type_names, flat, weights, timestamps):
+        """Groups reports by key row and adds each group into target(key)'s arrays with bincount."""
+        cells = BLOCK_CELLS * BLOCK_CELLS
+        # Collapse the key columns into one integer so np.unique sorts scalars, not rows
+        column_ids = [np.unique(column, return_inverse=True)[1].ravel() for column in keys.T]
+        combined = np.ravel_multi_index(column_ids, [int(ids.max()) + 1 for ids in column_ids])
+        _, first, group = np.unique(combined, return_index=True, return_inverse=True)
+        unique_keys = keys[first]
+        group = group.ravel()
+        order = np.argsort(group, kind='stable')
+        splits = np.cumsum(np.bincount(group, minlength=len(unique_keys)))[:-1]
+
+        for key, members in zip(unique_keys.tolist(), np.split(order, splits)):
+            block = target((type_names[key[0]], *key[1:]))
+            if block is None:
+                continue
+            idx = flat[members]
+            block["weight"] += np.bincount(idx, weights=weights[members], minlength=cells).reshape(
+                BLOCK_CELLS, BLOCK_CELLS).astype(np.float32)
+            block["count"] += np.bincount(idx, minlength=cells).reshape(
+                BLOCK_CELLS, BLOCK_CELLS).astype(np.uint32)
+            if "last_seen" in block:
+                np.maximum.at(block["last_seen"].ravel(), idx, timestamps[members])
+
+    def _retention_start(self, now):
+        return (math.floor(now / DAY_SECONDS) - DAILY_BUCKETS + 1) * DAY_SECONDS
+
+    def _roll(self, now):
+        """Moves the rings forward; expired daily buckets are subtracted from the totals."""
+        self.hourly.expire_before(math.floor(now / HOUR_SECONDS) - HOURLY_BUCKETS + 1)
+        expired = self.daily.expire_before(math.floor(now / DAY_SECONDS) - DAILY_BUCKETS + 1)
+
+        for bucket in expired:
+            for key, old in bucket.items():
+                block = self.blocks.get(key)
+                if block is None:
+                    continue
+                block["count"] -= np.minimum(block["count"], old["count"])
+                block["weight"] = np.maximum(block["weight"] - old["weight"], 0)
+                empty = block["count"] == 0
+                block["weight"][empty] = 0
+                block["last_seen"][empty] = 0
+                self.total_reports -= int(old["count"].sum())
+                if not block["count"].any():
+                    del self.blocks[key]
+        return bool(expired)
+
+    def _empty_block(self, with_last_seen=True):
+        block = {
+            "weight": np.zeros((BLOCK_CELLS, BLOCK_CELLS), dtype=np.float32),
+            "count": np.zeros((BLOCK_CELLS, BLOCK_CELLS), dtype=np.uint32)
+        }
+        if with_last_seen:
+            block["last_seen"] = np.zeros((BLOCK_CELLS, BLOCK_CELLS), dtype=np.float64)
+        return block
+
+    def _block(self, crisis_type, block_row, block_col):
+        key = (crisis_type, block_row, block_col)
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = self._empty_block()
+            self.crisis_types.add(crisis_type)
+        return block
+
+    def roll(self):
+        """Moves the time buckets forward to now; calls on_expire (outside the lock) if any expired."""
+        with self._lock:
+            expired = self._roll(time.time())
+        if expired and self.on_expire:
+            self.on_expire()
+
+    def query(self, min_lat, min_lon, max_lat, max_lon, crisis_types=None, window_seconds=None, roll=True):
+        """
+        Non-empty cells inside the bounding box, optionally only counting
+        reports from the last window_seconds (rounded out to whole buckets).
+        roll=False skips moving the buckets forward (and so never calls
+        on_expire), for callers that hold locks on_expire may need.
+        Returns a list of (crisis_type, lat, lon, weight, count, last_seen) per cell.
+        """
+        row0, row1 = math.floor(min_lat / self.cell_deg), math.floor(max_lat / self.cell_deg)
+        col0, col1 = math.floor(min_lon / self.cell_deg), math.floor(max_lon / self.cell_deg)
+        results = []
+
+        with self._lock:
+            expired = self._roll(time.time()) if roll else False
+
+            types = [t for t in self.crisis_types if not crisis_types or t in crisis_types]
+            block_rows = range(row0 // BLOCK_CELLS, row1 // BLOCK_CELLS + 1)
+            block_cols = range(col0 // BLOCK_CELLS, col1 // BLOCK_CELLS + 1)
+            if len(types) * len(block_rows) * len(block_cols) <= len(self.blocks):
+                # Small view: look up just the blocks it covers
+                keys = [(t, r, c) for t in types for r in block_rows for c in block_cols]
+            else:
+                keys = [k for k in self.blocks if k[0] in types]
+
+            buckets = self._window_buckets(window_seconds) if window_seconds else None
+
+            for crisis_type, block_row, block_col in keys:
+                block = self.blocks.get((crisis_type, block_row, block_col))
+                if block is None:
+                    continue
+                base_row, base_col = block_row * BLOCK_CELLS, block_col * BLOCK_CELLS
+                # Intersect the viewport with this block
+                r0, r1 = max(row0 - base_row, 0), min(row1 - base_row, BLOCK_CELLS - 1)
+                c0, c1 = max(col0 - base_col, 0), min(col1 - base_col, BLOCK_CELLS - 1)
+                if r0 > r1 or c0 > c1:
+                    continue
+                view = (slice(r0, r1 + 1), slice(c0, c1 + 1))
+
+                if buckets is None:
+                    counts, weights = block["count"][view], block["weight"][view]
+                else:
+                    parts = [b[(crisis_type, block_row, block_col)] for b in buckets
+                             if (crisis_type, block_row, block_col) in b]
+                    if not parts:
+                        continue
+                    counts = sum(part["count"][view] for part in parts)
+                    weights = sum(part["weight"][view] for part in parts)
+
+                hit_r, hit_c = np.nonzero(counts)
+                if not len(hit_r):
+                    continue
+                last_seen = block["last_seen"][view][hit_r, hit_c]
+                lats = (base_row + r0 + hit_r + 0.5) * self.cell_deg
+                lons = (base_col + c0 + hit_c + 0.5) * self.cell_deg
+
+                results.extend(zip([crisis_type] * len(hit_r), lats.tolist(), lons.tolist(),
+                                   weights[hit_r, hit_c].tolist(), counts[hit_r, hit_c].tolist(),
+                                   last_seen.tolist()))
+
+        if expired and self.on_expire:
+            self.on_expire()
+        return results
+
+    def window_blocks(self, coords, window_seconds):
+        """
+        Recent totals for the given (block_row, block_col) coordinates, summed
+        over crisis types: {coord: (weight, count)} for blocks with reports.
+        """
+        totals = {}
+        with self._lock:
+            buckets = self._window_buckets(window_seconds)
+            for bucket in buckets:
+                for (crisis_type, block_row, block_col), block in bucket.items():
+                    if (block_row, block_col) not in coords:
+                        continue
+                    weight, count = totals.get((block_row, block_col), (0, 0))
+                    totals[(block_row, block_col)] = (weight + block["weight"], count + block["count"])
+        return totals
+
+    def _window_buckets(self, window_seconds):
+        """Hourly buckets for windows up to the hourly ring's span, daily ones beyond."""
+        now = time.time()
+        ring = self.hourly if window_seconds <= HOUR_SECONDS * HOURLY_BUCKETS else self.daily
+        return ring.buckets_since(math.floor((now - window_seconds) / ring.seconds))
+
+def lonlat_to_tile(lon, lat, zoom):
+    """Fractional Web Mercator tile coordinates (x, y) of a point (NumPy-friendly)."""
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n
+    return x, y
+
+def tile_bounds(zoom, x, y):
+    """(min_lat, min_lon, max_lat, max_lon) of a tile."""
+    n = 2 ** zoom
+    lon0, lon1 = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    lat0 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    lat1 = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat0, lon0, lat1, lon1
+
+class TilePyramid:
+    """
+    Heatmap tiles built from the incident grid.
+    Base-zoom tiles bin grid cells directly; each coarser tile is the sum of
+    its four children downsampled 2x2. Tiles are cached until a report lands
+    inside them, and only tiles above an occupied base tile are ever built.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.occupied = [set() for _ in range(BASE_ZOOM + 1)]  # per zoom: tiles with any report
+        self._cache = OrderedDict()  # (z, x, y, crisis_type) -> (bins, payload, etag)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drops every cached tile (e.g. after old reports expired)."""
+        with self._lock:
+            self._cache.clear()
+
+    def mark_reports(self, lats, lons):
+        """Registers new reports: their tiles become occupied and cached copies stale."""
+        xs, ys = lonlat_to_tile(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64), BASE_ZOOM)
+        base_tiles = set(zip(np.floor(xs).astype(np.int64).tolist(), np.floor(ys).astype(np.int64).tolist()))
+        touched = [{(x >> (BASE_ZOOM - z), y >> (BASE_ZOOM - z)) for x, y in base_tiles}
+                   for z in range(BASE_ZOOM + 1)]
+        with self._lock:
+            for z in range(BASE_ZOOM + 1):
+                self.occupied[z].update(touched[z])
+
+            stale = []
+            for key in self._cache:
+                z, x, y = key[:3]
+                if z > BASE_ZOOM:
+                    # Finer tiles are cut from their base-zoom ancestor
+                    z, x, y = BASE_ZOOM, x >> (z - BASE_ZOOM), y >> (z - BASE_ZOOM)
+                if (x, y) in touched[z]:
+                    stale.append(key)
+            for key in stale:
+                del self._cache[key]
+
+    def get_tile(self, zoom, x, y, crisis_type=None):
+        """
+        Returns (payload bytes, etag) for a tile, or (None, None) if it is empty.
+        Payload: TILE_MAGIC, uint16 bins, float32 scale, then bins x bins
+        little-endian uint16 summed severity * scale, row-major, north row first.
+        """
+        key = (zoom, x, y, crisis_type)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached:
+                self._cache.move_to_end(key)
+                return cached[1], cached[2]
+
+        bins = self._bins(zoom, x, y, crisis_type)
+        if bins is None or not bins.any():
+            return None, None
+
+        scale = min(float(TILE_SCALE), 65535.0 / float(bins.max()))
+        packed = np.minimum(np.rint(bins * scale), 65535).astype('<u2')
+        payload = struct.pack('<4sHf', TILE_MAGIC, TILE_BINS, scale) + packed.tobytes()
+        etag = hashlib.md5(payload).hexdigest()
+
+        with self._lock:
+            self._cache[key] = (bins, payload, etag)
+            if len(self._cache) > TILE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return payload, etag
+
+    def _bins(self, zoom, x, y, crisis_type):
+        """Summed severity per bin for a tile (float32 TILE_BINS x TILE_BINS), or None if empty."""
+        if zoom > BASE_ZOOM:
+            # Crop the covering base tile and upsample
+            shift = zoom - BASE_ZOOM
+            base = self._cached_bins(BASE_ZOOM, x >> shift, y >> shift, crisis_type)
+            if base is None:
+                return None
+            size = TILE_BINS >> shift
+            r0, c0 = (y - ((y >> shift) << shift)) * size, (x - ((x >> shift) << shift)) * size
+            # Each base bin is spread over the finer bins it covers
+            part = base[r0:r0 + size, c0:c0 + size] / (4 ** shift)
+            return np.repeat(np.repeat(part, 1 << shift, axis=0), 1 << shift, axis=1)
+
+        if (x, y) not in self.occupied[zoom]:
+            return None
+
+        if zoom == BASE_ZOOM:
+            min_lat, min_lon, max_lat, max_lon = tile_bounds(zoom, x, y)
+            cells = self.grid.query(min_lat, min_lon, max_lat, max_lon,
+                                    crisis_types=[crisis_type] if crisis_type else None)
+            if not cells:
+                return None
+            _, lats, lons, weights, _, _ = zip(*cells)
+            fx, fy = lonlat_to_tile(np.array(lons), np.array(lats), zoom)
+            cols = np.floor((fx - x) * TILE_BINS).astype(np.int64)
+            rows = np.floor((fy - y) * TILE_BINS).astype(np.int64)
+            # Cells straddling the tile edge belong to whichever tile holds their center
+            inside = (cols >= 0) & (cols < TILE_BINS) & (rows >= 0) & (rows < TILE_BINS)
+            return np.bincount(rows[inside] * TILE_BINS + cols[inside], weights=np.asarray(weights)[inside],
+                               minlength=TILE_BINS * TILE_BINS).reshape(TILE_BINS, TILE_BINS).astype(np.float32)
+
+        # Coarser zoom: sum 2x2 bins of each child into its quadrant
+        bins = np.zeros((TILE_BINS, TILE_BINS), dtype=np.float32)
+        half = TILE_BINS // 2
+        for dy in (0, 1):
+            for dx in (0, 1):
+                child = self._cached_bins(zoom + 1, 2 * x + dx, 2 * y + dy, crisis_type)
+                if child is not None:
+                    bins[dy * half:(dy + 1) * half, dx * half:(dx + 1) * half] = \
+                        child.reshape(half, 2, half, 2).sum(axis=(1, 3))
+        return bins
+
+    def _cached_bins(self, zoom, x, y, crisis_type):
+        key = (zoom, x, y, crisis_type)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached:
+            return cached[0]
+        self.get_tile(zoom, x, y, crisis_type)
+        with self._lock:
+            cached = self._cache.get(key)
+        return cached[0] if cached else None
+
+def _box_sum(values, radius):
+    """Sum over the (2 * radius + 1)^2 neighbourhood of every cell, via an integral image."""
+    size = 2 * radius + 1
+    integral = np.pad(values, ((radius + 1, radius), (radius + 1, radius))).cumsum(0).cumsum(1)
+    return integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size] + integral[:-size, :-size]
+
+class HotspotDetector:
+    """
+    Getis-Ord Gi* hotspots over the last HOTSPOT_WINDOW_SECONDS of reports,
+    measured against the cells that have recent reports (so a city with
+    reports everywhere is not one big hotspot).
+    Each cell's neighbourhood sum comes from a box filter over its block and
+    the 8 blocks around it; only blocks touched by new reports (and their
+    neighbours) are refiltered, and only cells with enough nearby reports
+    are kept as candidates. Significant cells are grouped into hotspots by
+    8-connectivity. Hotspot ids carry over between runs while they overlap.
+    """
+
+    def __init__(self, grid, window_seconds=HOTSPOT_WINDOW_SECONDS, radius_cells=HOTSPOT_RADIUS_CELLS):
+        self.grid = grid
+        self.window_seconds = window_seconds
+        self.radius = radius_cells
+        self._blocks = {}  # (block_row, block_col) -> per-block sums and candidate cells
+        self._dirty = set()
+        self._hour = None
+        self._hotspots = []
+        self._cell_ids = {}  # (row, col) -> hotspot id from the last run
+        self._stale = False  # Set by reset(); read under the lock by hotspots()
+        self._lock = threading.Lock()
+
+    def mark_reports(self, lats, lons):
+        """Registers new reports: their blocks and the neighbouring ones need refiltering."""
+        rows = np.floor(np.asarray(lats, dtype=np.float64) / self.grid.cell_deg).astype(np.int64) // BLOCK_CELLS
+        cols = np.floor(np.asarray(lons, dtype=np.float64) / self.grid.cell_deg).astype(np.int64) // BLOCK_CELLS
+        with self._lock:
+            for block_row, block_col in set(zip(rows.tolist(), cols.tolist())):
+                self._dirty.update(self._neighbours(block_row, block_col))
+
+    def reset(self):
+        """
+        Forces a full recompute on the next call (e.g. after old reports expired).
+        Lock-free on purpose: it runs from the grid's on_expire callback.
+        """
+        self._stale = True
+
+    def hotspots(self):
+        """
+        Current hotspots, strongest first:
+        [{id, lat, lon, radius_km, z_score, reports, weight, type, cells}, ...]
+        """
+        # Expire old buckets first: on_expire -> reset() must not run under our lock
+        self.grid.roll()
+        with self._lock:
+            hour = math.floor(time.time() / HOUR_SECONDS)
+            if hour != self._hour or self._stale:
+                self._stale = False
+                # The window slid forward, so every block's recent totals changed
+                self._dirty = {n for _, r, c in list(self.grid.blocks) for n in self._neighbours(r, c)}
+                self._dirty.update(self._blocks)
+                self._hour = hour
+            if self._dirty:
+                self._refilter(self._dirty)
+                self._dirty = set()
+                self._hotspots = self._detect()
+            return list(self._hotspots)
+
+    def _neighbours(self, block_row, block_col):
+        return [(block_row + dr, block_col + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+    def _refilter(self, dirty):
+        """Recomputes per-block sums and candidate cells for the dirty blocks."""
+        needed = {n for coord in dirty for n in self._neighbours(*coord)}
+        totals = self.grid.window_blocks(needed, self.window_seconds)
+        empty = np.zeros((BLOCK_CELLS, BLOCK_CELLS), dtype=np.float64)
+
+        for block_row, block_col in dirty:
+            # 3x3 block mosaic so neighbourhoods can reach across block edges
+            mosaic = [[totals.get((block_row + dr, block_col + dc), (empty, empty)) for dc in (-1, 0, 1)]
+                      for dr in (-1, 0, 1)]
+            weights = np.block([[w for w, _ in row] for row in mosaic]).astype(np.float64)
+            counts = np.block([[c for _, c in row] for row in mosaic]).astype(np.float64)
+            inner = (slice(BLOCK_CELLS, 2 * BLOCK_CELLS), slice(BLOCK_CELLS, 2 * BLOCK_CELLS))
+            local_w = _box_sum(weights, self.radius)[inner]
+            local_c = _box_sum(counts, self.radius)[inner]
+            local_n = _box_sum((counts > 0).astype(np.float64), self.radius)[inner]
+
+            cell_weights = weights[inner]
+            # Only cells that have reports themselves belong to the scored sample
+            rows, cols = np.nonzero((local_c >= HOTSPOT_MIN_REPORTS) & (counts[inner] > 0))
+            active = int(np.count_nonzero(counts[inner]))
+            if not active and not len(rows):
+                self._blocks.pop((block_row, block_col), None)
+                continue
+            self._blocks[(block_row, block_col)] = {
+                "s1": float(cell_weights.sum()),
+                "s2": float((cell_weights ** 2).sum()),
+                "active": active,
+                "rows": rows + block_row * BLOCK_CELLS,
+                "cols": cols + block_col * BLOCK_CELLS,
+                "local_w": local_w[rows, cols],
+                "local_c": local_c[rows, cols],
+                "local_n": local_n[rows, cols]
+            }
+
+    def _detect(self):
+        """Scores candidate cells with Gi* and groups the significant ones into hotspots."""
+        blocks = list(self._blocks.values())
+        # Study area: cells with recent reports
+        n = sum(b["active"] for b in blocks)
+        if n < 2:
+            return []
+        mean = sum(b["s1"] for b in blocks) / n
+        std = math.sqrt(max(sum(b["s2"] for b in blocks) / n - mean ** 2, 1e-12))
+
+        rows = np.concatenate([b["rows"] for b in blocks])
+        cols = np.concatenate([b["cols"] for b in blocks])
+        local_w = np.concatenate([b["local_w"] for b in blocks])
+        local_n = np.concatenate([b["local_n"] for b in blocks])
+        if not len(rows):
+            return []
+
+        # Gi* with binary weights: the active cells in the (2r + 1)^2 neighbourhood (self included)
+        spread = np.sqrt(np.maximum(n * local_n - local_n ** 2, 1e-9) / (n - 1))
+        z = (local_w - mean * local_n) / (std * spread)
+        hot = np.flatnonzero(z >= HOTSPOT_Z_SCORE)
+        cells = {(int(rows[i]), int(cols[i])): i for i in hot}
+
+        # Connected components (8-neighbourhood) of significant cells
+        clusters, seen = [], set()
+        for start in cells:
+            if start in seen:
+                continue
+            seen.add(start)
+            stack, members = [start], []
+            while stack:
+                row, col = stack.pop()
+                members.append((row, col))
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        cell = (row + dr, col + dc)
+                        if cell in cells and cell not in seen:
+                            seen.add(cell)
+                            stack.append(cell)
+            clusters.append(members)
+
+        hotspots, cell_ids, used = [], {}, set()
+        for members in clusters:
+            idx = np.array([cells[m] for m in members])
+            peak = members[int(np.argmax(z[idx]))]
+            member_rows, member_cols = rows[idx], cols[idx]
+            lat = float(((member_rows + 0.5) * local_w[idx]).sum() / local_w[idx].sum() * self.grid.cell_deg)
+            lon = float(((member_cols + 0.5) * local_w[idx]).sum() / local_w[idx].sum() * self.grid.cell_deg)
+
+            # Reports within the hotspot's footprint, by crisis type
+            pad = self.radius
+            cells_in_view = self.grid.query(
+                (member_rows.min() - pad + 0.5) * self.grid.cell_deg, (member_cols.min() - pad + 0.5) * self.grid.cell_deg,
+                (member_rows.max() + pad + 0.5) * self.grid.cell_deg, (member_cols.max() + pad + 0.5) * self.grid.cell_deg,
+                window_seconds=self.window_seconds, roll=False)
+            by_type = {}
+            for crisis_type, _, _, weight, _, _ in cells_in_view:
+                by_type[crisis_type] = by_type.get(crisis_type, 0.0) + weight
+
+            # Reuse the id of an overlapping hotspot from the last run
+            hotspot_id = next((self._cell_ids[m] for m in members
+                               if m in self._cell_ids and self._cell_ids[m] not in used),
+                              f"hotspot_{peak[0]}_{peak[1]}")
+            used.add(hotspot_id)
+            cell_ids.update((m, hotspot_id) for m in members)
+
+            spread_deg = max(math.hypot((r + 0.5) * self.grid.cell_deg - lat,
+                                        ((c + 0.5) * self.grid.cell_deg - lon) * math.cos(math.radians(lat)))
+                             for r, c in members)
+            hotspots.append({
+                "id": hotspot_id,
+                "lat": lat,
+                "lon": lon,
+                "radius_km": round((spread_deg + (pad + 0.5) * self.grid.cell_deg) * 111.0, 3),
+                "z_score": round(float(z[idx].max()), 2),
+                "reports": int(sum(count for _, _, _, _, count, _ in cells_in_view)),
+                "weight": round(sum(by_type.values()), 2),
+                "type": max(by_type, key=by_type.get) if by_type else "unknown",
+                "cells": len(members)
+            })
+
+        self._cell_ids = cell_ids
+        hotspots.sort(key=lambda h: -h["z_score"])
+        return hotspots
+
+def parse_window(value):
+    """Window length in seconds from '90m', '1h', '24h', '7d' or a plain number of seconds."""
+    if value is None or value == '':
+        return None
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    units = {'m': 60, 'h': HOUR_SECONDS, 'd': DAY_SECONDS}
+    if text[-1] in units:
+        seconds = float(text[:-1]) * units[text[-1]]
+    else:
+        seconds = float(text)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"window must be a positive finite duration: {value!r}")
+    return seconds
 
 class HeatmapEngine:
-    def __init__(self):
-        pass
+    def __init__(self, incidents_csv=None):
+        self.grid = IncidentGrid()
+        self.tiles = TilePyramid(self.grid)
+        self.hotspot_detector = HotspotDetector(self.grid)
+        # Tiles show retained totals, so expiring old buckets invalidates them
+        self.grid.on_expire = self._on_expire
+        if incidents_csv:
+            self.load_csv(incidents_csv)
 
-    def generate_heatmap_data(self, center_lat, center_lon, radius_km=10):
+    def add_reports(self, lats, lons, crisis_types, weights, timestamps):
+        """Adds a batch of normalized reports to the grid and refreshes affected tiles."""
+        self.grid.add(lats, lons, crisis_types, weights, timestamps)
+        self.tiles.mark_reports(lats, lons)
+        self.hotspot_detector.mark_reports(lats, lons)
+
+    def _on_expire(self):
+        self.tiles.reset()
+        self.hotspot_detector.reset()
+
+    def get_hotspots(self):
+        """Statistically significant clusters of recent reports (see HotspotDetector)."""
+        return self.hotspot_detector.hotspots()
+
+    def get_tile(self, zoom, x, y, crisis_type=None):
+        """Binary heatmap tile: (payload, etag), or (None, None) when empty."""
+        return self.tiles.get_tile(zoom, x, y, normalize_crisis_type(crisis_type) if crisis_type else None)
+
+    # --- Ingestion ---
+
+    def ingest(self, lat, lon, crisis_type, intensity=0.5, timestamp=None):
+        """Records a single incident report (e.g. from /voice-assist or /feedback)."""
+        self.add_reports([lat], [lon], [normalize_crisis_type(crisis_type)],
+                         [min(max(float(intensity), 0.0), 1.0)], [timestamp or time.time()])
+
+    def load_csv(self, path):
+        """
+        Bulk-loads reports from a CSV with columns lat, lon, type and
+        optional intensity (0-1) and timestamp (epoch seconds).
+        """
+        lats, lons, types, weights, timestamps = [], [], [], [], []
+        now = time.time()
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    lats.append(float(row['lat']))
+                    lons.append(float(row['lon']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                types.append(normalize_crisis_type(row.get('type') or 'unknown'))
+                weights.append(float(row.get('intensity') or 0.5))
+                timestamps.append(float(row.get('timestamp') or now))
+
+        if lats:
+            self.add_reports(lats, lons, types, np.clip(weights, 0.0, 1.0), timestamps)
+        print(f"📊 Loaded {len(lats)} incident reports from {path}")
+        return len(lats)
+
+    # --- Queries ---
+
+    def generate_heatmap_data(self, center_lat, center_lon, radius_km=10, window_seconds=None):
+        """
+        Heatmap points for the area around the given center.
+        Answers from the aggregated incident grid (one point per non-empty
+        cell), optionally limited to the last window_seconds.
+        Until any report has been ingested, returns synthetic demo data
+        (every point marked "synthetic": True).
+        Output: List of {lat, lon, intensity, type, timestamp, count}
+        """
+        if self.grid.total_reports == 0:
+            return self._generate_synthetic_data(center_lat, center_lon, radius_km)
+
+        dlat = radius_km / 111.0
+        dlon = radius_km / (111.0 * max(math.cos(math.radians(center_lat)), 0.01))
+        cells = self.grid.query(center_lat - dlat, center_lon - dlon, center_lat + dlat, center_lon + dlon,
+                                window_seconds=window_seconds)
+
+        return [{
+            "lat": lat,
+            "lon": lon,
+            "intensity": min(1.0, weight / INTENSITY_SATURATION),
+            "type": crisis_type,
+            "timestamp": last_seen,
+            "count": count
+        } for crisis_type, lat, lon, weight, count, last_seen in cells]
+
+    def _generate_synthetic_data(self, center_lat, center_lon, radius_km=10):
         """
         Generates synthetic emergency report data for heatmap visualization.
         Inputs: Center coordinates and radius.
-        Output: List of [lat, lon, intensity]
+        Output: List of {lat, lon, intensity, type, timestamp, synthetic}
         """
         reports = []
-        
+
         # Crisis types with associated base severity
         crisis_types = {
             "crime": 0.8,
@@ -21,51 +763,78 @@ class HeatmapEngine:
             "fire": 0.7,
             "medical": 0.5
         }
-        
+
         # Generate 50-100 random reports
         num_reports = random.randint(50, 100)
-        
+
         for _ in range(num_reports):
             # Random offset within radius (approx)
             # 1 deg lat ~ 111km
             offset_scale = radius_km / 111.0
             lat = center_lat + random.uniform(-offset_scale, offset_scale)
             lon = center_lon + random.uniform(-offset_scale, offset_scale)
-            
+
             crisis = random.choice(list(crisis_types.keys()))
             base_severity = crisis_types[crisis]
-            
+
             # Randomize severity slightly
             severity = min(1.0, base_severity + random.uniform(-0.1, 0.1))
-            
+
             # Timestamp (last 24 hours)
             timestamp = time.time() - random.randint(0, 86400)
-            
+
             reports.append({
                 "lat": lat,
                 "lon": lon,
                 "intensity": severity,
                 "type": crisis,
-                "timestamp": timestamp
+                "timestamp": timestamp,
+                "synthetic": True
             })
-            
-        # Add some "hotspots" (clusters of high intensity)
-        for _ in range(3):
-            hotspot_lat = center_lat + random.uniform(-offset_scale/2, offset_scale/2)
-            hotspot_lon = center_lon + random.uniform(-offset_scale/2, offset_scale/2)
-            
-            for _ in range(10):
-                reports.append({
-                    "lat": hotspot_lat + random.uniform(-0.002, 0.002),
-                    "lon": hotspot_lon + random.uniform(-0.002, 0.002),
-                    "intensity": 1.0, # Max intensity
-                    "type": "cluster",
-                    "timestamp": time.time()
-                })
-                
+
         return reports
 
 if __name__ == "__main__":
     engine = HeatmapEngine()
     data = engine.generate_heatmap_data(12.9716, 77.5946)
     print(f"Generated {len(data)} points")
+
+    # Aggregate 200k synthetic reports, then query a 10 km view
+    n = 200000
+    rng = np.random.default_rng(7)
+    start = time.perf_counter()
+    engine.add_reports(
+        rng.uniform(12.77, 13.17, n), rng.uniform(77.39, 77.79, n),
+        rng.choice(["crime", "accident", "fire", "medical", "harassment"], n),
+        rng.uniform(0.3, 1.0, n), time.time() - rng.uniform(0, 7 * 86400, n)
+    )
+    print(f"Binned {n} reports in {(time.perf_counter() - start) * 1000:.0f} ms ({len(engine.grid.blocks)} blocks)")
+
+    start = time.perf_counter()
+    data = engine.generate_heatmap_data(12.9716, 77.5946)
+    print(f"Heatmap query: {len(data)} cells in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for window in ("1h", "24h", "7d"):
+        start = time.perf_counter()
+        data = engine.generate_heatmap_data(12.9716, 77.5946, window_seconds=parse_window(window))
+        print(f"Heatmap query (last {window}): {sum(p['count'] for p in data)} reports, "
+              f"{len(data)} cells in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Hotspots: a burst of fires on top of the background, then one more report (incremental)
+    engine.add_reports(rng.normal(12.93, 0.003, 300), rng.normal(77.62, 0.003, 300), ["fire"] * 300,
+                       rng.uniform(0.6, 1.0, 300), time.time() - rng.uniform(0, 3600, 300))
+    for label in ("full", "cached"):
+        start = time.perf_counter()
+        hotspots = engine.get_hotspots()
+        print(f"Hotspots ({label}): {len(hotspots)} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    engine.ingest(12.93, 77.62, "fire", 0.9)
+    start = time.perf_counter()
+    hotspots = engine.get_hotspots()
+    print(f"Hotspots (after 1 report): {len(hotspots)} in {(time.perf_counter() - start) * 1000:.1f} ms, top: {hotspots[:1]}")
+
+    # Tile pyramid: state-level tile (cold, then cached) vs. the GeoJSON payload
+    x, y = (int(v) for v in lonlat_to_tile(77.59, 12.97, 6))
+    for label in ("cold", "cached"):
+        start = time.perf_counter()
+        payload, etag = engine.get_tile(6, x, y)
+        print(f"Tile 6/{x}/{y} ({label}): {len(payload)} B in {(time.perf_counter() - start) * 1000:.1f} ms")
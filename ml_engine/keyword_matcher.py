@@ -0,0 +1,162 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Try to load the better_profanity word list (the matcher replaces its per-call scanning)
+try:
+    from better_profanity.utils import get_complete_path_of_file, read_wordlist
+    PROFANITY_WORDS = list(read_wordlist(get_complete_path_of_file("profanity_wordlist.txt")))
+except (ImportError, OSError):
+    PROFANITY_WORDS = []
+    logger.warning("⚠️ better_profanity word list not found. Profanity will not be censored.")
+
+# Look-alike characters accepted inside profane words (same table as better_profanity)
+LEET_CHARS = {
+    "a": "a@*4",
+    "i": "i*l1",
+    "o": "o*0@",
+    "u": "u*v",
+    "v": "v*u",
+    "l": "l1",
+    "e": "e*3",
+    "s": "s$5",
+    "t": "t7",
+}
+WORD_CHARS = r"\w@$*'"
+CENSOR = "****"
+
+def _trie_pattern(words, char_pattern):
+    """
+    Regex for a set of words built from their prefix trie, so the engine
+    follows shared prefixes once instead of trying every alternative.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [char_pattern(char) + emit(child) for char, child in sorted(node.items()) if char]
+        optional = "" in node
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 and not optional else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if optional else body
+
+    return emit(trie)
+
+def _keyword_char(char):
+    return r"\s+" if char == " " else re.escape(char)
+
+def _profanity_char(char):
+    if char == " ":
+        return r"[\W_]*"  # "bull shit", "bull-shit" and "bullshit"
+    if char in LEET_CHARS:
+        return "[" + re.escape(LEET_CHARS[char]) + "]"
+    return re.escape(char)
+
+class KeywordMatcher:
+    """
+    One precompiled, case-insensitive pattern for profanity and any number
+    of keyword groups (urgency words, per-intent keywords, ...).
+    scan() makes a single pass over the text and returns profanity spans
+    plus, per group, the distinct keywords found in order of appearance.
+    Keywords match at the start of a word ("harass" matches "harassment");
+    profane words must match a whole word, look-alike characters included.
+    """
+
+    def __init__(self, groups=None, profanity_words=None):
+        groups = groups or {}
+        profanity_words = PROFANITY_WORDS if profanity_words is None else profanity_words
+
+        self.groups = {name: [word.lower() for word in words] for name, words in groups.items()}
+        self._word_groups = {}
+        for name, words in self.groups.items():
+            for word in words:
+                self._word_groups.setdefault(word, []).append(name)
+        # The longest keyword wins at a position, so it also credits keywords that are its prefixes
+        self._expansions = {word: [k for k in self._word_groups if word.startswith(k)] for word in self._word_groups}
+
+        parts = []
+        if profanity_words:
+            words = {word.lower() for word in profanity_words}
+            parts.append(rf"(?<![{WORD_CHARS}])(?P<profanity>{_trie_pattern(words, _profanity_char)})(?![{WORD_CHARS}])")
+        if self._word_groups:
+            parts.append(rf"\b(?P<keyword>{_trie_pattern(self._word_groups, _keyword_char)})")
+        self.pattern = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+    def scan(self, text):
+        """
+        Returns {"profanity": [(start, end), ...], "hits": {group: [keyword, ...]}}.
+        """
+        profanity_spans = []
+        hits = {name: [] for name in self.groups}
+        if self.pattern is None or not text:
+            return {"profanity": profanity_spans, "hits": hits}
+
+        for match in self.pattern.finditer(text):
+            if match.lastgroup == "profanity":
+                profanity_spans.append(match.span())
+                continue
+            word = re.sub(r"\s+", " ", match.group().lower())
+            for keyword in self._expansions.get(word, ()):
+                for name in self._word_groups[keyword]:
+                    if keyword not in hits[name]:
+                        hits[name].append(keyword)
+        return {"profanity": profanity_spans, "hits": hits}
+
+    def counts(self, result):
+        """Distinct keyword hits per group."""
+        return {name: len(words) for name, words in result["hits"].items()}
+
+    def censor(self, text, spans=None):
+        """Replaces profane words with ****. Pass spans from scan() to skip rescanning."""
+        if spans is None:
+            spans = self.scan(text)["profanity"]
+        if not spans:
+            return text
+        pieces, last = [], 0
+        for start, end in spans:
+            pieces.append(text[last:start])
+            pieces.append(CENSOR)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces)
+
+    def censor_segments(self, texts):
+        """
+        Censors several texts (e.g. transcript segments) with one scan over
+        their concatenation. Returns the censored texts in order.
+        """
+        joined = "\n".join(texts)
+        spans = self.scan(joined)["profanity"]
+        censored, offset = [], 0
+        for text in texts:
+            end = offset + len(text)
+            local = [(start - offset, stop - offset) for start, stop in spans if start >= offset and stop <= end]
+            censored.append(self.censor(text, local))
+            offset = end + 1
+        return censored
+
+if __name__ == "__main__":
+    import time
+    from better_profanity import profanity
+
+    matcher = KeywordMatcher({"urgency": ["help", "fire", "trapped"], "police": ["thief", "robber", "gun"]})
+    text = "Help! There's a f*cking fire and a robber with a gun, we're trapped, help help " * 4
+
+    start = time.perf_counter()
+    for _ in range(200):
+        result = matcher.scan(text)
+    print(f"KeywordMatcher.scan: {(time.perf_counter() - start) / 200 * 1000:.3f} ms, {matcher.counts(result)}")
+    print(matcher.censor(text[:80]))
+
+    profanity.load_censor_words()
+    start = time.perf_counter()
+    for _ in range(20):
+        censored = profanity.censor(text)
+    print(f"profanity.censor: {(time.perf_counter() - start) / 20 * 1000:.3f} ms")
+    print(censored[:80])
@@ -0,0 +1,170 @@
+import re
+import math
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = ['en', 'hi', 'kn', 'ta', 'te']
+
+# Unicode blocks of the native scripts (Hindi is written in Devanagari)
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, 'hi'),
+    (0x0B80, 0x0BFF, 'ta'),
+    (0x0C00, 0x0C7F, 'te'),
+    (0x0C80, 0x0CFF, 'kn'),
+]
+
+NGRAM_ORDERS = (1, 2, 3)
+SMOOTHING = 0.5
+HINT_CONFIDENCE = 0.6   # Whisper language probability needed to trust its guess for Latin text
+LATIN_WORD = re.compile(r"[a-z]+")
+
+# Seed phrases for the Latin-script model: English and the romanized
+# ("Hinglish"-style) spelling users type on English keyboards
+SEED_PHRASES = {
+    'en': [
+        "help there is a fire in my house", "someone is following me and I am scared",
+        "please send an ambulance quickly", "my husband is beating me", "call the police now",
+        "there has been an accident on the highway", "a thief broke into my house",
+        "my mother fainted and is not breathing", "I smell gas in the kitchen",
+        "someone stole my phone and wallet", "he is bleeding a lot from his head",
+        "we are trapped on the third floor", "a man is harassing me at the bus stop",
+        "I feel very unsafe walking home alone", "my child is missing since the morning",
+        "the building is full of smoke", "I need to go to the hospital",
+        "there is a gun and they are fighting", "can you hear me please answer",
+        "what should I do now", "I want to report a crime", "the car hit a pedestrian",
+    ],
+    'hi': [
+        "aag lagi hai", "bachao koi meri madad karo", "mere ghar mein chor ghus gaya hai",
+        "jaldi police ko bulao", "ambulance bhejo jaldi", "mujhe bahut dard ho raha hai",
+        "mera accident ho gaya hai", "koi mera peecha kar raha hai", "mujhe dar lag raha hai",
+        "yahan bahut dhuan hai", "mere pati mujhe maarte hain", "khoon beh raha hai",
+        "woh saans nahi le raha", "kripya jaldi aaiye", "hum fas gaye hain",
+        "mera phone chori ho gaya", "ladki ko pareshan kar rahe hain", "mujhe hospital jana hai",
+        "gas leak ho raha hai kya karun", "meri maa behosh ho gayi hai",
+        "yeh aadmi mujhe dhamki de raha hai", "kya aap meri baat sun rahe ho",
+    ],
+    'kn': [
+        "benki hattide", "nanage sahaya maadi", "kaapaadi yaaradru", "manege kalla bandidaane",
+        "bega police kareyiri", "ambulance kalisi bega", "nanage thumba novu aagtide",
+        "apaghata aagide", "yaaro nanna hinde baruttiddaare", "nanage bhaya aagtide",
+        "illi thumba hoge ide", "raktha hariyuttide", "avaru usiraadutilla",
+        "dayavittu bega banni", "naavu sikkihaakikondiddeve", "nanna phone kaleduhoyitu",
+        "aspatrege hogabeku", "gas leak aagtide enu maadali", "nanna amma prajne tappiddaare",
+        "nanna ganda nanage hodeyuttaane", "neevu keltiddira",
+    ],
+    'ta': [
+        "thee pidichirukku", "enakku udhavi seiyungal", "kaapaathunga yaaravathu",
+        "veetukku thirudan vanthutaan", "seekiram police kooppidunga", "ambulance anuppunga seekiram",
+        "enakku romba vali irukku", "vibathu aayiduchu", "yaaro ennai pinthodarkiraanga",
+        "enakku bayama irukku", "inga romba pugai irukku", "ratham varuthu", "avar moochu vidala",
+        "thayavu seithu seekiram vaanga", "naanga maatikittom", "en phone thirudu poyiduchu",
+        "hospital ponum", "gas leak aaguthu enna pannurathu", "en amma mayakkam aayitaanga",
+        "en purushan ennai adikiraar", "neenga kekkureengala",
+    ],
+    'te': [
+        "manta antukundi", "naaku sahayam cheyandi", "kaapaadandi evaraina", "intlo donga dooraadu",
+        "tondaraga police ni pilavandi", "ambulance pampandi tondaraga", "naaku chaala noppi ga undi",
+        "pramadam jarigindi", "evaro nannu vembadistunnaru", "naaku bhayam ga undi",
+        "ikkada chaala poga undi", "raktham kaarutondi", "atanu swasa teeskovatledu",
+        "dayachesi tondaraga randi", "memu chikkukunnamu", "naa phone dongilincharu",
+        "aasupatri ki vellali", "gas leak avutondi emi cheyali", "maa amma spruha kolpoyindi",
+        "naa bharta nannu kodutunnadu", "meeru vintunnara",
+    ],
+}
+
+def _ngrams(text):
+    """Character 1-3 grams of each Latin word, padded with spaces at the edges."""
+    grams = []
+    for word in LATIN_WORD.findall(text.lower()):
+        padded = f" {word} "
+        for n in NGRAM_ORDERS:
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+class LanguageDetector:
+    """
+    In-process language identification for en/hi/kn/ta/te.
+    Native-script text is decided by Unicode block counts. Latin-script text
+    (English or romanized Indian languages) goes through a naive Bayes
+    character n-gram model trained on SEED_PHRASES. Whisper's detected
+    language can be passed as a hint for transcribed speech.
+    """
+
+    def __init__(self, phrases=None):
+        phrases = phrases or SEED_PHRASES
+        counts = {lang: Counter(g for phrase in texts for g in _ngrams(phrase)) for lang, texts in phrases.items()}
+        self.languages = list(counts)
+        vocabulary = set().union(*counts.values())
+        # One tuple of per-language log-probabilities per known n-gram
+        self.log_probs = {}
+        totals = {lang: sum(c.values()) + SMOOTHING * len(vocabulary) for lang, c in counts.items()}
+        for gram in vocabulary:
+            self.log_probs[gram] = tuple(math.log((counts[lang][gram] + SMOOTHING) / totals[lang])
+                                         for lang in self.languages)
+
+    def _script_counts(self, text):
+        native = Counter()
+        latin = 0
+        for char in text:
+            code = ord(char)
+            if code < 0x0900:
+                latin += ('a' <= char <= 'z') or ('A' <= char <= 'Z')
+                continue
+            for start, end, lang in SCRIPT_RANGES:
+                if start <= code <= end:
+                    native[lang] += 1
+                    break
+        return native, latin
+
+    def detect(self, text, hint=None, hint_confidence=0.0, default='en'):
+        """
+        Returns {"lang", "confidence", "script": "native"|"latin"|"none",
+        "source": "script"|"ngram"|"whisper"|"default"}.
+        """
+        native, latin = self._script_counts(text or "")
+        native_total = sum(native.values())
+
+        if native_total and native_total >= latin:
+            lang, count = native.most_common(1)[0]
+            return {"lang": lang, "confidence": round(count / (native_total + latin), 3),
+                    "script": "native", "source": "script"}
+
+        if hint in LANGUAGES and hint_confidence >= HINT_CONFIDENCE:
+            return {"lang": hint, "confidence": round(hint_confidence, 3),
+                    "script": "latin" if latin else "none", "source": "whisper"}
+
+        rows = [self.log_probs[gram] for gram in _ngrams(text or "") if gram in self.log_probs]
+        if not rows:
+            return {"lang": default, "confidence": 0.0, "script": "latin" if latin else "none", "source": "default"}
+
+        scores = [sum(column) for column in zip(*rows)]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        total = sum(math.exp(s - scores[best]) for s in scores)
+        return {"lang": self.languages[best], "confidence": round(1 / total, 3), "script": "latin", "source": "ngram"}
+
+if __name__ == "__main__":
+    import time
+
+    detector = LanguageDetector()
+    samples = [
+        ("there is smoke coming from the building next door", 'en'),
+        ("mere bhai ko chot lagi hai jaldi aao", 'hi'),
+        ("nanna magu kaanisuttilla", 'kn'),
+        ("enga veetla thee pidichiruchu", 'ta'),
+        ("maa intlo donga unnadu", 'te'),
+        ("आग लगी है बचाओ", 'hi'),
+        ("ಬೆಂಕಿ ಹತ್ತಿದೆ", 'kn'),
+        ("தீ பிடித்தது உதவி", 'ta'),
+        ("మంట అంటుకుంది", 'te'),
+    ]
+    correct = 0
+    start = time.perf_counter()
+    for _ in range(100):
+        results = [detector.detect(text) for text, _ in samples]
+    elapsed = (time.perf_counter() - start) / (100 * len(samples)) * 1e6
+    for (text, expected), result in zip(samples, results):
+        correct += result["lang"] == expected
+        print(f"{expected} -> {result['lang']} ({result['confidence']:.2f}, {result['source']}): {text}")
+    print(f"{correct}/{len(samples)} correct, {elapsed:.0f} µs per call")
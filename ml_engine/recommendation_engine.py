@@ -11,8 +11,14 @@ except ImportError:
     print("⚠️ Torch/Sentence-Transformers not found. Using simple keyword matching.")
     TRANSFORMERS_AVAILABLE = False
 
+# How many top-scored helplines get their proximity boost recomputed from travel time
+RERANK_CANDIDATES = 5
+
 class HelplineRecommender:
-    def __init__(self, data_path=None):
+    def __init__(self, data_path=None, routing_engine=None):
+        # Optional RoutingEngine used to re-rank nearby helplines by travel time
+        self.routing_engine = routing_engine
+
         if data_path is None:
             # Default to helplines.json in the same directory as this script
             base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -122,15 +128,58 @@ class HelplineRecommender:
                 "helpline": helpline,
                 "score": final_score,
                 "distance_km": round(distance_km, 2) if distance_km != float('inf') else None,
+                "eta_minutes": None,
                 "reason": " ".join(reasons) if reasons else "Recommended based on general relevance."
             })
 
         # Sort by score descending
         scores.sort(key=lambda x: x['score'], reverse=True)
+
+        if self.routing_engine and user_lat and user_lon:
+            self._rerank_by_travel_time(scores, user_lat, user_lon)
         
         # Return Top 3
         return scores[:3]
 
+    def _rerank_by_travel_time(self, scores, user_lat, user_lon):
+        """
+        Swaps the straight-line proximity boost for one based on travel time,
+        for the whole list so scores stay comparable. The top candidates get
+        road times from a single batched routing call; the rest get their
+        straight-line distance scaled by the detour those routes showed.
+        Sorts in place.
+        """
+        located = [s for s in scores if 'lat' in s['helpline']]
+        top = located[:RERANK_CANDIDATES]
+        if not top:
+            return
+
+        times = self.routing_engine.travel_times(
+            user_lat, user_lon, [(s['helpline']['lat'], s['helpline']['lon']) for s in top], mode='driving'
+        )
+        distances = [self._haversine_distance(user_lat, user_lon, s['helpline']['lat'], s['helpline']['lon'])
+                     for s in located]
+        # Road minutes per straight-line km; 2 min/km ~ 30 km/h city driving if nothing usable was routed
+        ratios = sorted(eta / d for eta, d in zip(times, distances) if d > 0.1 and math.isfinite(eta))
+        minutes_per_km = ratios[len(ratios) // 2] if ratios else 2.0
+
+        for i, (entry, distance_km) in enumerate(zip(located, distances)):
+            eta = times[i] if i < len(times) else distance_km * minutes_per_km
+            # 2 min/km keeps the travel-time boost on the proximity boost's scale
+            entry['score'] -= (1.0 / (1.0 + distance_km)) * 5.0
+            entry['score'] += (1.0 / (1.0 + eta / 2.0)) * 5.0
+            if i >= len(times):
+                continue
+            entry['eta_minutes'] = round(eta)
+            if eta < 15:
+                reason = f"About {round(eta)} min away."
+                if entry['reason'].startswith("Recommended based on"):
+                    entry['reason'] = reason
+                else:
+                    entry['reason'] = f"{entry['reason']} {reason}"
+
+        scores.sort(key=lambda x: x['score'], reverse=True)
+
     def _calculate_similarity_simple(self, text1, text2):
         tokens1 = self._tokenize(text1)
         tokens2 = self._tokenize(text2)
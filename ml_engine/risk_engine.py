@@ -1,10 +1,391 @@
+import json
+import logging
 import math
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEG = 111.32
+
+# Grid cell size for the zone index (0.05 deg ~ 5.5 km)
+INDEX_CELL_DEG = 0.05
+# Zones spanning more cells than this are kept in a short list checked on every query
+MAX_CELLS_PER_ZONE = 400
+# Vertices used when a circular zone is drawn as a polygon
+CIRCLE_SEGMENTS = 32
+# Spacing of sample points when checking a route against the zones
+PATH_SAMPLE_KM = 0.05
+# How often the zone store checks its source files for changes
+ZONE_POLL_SECONDS = 5
+# Fields every zone needs to raise an alert
+REQUIRED_ZONE_FIELDS = ('id', 'type', 'severity', 'title', 'message')
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Calculates distance in KM between two coordinates."""
+    R = 6371  # Earth radius in km
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2) * math.sin(dlat/2) + \
+        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
+        math.sin(dlon/2) * math.sin(dlon/2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+def haversine_km_np(lats1, lons1, lats2, lons2):
+    """Vectorized haversine distance in KM (broadcasts over arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lats1, lons1, lats2, lons2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def points_in_polygon(lats, lons, edges):
+    """
+    Vectorized even-odd ray casting.
+    lats/lons: arrays of N points. edges: (x0, y0, x1, y1) arrays of E edges in
+    lon/lat, covering every ring of the (multi)polygon.
+    Returns a boolean array of N: True where the point is inside.
+    """
+    px = np.asarray(lons, dtype=np.float64)[:, None]
+    py = np.asarray(lats, dtype=np.float64)[:, None]
+    x0, y0, x1, y1 = edges
+
+    straddles = (y0 > py) != (y1 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    crossings = straddles & (px < x_cross)
+    return (np.count_nonzero(crossings, axis=1) % 2) == 1
+
+class ZoneShape:
+    """
+    Precomputed geometry for one zone.
+    Zones are either circles ('lat', 'lon', 'radius_km') or carry a GeoJSON
+    'geometry' (Polygon / MultiPolygon, [lon, lat] order). Polygons keep their
+    bounding box and flat edge arrays so containment is one NumPy pass.
+    """
+
+    def __init__(self, zone):
+        geometry = zone.get('geometry')
+        self.edges = None
+
+        if geometry and geometry['type'] in ('Polygon', 'MultiPolygon'):
+            polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+            rings = [np.asarray(ring, dtype=np.float64) for polygon in polygons for ring in polygon]
+            starts = np.concatenate([ring for ring in rings])
+            ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+            self.edges = (starts[:, 0], starts[:, 1], ends[:, 0], ends[:, 1])
+
+            self.bounds = (starts[:, 1].min(), starts[:, 0].min(), starts[:, 1].max(), starts[:, 0].max())
+            outer = np.asarray(polygons[0][0], dtype=np.float64)
+            self.center = (float(outer[:, 1].mean()), float(outer[:, 0].mean()))
+            self.geometry = geometry
+        else:
+            lat, lon, radius_km = zone['lat'], zone['lon'], zone['radius_km']
+            dlat = radius_km / KM_PER_DEG
+            dlon = radius_km / (KM_PER_DEG * max(math.cos(math.radians(lat)), 0.01))
+            self.bounds = (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+            self.center = (lat, lon)
+            self.radius_km = radius_km
+            self.geometry = None  # Drawn lazily by to_geojson()
+
+    def contains_many(self, lats, lons):
+        """Boolean mask of which points (NumPy arrays) fall inside the zone."""
+        min_lat, min_lon, max_lat, max_lon = self.bounds
+        mask = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        if not mask.any():
+            return mask
+        hits = np.flatnonzero(mask)
+        if self.edges is not None:
+            mask[hits] = points_in_polygon(lats[hits], lons[hits], self.edges)
+        else:
+            mask[hits] = haversine_km_np(lats[hits], lons[hits], self.center[0], self.center[1]) <= self.radius_km
+        return mask
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bounds
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self.edges is not None:
+            return bool(points_in_polygon([lat], [lon], self.edges)[0])
+        return haversine_km(lat, lon, self.center[0], self.center[1]) <= self.radius_km
+
+    def to_geojson(self):
+        """Polygon geometry for the zone; circles become a CIRCLE_SEGMENTS-gon."""
+        if self.geometry is None:
+            lat, lon = self.center
+            dlat = (self.bounds[2] - self.bounds[0]) / 2
+            dlon = (self.bounds[3] - self.bounds[1]) / 2
+            angles = np.linspace(0, 2 * np.pi, CIRCLE_SEGMENTS, endpoint=False)
+            ring = [[lon + dlon * math.cos(a), lat + dlat * math.sin(a)] for a in angles]
+            ring.append(ring[0])
+            self.geometry = {"type": "Polygon", "coordinates": [ring]}
+        return self.geometry
+
+class ZoneGridIndex:
+    """
+    Uniform lat/lon grid over zone bounding boxes.
+    Each zone is registered in every cell its bounding box overlaps, so a
+    lookup only has to test the zones listed under the user's cell.
+    """
+
+    def __init__(self, shapes, cell_deg=INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.large_zones = []
+
+        for idx, shape in enumerate(shapes):
+            min_lat, min_lon, max_lat, max_lon = shape.bounds
+            row0, col0 = self._cell(min_lat, min_lon)
+            row1, col1 = self._cell(max_lat, max_lon)
+            if (row1 - row0 + 1) * (col1 - col0 + 1) > MAX_CELLS_PER_ZONE:
+                self.large_zones.append(idx)
+                continue
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    self.cells.setdefault((row, col), []).append(idx)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def candidates_for_points(self, lats, lons):
+        """Indices of zones overlapping any of the points' cells (NumPy arrays), in zone order."""
+        rows = np.floor(lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(lons / self.cell_deg).astype(np.int64)
+        found = set(self.large_zones)
+        for cell in set(zip(rows.tolist(), cols.tolist())):
+            found.update(self.cells.get(cell, ()))
+        return sorted(found)
+
+    def candidates(self, lat, lon):
+        """Indices of zones whose bounding box may contain the point, in zone order."""
+        found = self.cells.get(self._cell(lat, lon), [])
+        if self.large_zones:
+            return sorted(found + self.large_zones)
+        return found
+
+class ZoneSnapshot:
+    """
+    Immutable, fully indexed view of the zones at one version.
+    Readers take the current snapshot once per request and never lock; the
+    store builds a replacement off to the side and swaps the reference.
+    """
+
+    def __init__(self, version, zones, shapes):
+        self.version = version
+        self.zones = tuple(zones)
+        self.shapes = tuple(shapes)
+        self.index = ZoneGridIndex(self.shapes)
+        self.positions = {zone['id']: idx for idx, zone in enumerate(self.zones)}
+        self.built_at = time.time()
+
+    def is_active(self, idx, now):
+        zone = self.zones[idx]
+        valid_from = zone.get('valid_from')
+        valid_until = zone.get('valid_until')
+        return (valid_from is None or valid_from <= now) and (valid_until is None or now < valid_until)
+
+class ZoneStore:
+    """
+    Master copy of the risk zones with delta updates.
+    Deltas and file reloads mark the store dirty; a background thread
+    coalesces them into one rebuild and publishes a new ZoneSnapshot.
+    Zones may carry 'valid_from' / 'valid_until' (epoch seconds or ISO 8601).
+    """
+
+    def __init__(self, zones=(), poll_interval=ZONE_POLL_SECONDS):
+        self.poll_interval = poll_interval
+        self._zones = {}           # id -> zone dict, guarded by _lock
+        self._sources = {}         # file path -> (mtime, ids loaded from it)
+        self._shape_cache = {}     # id -> (zone dict, ZoneShape), reused across rebuilds
+        self._version = 0
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._worker = None
+
+        for zone in zones:
+            zone = self._normalize(zone)
+            self._zones[zone['id']] = zone
+        self.snapshot = ZoneSnapshot(0, [], [])
+        self.rebuild()
+
+    # --- Updates ---
+
+    def apply_delta(self, delta, wait=False):
+        """
+        Applies { "add": [zone, ...], "modify": [{"id": ..., field: value}, ...],
+                  "expire": ["zone_id" | {"id": ..., "at": time}, ...],
+                  "remove": ["zone_id", ...] }.
+        Every zone is validated first: a bad entry raises ValueError and
+        nothing is applied. Returns the new store version. With wait=True the
+        new snapshot is published before returning; otherwise the background
+        thread picks it up.
+        """
+        with self._lock:
+            updates, shapes = {}, {}
+            for zone in delta.get('add', []):
+                zone = self._normalize(zone)
+                shapes[zone['id']] = _build_shape(zone)
+                updates[zone['id']] = zone
+            for change in delta.get('modify', []):
+                if not isinstance(change, dict):
+                    raise ValueError(f"modify entries are {{id, field: value}} objects, got {change!r}")
+                current = updates.get(change.get('id')) or self._zones.get(change.get('id'))
+                if current is None:
+                    logger.warning(f"⚠️ Zone update for unknown zone: {change.get('id')}")
+                    continue
+                zone = self._normalize({**current, **change})
+                shapes[zone['id']] = _build_shape(zone)
+                updates[zone['id']] = zone
+            for item in delta.get('expire', []):
+                if not isinstance(item, (str, dict)):
+                    raise ValueError(f"expire entries are zone ids or {{id, at}}, got {item!r}")
+                zone_id, at = (item, None) if isinstance(item, str) else (item.get('id'), item.get('at'))
+                current = updates.get(zone_id) or self._zones.get(zone_id)
+                if current is not None:
+                    updates[zone_id] = {**current, 'valid_until': _parse_time(at) or time.time()}
+            removed = [zone_id for zone_id in delta.get('remove', []) if zone_id not in updates]
+
+            # Validated: apply everything at once
+            for zone_id in removed:
+                self._zones.pop(zone_id, None)
+            self._zones.update(updates)
+            self._shape_cache.update((zone_id, (updates[zone_id], shape)) for zone_id, shape in shapes.items())
+            self._version += 1
+            version = self._version
+
+        if wait:
+            self.rebuild()
+        else:
+            self._schedule()
+        return version
+
+    def load_file(self, path, wait=True):
+        """
+        Loads zones from a JSON file: a list of zones, a GeoJSON FeatureCollection
+        (zone fields in properties) or a delta object. The file is then polled
+        and reloaded when it changes; zones it no longer lists are dropped.
+        """
+        mtime = os.path.getmtime(path)
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        if isinstance(data, dict) and data.get('type') == 'FeatureCollection':
+            data = [{**feature['properties'], 'geometry': feature['geometry']} for feature in data['features']]
+        delta = data if isinstance(data, dict) else {'add': data}
+
+        loaded_ids = {zone['id'] for zone in delta.get('add', [])}
+        _, previous_ids = self._sources.get(path, (None, set()))
+        delta = {**delta, 'remove': list(delta.get('remove', [])) + sorted(previous_ids - loaded_ids)}
+        try:
+            version = self.apply_delta(delta, wait=wait)
+        except ValueError:
+            # Keep the last good zones, and don't retry until the file changes again
+            self._sources[path] = (mtime, previous_ids)
+            raise
+        self._sources[path] = (mtime, loaded_ids)
+
+        logger.info(f"Loaded {len(loaded_ids)} risk zones from {path}")
+        return version
+
+    # --- Snapshot Publishing ---
+
+    def rebuild(self):
+        """Builds and publishes a snapshot of the current zones (runs on the caller's thread)."""
+        with self._lock:
+            version = self._version
+            zones = list(self._zones.values())
+
+        valid, shapes = [], []
+        shape_cache = {}
+        for zone in zones:
+            cached = self._shape_cache.get(zone['id'])
+            if cached and cached[0] is zone:
+                shape = cached[1]
+            else:
+                try:
+                    shape = _build_shape(zone)
+                except ValueError as e:
+                    # One bad zone must not keep every other update from going live
+                    logger.warning(f"⚠️ Skipping invalid zone: {e}")
+                    continue
+            shape_cache[zone['id']] = (zone, shape)
+            valid.append(zone)
+            shapes.append(shape)
+
+        snapshot = ZoneSnapshot(version, valid, shapes)
+        with self._publish_lock:
+            # A slower rebuild must never replace a newer snapshot
+            if snapshot.version >= self.snapshot.version:
+                self._shape_cache = shape_cache
+                self.snapshot = snapshot
+        return self.snapshot
+
+    def start(self):
+        """Starts the background rebuild / file polling thread."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="zone-store", daemon=True)
+            self._worker.start()
+
+    def _schedule(self):
+        self.start()
+        self._dirty.set()
+
+    def _run(self):
+        while True:
+            self._dirty.wait(timeout=self.poll_interval)
+            self._poll_files()
+            if self._dirty.is_set():
+                self._dirty.clear()
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    logger.error(f"Zone index rebuild failed: {e}")
+
+    def _poll_files(self):
+        for path, (mtime, _) in list(self._sources.items()):
+            try:
+                if os.path.getmtime(path) != mtime:
+                    self.load_file(path, wait=False)
+            except Exception as e:
+                logger.error(f"Reloading zones from {path} failed: {e}")
+
+    def _normalize(self, zone):
+        if not isinstance(zone, dict):
+            raise ValueError(f"zone must be an object, got {type(zone).__name__}")
+        zone = dict(zone)
+        for key in ('valid_from', 'valid_until'):
+            if key in zone:
+                zone[key] = _parse_time(zone[key])
+        return zone
+
+def _build_shape(zone):
+    """ZoneShape for a zone; raises ValueError if a required field or its geometry is missing or unusable."""
+    missing = [key for key in REQUIRED_ZONE_FIELDS if zone.get(key) in (None, '')]
+    if missing:
+        raise ValueError(f"zone {zone.get('id')!r} is missing {', '.join(missing)}")
+    try:
+        shape = ZoneShape(zone)
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        raise ValueError(f"zone {zone['id']!r} needs lat/lon/radius_km or a Polygon geometry ({e})")
+    if not np.all(np.isfinite(shape.bounds)):
+        raise ValueError(f"zone {zone['id']!r} has non-finite coordinates")
+    return shape
+
+def _parse_time(value):
+    """Epoch seconds from a number or ISO 8601 string (None passes through)."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
 
 class RiskEngine:
-    def __init__(self):
+    def __init__(self, zones_path=None):
         # Mock Database of High-Risk Zones
         # In production, this would come from a live database or external API (e.g., weather API, crime stats)
-        self.risk_zones = [
+        default_zones = [
             {
                 "id": "z1",
                 "type": "crime_hotspot",
@@ -44,19 +425,78 @@ class RiskEngine:
                 "severity": "warning",
                 "title": "Heavy Smog Alert",
                 "message": "Air Quality Index (AQI) is severe. Wear a mask."
+            },
+            {
+                "id": "z5",
+                "type": "flood",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[
+                        [77.6550, 12.9300], [77.6800, 12.9280], [77.6900, 12.9400],
+                        [77.6750, 12.9520], [77.6560, 12.9450], [77.6550, 12.9300]
+                    ]]
+                },
+                "severity": "high",
+                "title": "Waterlogging Alert",
+                "message": "Roads around the lake are flooded. Avoid low-lying underpasses."
             }
         ]
+        self.zone_store = ZoneStore(default_zones)
+        self._hotspot_zones = {}  # Zones last published by sync_hotspots()
+        self._hotspot_lock = threading.Lock()
+        if zones_path:
+            self.zone_store.load_file(zones_path)
+
+    @property
+    def risk_zones(self):
+        return list(self.zone_store.snapshot.zones)
+
+    def get_zone_geometry(self, zone_id):
+        """GeoJSON Polygon/MultiPolygon for a zone (circles are approximated)."""
+        snapshot = self.zone_store.snapshot
+        idx = snapshot.positions.get(zone_id)
+        return snapshot.shapes[idx].to_geojson() if idx is not None else None
+
+    def add_zones(self, zones):
+        """Adds zones (same shape as risk_zones entries) and re-indexes."""
+        self.zone_store.apply_delta({'add': zones}, wait=True)
+
+    def sync_hotspots(self, hotspots):
+        """
+        Mirrors detected incident hotspots (HeatmapEngine.get_hotspots()) as
+        circular zones, so emerging danger areas raise alerts without manual
+        zone entry. Hotspots that disappeared are removed from the store (not
+        just expired, so they don't pile up). Returns the number
+        of hotspot zones now active.
+        """
+        zones = {}
+        for hotspot in hotspots:
+            crisis_type = hotspot['type']
+            z_score = hotspot['z_score']
+            zones[hotspot['id']] = {
+                "id": hotspot['id'],
+                "type": f"{crisis_type}_hotspot",
+                "lat": hotspot['lat'],
+                "lon": hotspot['lon'],
+                "radius_km": hotspot['radius_km'],
+                "severity": "critical" if z_score >= 6 else "high" if z_score >= 4 else "medium",
+                "title": f"Emerging {crisis_type.replace('_', ' ').title()} Hotspot",
+                "message": f"{hotspot['reports']} reports nearby in the last 24 hours. Stay alert and avoid the area if you can.",
+                "source": "hotspot"
+            }
+
+        with self._hotspot_lock:
+            if zones == self._hotspot_zones:
+                return len(zones)
+            changed = [zone for zone_id, zone in zones.items() if self._hotspot_zones.get(zone_id) != zone]
+            gone = [zone_id for zone_id in self._hotspot_zones if zone_id not in zones]
+            self.zone_store.apply_delta({'add': changed, 'remove': gone})
+            self._hotspot_zones = zones
+        return len(zones)
 
     def _haversine_distance(self, lat1, lon1, lat2, lon2):
         """Calculates distance in KM between two coordinates."""
-        R = 6371  # Earth radius in km
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2) * math.sin(dlat/2) + \
-            math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-            math.sin(dlon/2) * math.sin(dlon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+        return haversine_km(lat1, lon1, lat2, lon2)
 
     def check_risks(self, user_lat, user_lon):
         """
@@ -64,11 +504,15 @@ class RiskEngine:
         Returns a list of active alerts.
         """
         active_alerts = []
+        snapshot = self.zone_store.snapshot
+        now = time.time()
         
-        for zone in self.risk_zones:
-            distance = self._haversine_distance(user_lat, user_lon, zone['lat'], zone['lon'])
+        for idx in snapshot.index.candidates(user_lat, user_lon):
+            zone = snapshot.zones[idx]
+            shape = snapshot.shapes[idx]
             
-            if distance <= zone['radius_km']:
+            if snapshot.is_active(idx, now) and shape.contains(user_lat, user_lon):
+                distance = self._haversine_distance(user_lat, user_lon, *shape.center)
                 active_alerts.append({
                     "zone_id": zone['id'],
                     "type": zone['type'],
@@ -80,7 +524,125 @@ class RiskEngine:
                 
         return active_alerts
 
+    def risks_along_path(self, polyline, sample_km=PATH_SAMPLE_KM):
+        """
+        Checks a whole route against the risk zones in one batched pass.
+        polyline: [[lat, lon], ...]. Segments are densified to points every
+        sample_km, and each candidate zone tests all points at once.
+        Returns one entry per zone crossed, with the distance along the route
+        (km) where the route first enters and last leaves it.
+        """
+        if not polyline:
+            return []
+
+        lats, lons, along_km = self._densify(polyline, sample_km)
+        snapshot = self.zone_store.snapshot
+        now = time.time()
+        risks = []
+
+        for idx in snapshot.index.candidates_for_points(lats, lons):
+            if not snapshot.is_active(idx, now):
+                continue
+            inside = snapshot.shapes[idx].contains_many(lats, lons)
+            if not inside.any():
+                continue
+
+            # Runs of consecutive inside samples = separate passes through the zone
+            edges = np.diff(np.concatenate(([0], inside.astype(np.int8), [0])))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1) - 1
+
+            zone = snapshot.zones[idx]
+            risks.append({
+                "zone_id": zone['id'],
+                "type": zone['type'],
+                "severity": zone['severity'],
+                "title": zone['title'],
+                "message": zone['message'],
+                "entry_km": round(float(along_km[starts[0]]), 2),
+                "exit_km": round(float(along_km[ends[-1]]), 2),
+                "passes": [[round(float(along_km[a]), 2), round(float(along_km[b]), 2)] for a, b in zip(starts, ends)]
+            })
+
+        risks.sort(key=lambda r: r['entry_km'])
+        return risks
+
+    def _densify(self, polyline, sample_km):
+        """Sample points every sample_km along the polyline, with cumulative distance."""
+        points = np.asarray(polyline, dtype=np.float64)
+        if len(points) == 1:
+            return points[:, 0], points[:, 1], np.zeros(1)
+
+        seg_km = haversine_km_np(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+        steps = np.maximum(np.ceil(seg_km / sample_km).astype(np.int64), 1)
+
+        # Fractions along each segment, then the final vertex
+        seg_idx = np.repeat(np.arange(len(seg_km)), steps)
+        offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+        frac = offsets / steps[seg_idx]
+
+        lats = np.append(points[seg_idx, 0] + (points[seg_idx + 1, 0] - points[seg_idx, 0]) * frac, points[-1, 0])
+        lons = np.append(points[seg_idx, 1] + (points[seg_idx + 1, 1] - points[seg_idx, 1]) * frac, points[-1, 1])
+        seg_start_km = np.concatenate(([0.0], np.cumsum(seg_km)[:-1]))
+        along_km = np.append(seg_start_km[seg_idx] + seg_km[seg_idx] * frac, seg_km.sum())
+        return lats, lons, along_km
+
 if __name__ == "__main__":
     engine = RiskEngine()
     # Test Bangalore
     print(engine.check_risks(12.9720, 77.5950))
+    print(engine.check_risks(12.9400, 77.6700))
+    # Route from the city centre through the flood zone
+    print(engine.risks_along_path([[12.9716, 77.5946], [12.9400, 77.6400], [12.9400, 77.7000]]))
+
+    # --- Benchmark: 100k synthetic zones ---
+    import random
+    import time
+
+    def synthetic_polygon(lat, lon, size_deg, sides=12):
+        ring = [[lon + size_deg * random.uniform(0.5, 1.0) * math.cos(2 * math.pi * k / sides),
+                 lat + size_deg * random.uniform(0.5, 1.0) * math.sin(2 * math.pi * k / sides)]
+                for k in range(sides)]
+        return {"type": "Polygon", "coordinates": [ring + [ring[0]]]}
+
+    random.seed(7)
+    zones = []
+    for i in range(100000):
+        zone = {
+            "id": f"bench{i}",
+            "type": random.choice(["crime_hotspot", "accident_zone", "flood"]),
+            "lat": random.uniform(8.0, 32.0),
+            "lon": random.uniform(68.0, 92.0),
+            "radius_km": random.uniform(0.2, 3.0),
+            "severity": "medium",
+            "title": "Synthetic Zone",
+            "message": "Benchmark zone."
+        }
+        if i % 3 == 0:  # A third of the zones are polygons
+            zone["geometry"] = synthetic_polygon(zone["lat"], zone["lon"], zone["radius_km"] / KM_PER_DEG)
+        zones.append(zone)
+    queries = [(random.uniform(8.0, 32.0), random.uniform(68.0, 92.0)) for _ in range(1000)]
+
+    start = time.perf_counter()
+    engine.add_zones(zones)
+    print(f"Index build: {(time.perf_counter() - start) * 1000:.0f} ms for {len(engine.risk_zones)} zones")
+
+    start = time.perf_counter()
+    indexed = [engine.check_risks(lat, lon) for lat, lon in queries]
+    indexed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    linear = [
+        [z['id'] for z, shape in zip(engine.risk_zones, engine.zone_store.snapshot.shapes) if shape.contains(lat, lon)]
+        for lat, lon in queries[:20]
+    ]
+    linear_ms = (time.perf_counter() - start) * 1000 / 20
+
+    assert [[a['zone_id'] for a in r] for r in indexed[:20]] == linear
+    print(f"check_risks: {indexed_ms:.3f} ms/query indexed vs {linear_ms:.1f} ms/query linear scan")
+
+    # Delta update: unchanged zones reuse their shapes, so only the index is rebuilt
+    start = time.perf_counter()
+    engine.zone_store.apply_delta({"expire": ["z1"], "modify": [{"id": "z2", "severity": "high"}]}, wait=True)
+    print(f"Delta rebuild: {(time.perf_counter() - start) * 1000:.0f} ms, z1 active: "
+          f"{any(a['zone_id'] == 'z1' for a in engine.check_risks(12.9720, 77.5950))}")
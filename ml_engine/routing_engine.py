@@ -1,9 +1,65 @@
+import heapq
 import math
 import random
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# --- Road Lattice ---
+# The routing core walks a global lattice of road nodes. Every coordinate snaps
+# to the same (row, col) node no matter where the query comes from, and every
+# ARTERIAL_EVERY-th row/column behaves like a main road.
+GRID_SPACING_KM = 0.5
+KM_PER_DEG = 111.32
+GRID_STEP_DEG = GRID_SPACING_KM / KM_PER_DEG
+ARTERIAL_EVERY = 4
+
+# Beyond this straight-line distance we don't search the lattice and fall back
+# to a highway estimate (distance * detour factor / arterial speed).
+MAX_GRAPH_RADIUS_KM = 60
+DETOUR_FACTOR = 1.3
+
+# Road speeds (km/h) per mode and road class
+ROAD_SPEEDS = {
+    'walking': {'local': 5, 'arterial': 5},
+    'driving': {'local': 30, 'arterial': 50},
+    'ambulance': {'local': 45, 'arterial': 65}
+}
+
+# Driving slowdown multiplier by hour of day (index = hour, 1.0 = free flow)
+DRIVING_TRAFFIC_PROFILE = (
+    1.1, 1.1, 1.1, 1.1, 1.1, 1.2,  # 00-05
+    1.3, 1.4, 1.5, 1.5, 1.4, 1.3,  # 06-11 (morning peak)
+    1.3, 1.3, 1.3, 1.3, 1.4, 1.5,  # 12-17
+    1.5, 1.5, 1.4, 1.3, 1.2, 1.1,  # 18-23 (evening peak)
+)
+
+# Route cache bounds
+ROUTE_CACHE_SIZE = 2048          # cached (start node, end node, mode) paths
+TREE_CACHE_SIZE = 16             # shortest-path trees kept for popular destinations
+TREE_RADIUS_KM = 15              # how far a destination tree reaches
+POPULAR_DESTINATION_HITS = 3     # requests to a destination before we build its tree
+DEMAND_TRACK_SIZE = 4096
+
+# Isochrone bounds
+DEFAULT_ISOCHRONE_MINUTES = (5, 10, 15)
+MAX_ISOCHRONE_MINUTES = 60
+ISOCHRONE_CACHE_SIZE = 32
 
 class RoutingEngine:
     def __init__(self):
-        pass
+        # LRU caches: OrderedDict ordered from least to most recently used
+        self._route_cache = OrderedDict()
+        self._tree_cache = OrderedDict()
+        self._destination_demand = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {'route_hits': 0, 'tree_hits': 0, 'misses': 0}
+
+        # Road speeds in use; road_version bumps whenever they change so
+        # anything derived from the network (e.g. isochrones) can be invalidated
+        self.road_speeds = {mode: dict(classes) for mode, classes in ROAD_SPEEDS.items()}
+        self.road_version = 0
+        self._isochrone_cache = OrderedDict()
 
     def _haversine_distance(self, lat1, lon1, lat2, lon2):
         R = 6371  # Earth radius in km
@@ -15,45 +71,416 @@ class RoutingEngine:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
         return R * c
 
-    def calculate_route(self, start_lat, start_lon, end_lat, end_lon, mode='driving'):
+    def calculate_route(self, start_lat, start_lon, end_lat, end_lon, mode='driving', when=None):
         """
-        Calculates a simulated route between two points.
+        Calculates a route between two points over the road lattice.
         Modes: 'walking', 'driving', 'ambulance'
+        Lattice paths are cached per (start node, end node, mode); trips toward
+        popular destinations reuse a shortest-path tree rooted at the destination.
         """
         distance_km = self._haversine_distance(start_lat, start_lon, end_lat, end_lon)
-        
-        # Speed assumptions (km/h)
-        speeds = {
-            'walking': 5,
-            'driving': 40,
-            'ambulance': 60
-        }
-        speed = speeds.get(mode, 40)
-        
-        # Traffic factor (random multiplier)
-        traffic_factor = 1.0
-        if mode == 'driving':
-            traffic_factor = random.uniform(1.1, 1.5) # 10-50% slower due to traffic
-        elif mode == 'ambulance':
-            traffic_factor = 0.9 # Ambulances cut through traffic
-            
-        duration_hours = (distance_km / speed) * traffic_factor
-        duration_mins = round(duration_hours * 60)
-        
-        # Generate Polyline (Simulated waypoints)
-        polyline = self._generate_polyline(start_lat, start_lon, end_lat, end_lon)
-        
+        speeds = self._mode_speeds(mode, when)
+
+        if distance_km > MAX_GRAPH_RADIUS_KM:
+            # Too far for the lattice: simulated highway route
+            duration_mins = round(self._highway_estimate(distance_km, speeds))
+            polyline = self._generate_polyline(start_lat, start_lon, end_lat, end_lon)
+            route_km = distance_km * DETOUR_FACTOR
+        else:
+            start_node = self._snap(start_lat, start_lon)
+            end_node = self._snap(end_lat, end_lon)
+            path, path_minutes = self._lattice_path(start_node, end_node, mode, speeds, when)
+
+            access = self._access_minutes(start_lat, start_lon, start_node, speeds) + \
+                self._access_minutes(end_lat, end_lon, end_node, speeds)
+            duration_mins = round(path_minutes + access)
+
+            polyline = [[start_lat, start_lon]] + \
+                [list(self._node_coords(n)) for n in self._turn_points(path)] + \
+                [[end_lat, end_lon]]
+            route_km = sum(
+                self._haversine_distance(a[0], a[1], b[0], b[1])
+                for a, b in zip(polyline, polyline[1:])
+            )
+
         # Generate Instructions
         instructions = self._generate_instructions(polyline, mode)
-        
+
         return {
             "mode": mode,
-            "total_distance": f"{distance_km:.2f} km",
+            "total_distance": f"{route_km:.2f} km",
             "total_time": f"{duration_mins} mins",
             "polyline": polyline,
             "instructions_array": instructions
         }
 
+    # --- Route Cache ---
+
+    def _lattice_path(self, start_node, end_node, mode, speeds, when=None):
+        """
+        Returns (path nodes from start to end, minutes) for a lattice trip.
+        Order of lookups: route cache -> shortest-path tree toward end_node -> fresh search.
+        """
+        traffic = self._traffic_bucket(mode, when)
+        key = (start_node, end_node, mode)
+
+        with self._cache_lock:
+            cached = self._route_cache.get(key)
+            if cached and cached[0] == traffic:
+                self._route_cache.move_to_end(key)
+                self.cache_stats['route_hits'] += 1
+                return cached[1], cached[2]
+
+            # Track how often each destination is requested
+            demand = self._destination_demand.pop((end_node, mode), 0) + 1
+            self._destination_demand[(end_node, mode)] = demand
+            if len(self._destination_demand) > DEMAND_TRACK_SIZE:
+                self._destination_demand.popitem(last=False)
+
+            tree = self._tree_cache.get((end_node, mode))
+            if tree and tree[0] != traffic:
+                del self._tree_cache[(end_node, mode)]
+                tree = None
+
+        if tree is None and demand >= POPULAR_DESTINATION_HITS:
+            tree = self._build_tree(end_node, mode, speeds, traffic)
+
+        if tree and start_node in tree[1]:
+            outcome = 'tree_hits'
+            _, costs, toward_root = tree
+            path = [start_node]
+            while path[-1] != end_node:
+                path.append(toward_root[path[-1]])
+            minutes = costs[start_node]
+        else:
+            outcome = 'misses'
+            predecessors = {}
+            radius_km = self._haversine_distance(*self._node_coords(start_node), *self._node_coords(end_node)) \
+                * DETOUR_FACTOR + 2 * GRID_SPACING_KM
+            costs = self._dijkstra({start_node: 0.0}, speeds, self._node_coords(start_node)[0],
+                                   radius_km, targets={end_node}, predecessors=predecessors)
+            path = [end_node]
+            while path[-1] != start_node:
+                path.append(predecessors[path[-1]])
+            path.reverse()
+            minutes = costs[end_node]
+
+        with self._cache_lock:
+            self.cache_stats[outcome] += 1
+            self._route_cache[key] = (traffic, path, minutes)
+            self._route_cache.move_to_end(key)
+            if len(self._route_cache) > ROUTE_CACHE_SIZE:
+                self._route_cache.popitem(last=False)
+
+        return path, minutes
+
+    def _build_tree(self, root, mode, speeds, traffic):
+        """
+        Shortest-path tree rooted at a popular destination. Lattice edges are
+        symmetric, so the search outward from the root gives every node's
+        fastest path toward it.
+        """
+        toward_root = {}
+        costs = self._dijkstra({root: 0.0}, speeds, self._node_coords(root)[0],
+                               TREE_RADIUS_KM, predecessors=toward_root)
+        tree = (traffic, costs, toward_root)
+
+        with self._cache_lock:
+            self._tree_cache[(root, mode)] = tree
+            self._tree_cache.move_to_end((root, mode))
+            if len(self._tree_cache) > TREE_CACHE_SIZE:
+                self._tree_cache.popitem(last=False)
+        return tree
+
+    def _traffic_bucket(self, mode, when=None):
+        """Cache entries stay valid only while the traffic multiplier they were built with applies."""
+        if mode in self.road_speeds and mode != 'driving':
+            return None
+        return DRIVING_TRAFFIC_PROFILE[(when or datetime.now()).hour]
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._route_cache.clear()
+            self._tree_cache.clear()
+            self._destination_demand.clear()
+            self._isochrone_cache.clear()
+
+    def update_road_speeds(self, mode, local=None, arterial=None):
+        """Changes road speeds (km/h) for a mode and drops everything computed with the old ones."""
+        classes = self.road_speeds.setdefault(mode, dict(ROAD_SPEEDS['driving']))
+        if local is not None:
+            classes['local'] = local
+        if arterial is not None:
+            classes['arterial'] = arterial
+        self.road_version += 1
+        self.clear_cache()
+
+    def _turn_points(self, path):
+        """Drops lattice nodes that lie on a straight run, keeping only the turns."""
+        if len(path) <= 2:
+            return list(path)
+        points = [path[0]]
+        for prev, node, nxt in zip(path, path[1:], path[2:]):
+            if (node[0] - prev[0], node[1] - prev[1]) != (nxt[0] - node[0], nxt[1] - node[1]):
+                points.append(node)
+        points.append(path[-1])
+        return points
+
+    # --- Travel Time API ---
+
+    def travel_times(self, origin_lat, origin_lon, destinations, mode='driving', when=None):
+        """
+        One-to-many travel times from a single origin.
+        Runs one Dijkstra over the road lattice and stops as soon as every
+        destination node is settled.
+        destinations: list of (lat, lon). Returns a list of minutes, same order.
+        """
+        if not destinations:
+            return []
+
+        speeds = self._mode_speeds(mode, when)
+        origin = self._snap(origin_lat, origin_lon)
+        origin_access = self._access_minutes(origin_lat, origin_lon, origin, speeds)
+
+        results = [None] * len(destinations)
+        targets = {}  # node -> [(index, access_minutes), ...]
+        max_dist_km = 0.0
+
+        for idx, (lat, lon) in enumerate(destinations):
+            dist_km = self._haversine_distance(origin_lat, origin_lon, lat, lon)
+            if dist_km > MAX_GRAPH_RADIUS_KM:
+                results[idx] = self._highway_estimate(dist_km, speeds)
+                continue
+            node = self._snap(lat, lon)
+            targets.setdefault(node, []).append((idx, self._access_minutes(lat, lon, node, speeds)))
+            max_dist_km = max(max_dist_km, dist_km)
+
+        if targets:
+            # Bound the search to a box a little larger than the farthest target
+            radius_km = max_dist_km * DETOUR_FACTOR + 2 * GRID_SPACING_KM
+            costs = self._dijkstra({origin: origin_access}, speeds, origin_lat,
+                                   radius_km, targets=set(targets))
+            for node, entries in targets.items():
+                for idx, access in entries:
+                    if node in costs:
+                        results[idx] = round(costs[node] + access, 1)
+                    else:
+                        # Unreachable inside the search box
+                        results[idx] = self._highway_estimate(
+                            self._haversine_distance(origin_lat, origin_lon, *destinations[idx]), speeds)
+
+        return results
+
+    def travel_time_matrix(self, origins, destinations, mode='driving', when=None):
+        """
+        Many-to-many travel times.
+        Returns a matrix of minutes: rows follow origins, columns follow destinations.
+        """
+        return [
+            self.travel_times(lat, lon, destinations, mode=mode, when=when)
+            for lat, lon in origins
+        ]
+
+    # --- Isochrones ---
+
+    def isochrones(self, facilities, thresholds=DEFAULT_ISOCHRONE_MINUTES, mode='ambulance', when=None):
+        """
+        Areas a group of facilities can reach within each threshold (minutes).
+        Runs one multi-source search bounded by the largest threshold; every
+        lattice cell is labelled with the facility that reaches it first.
+        facilities: [{"id", "name", "lat", "lon", ...}, ...]
+        Returns a GeoJSON FeatureCollection of cell strips (Polygons).
+        """
+        thresholds = tuple(sorted(set(thresholds)))
+        traffic = self._traffic_bucket(mode, when)
+        key = (self._facilities_key(facilities), thresholds, mode, traffic, self.road_version)
+
+        with self._cache_lock:
+            if key in self._isochrone_cache:
+                self._isochrone_cache.move_to_end(key)
+                return self._isochrone_cache[key]
+
+        speeds = self._mode_speeds(mode, when)
+        sources = {}
+        owner = {}
+        for facility in facilities:
+            node = self._snap(facility['lat'], facility['lon'])
+            access = self._access_minutes(facility['lat'], facility['lon'], node, speeds)
+            if access < sources.get(node, float('inf')):
+                sources[node] = access
+                owner[node] = facility
+
+        predecessors = {}
+        costs = self._dijkstra(sources, speeds, 0.0, None, max_minutes=thresholds[-1],
+                               predecessors=predecessors) if sources else {}
+
+        # Settle order guarantees a node's predecessor already has an owner
+        cells = {}
+        for node, minutes in costs.items():
+            if node not in owner:
+                owner[node] = owner[predecessors[node]]
+            band = next(t for t in thresholds if minutes <= t)
+            cells[node] = (band, owner[node]['id'])
+
+        collection = {
+            "type": "FeatureCollection",
+            "features": self._cells_to_features(cells, {f['id']: f for f in facilities}, mode)
+        }
+
+        with self._cache_lock:
+            self._isochrone_cache[key] = collection
+            if len(self._isochrone_cache) > ISOCHRONE_CACHE_SIZE:
+                self._isochrone_cache.popitem(last=False)
+        return collection
+
+    def coverage_layer(self, places, facility_types=None, thresholds=DEFAULT_ISOCHRONE_MINUTES, mode='ambulance'):
+        """
+        Batch job: isochrones for every facility type in one pass over the places list.
+        Returns {facility_type: FeatureCollection}. Results stay cached until the
+        places or road speeds change.
+        """
+        groups = {}
+        for place in places:
+            if facility_types is None or place['type'] in facility_types:
+                groups.setdefault(place['type'], []).append(place)
+        return {
+            facility_type: self.isochrones(group, thresholds=thresholds, mode=mode)
+            for facility_type, group in groups.items()
+        }
+
+    def _facilities_key(self, facilities):
+        return tuple(sorted((f['id'], round(f['lat'], 6), round(f['lon'], 6)) for f in facilities))
+
+    def _cells_to_features(self, cells, facilities_by_id, mode):
+        """Merges runs of same-label cells along each lattice row into one rectangle."""
+        half = GRID_STEP_DEG / 2
+        features = []
+        for node in sorted(cells):
+            row, col = node
+            label = cells[node]
+            # Only start a strip at the west end of a run
+            if cells.get((row, col - 1)) == label:
+                continue
+            end = col
+            while cells.get((row, end + 1)) == label:
+                end += 1
+
+            band, facility_id = label
+            facility = facilities_by_id[facility_id]
+            south, north = row * GRID_STEP_DEG - half, row * GRID_STEP_DEG + half
+            west, east = col * GRID_STEP_DEG - half, end * GRID_STEP_DEG + half
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]
+                },
+                "properties": {
+                    "facility_id": facility_id,
+                    "facility_name": facility.get('name'),
+                    "facility_type": facility.get('type'),
+                    "minutes": band,
+                    "mode": mode
+                }
+            })
+        return features
+
+    def _mode_speeds(self, mode, when=None):
+        """Returns effective (local, arterial) speeds in km/h for the given mode and time."""
+        base = self.road_speeds.get(mode, self.road_speeds['driving'])
+        factor = 1.0
+        if mode not in self.road_speeds or mode == 'driving':
+            hour = (when or datetime.now()).hour
+            factor = DRIVING_TRAFFIC_PROFILE[hour]
+        return (base['local'] / factor, base['arterial'] / factor)
+
+    def _snap(self, lat, lon):
+        """Snaps a coordinate to its nearest lattice node (row, col)."""
+        return (round(lat / GRID_STEP_DEG), round(lon / GRID_STEP_DEG))
+
+    def _node_coords(self, node):
+        return (node[0] * GRID_STEP_DEG, node[1] * GRID_STEP_DEG)
+
+    def _access_minutes(self, lat, lon, node, speeds):
+        """Time to get from an exact point onto its snapped node over local roads."""
+        node_lat, node_lon = self._node_coords(node)
+        return self._haversine_distance(lat, lon, node_lat, node_lon) / speeds[0] * 60
+
+    def _highway_estimate(self, distance_km, speeds):
+        return round(distance_km * DETOUR_FACTOR / speeds[1] * 60, 1)
+
+    def _dijkstra(self, sources, speeds, ref_lat, radius_km, targets=None, max_minutes=None, predecessors=None):
+        """
+        Multi-source Dijkstra over the implicit road lattice.
+        sources: {node: starting_minutes}. Stops once all targets are settled,
+        when the frontier passes max_minutes, or when the search box is exhausted
+        (radius_km=None searches without a box; pass targets or max_minutes).
+        If a predecessors dict is given it is filled with node -> previous node.
+        Returns {node: minutes} for every settled node, in settle order.
+        """
+        local_speed, arterial_speed = speeds
+        ns_km = GRID_SPACING_KM
+
+        # Edge costs in minutes, per road class. East/west edges shrink with
+        # latitude, so their cost is worked out per row on first use.
+        ns_cost = (ns_km / local_speed * 60, ns_km / arterial_speed * 60)
+        ew_costs = {}
+
+        # Search box in lattice cells around the sources
+        if radius_km is not None:
+            cos_lat = max(math.cos(math.radians(ref_lat)), 0.01)
+            rows = [n[0] for n in sources]
+            cols = [n[1] for n in sources]
+            row_span = int(math.ceil(radius_km / ns_km))
+            col_span = int(math.ceil(radius_km / (ns_km * cos_lat)))
+            min_row, max_row = min(rows) - row_span, max(rows) + row_span
+            min_col, max_col = min(cols) - col_span, max(cols) + col_span
+        else:
+            min_row = min_col = -math.inf
+            max_row = max_col = math.inf
+
+        pending = set(targets) if targets else None
+        settled = {}
+        best = dict(sources)
+        heap = [(cost, node) for node, cost in sources.items()]
+        heapq.heapify(heap)
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            if max_minutes is not None and cost > max_minutes:
+                break
+            settled[node] = cost
+
+            if pending is not None:
+                pending.discard(node)
+                if not pending:
+                    break
+
+            row, col = node
+            # Moving east/west runs along row `row`; north/south along column `col`
+            ew = ew_costs.get(row)
+            if ew is None:
+                ew_km = ns_km * max(math.cos(math.radians(row * GRID_STEP_DEG)), 0.01)
+                speed = arterial_speed if row % ARTERIAL_EVERY == 0 else local_speed
+                ew = ew_costs[row] = ew_km / speed * 60
+            ns = ns_cost[col % ARTERIAL_EVERY == 0]
+            for nxt, step in (((row, col + 1), ew), ((row, col - 1), ew),
+                              ((row + 1, col), ns), ((row - 1, col), ns)):
+                if nxt in settled:
+                    continue
+                if not (min_row <= nxt[0] <= max_row and min_col <= nxt[1] <= max_col):
+                    continue
+                new_cost = cost + step
+                if new_cost < best.get(nxt, float('inf')):
+                    best[nxt] = new_cost
+                    if predecessors is not None:
+                        predecessors[nxt] = node
+                    heapq.heappush(heap, (new_cost, nxt))
+
+        return settled
+
     def _generate_polyline(self, start_lat, start_lon, end_lat, end_lon):
         """Generates intermediate points to simulate a path."""
         points = [[start_lat, start_lon]]
@@ -95,3 +522,12 @@ if __name__ == "__main__":
     route = router.calculate_route(12.9716, 77.5946, 12.9800, 77.6000, 'ambulance')
     import json
     print(json.dumps(route, indent=2))
+
+    # One-to-many travel times (single batched search)
+    print(router.travel_times(12.9716, 77.5946, [(12.9800, 77.6000), (12.9352, 77.6245), (28.6139, 77.2090)]))
+
+    # Coverage layer for the demo places
+    from geo_engine import GeoLocationService
+    layer = router.coverage_layer(GeoLocationService().places_db)
+    for facility_type, collection in layer.items():
+        print(f"{facility_type}: {len(collection['features'])} isochrone strips")
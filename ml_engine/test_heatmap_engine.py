@@ -0,0 +1,42 @@
+import threading
+
+import numpy as np
+
+import heatmap_engine
+from heatmap_engine import DAY_SECONDS, DAILY_BUCKETS, HOUR_SECONDS, HeatmapEngine
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+def test_hotspots_survive_expiry_boundary(monkeypatch):
+    day = 20000
+    clock = FakeClock((day + 0.25) * DAY_SECONDS)
+    monkeypatch.setattr(heatmap_engine.time, "time", clock.time)
+
+    engine = HeatmapEngine()
+    # One report in the oldest daily bucket: it expires at the next day boundary
+    engine.ingest(12.90, 77.50, "fire", 0.5, timestamp=(day - DAILY_BUCKETS + 1.5) * DAY_SECONDS)
+    # A dense cluster over a scattered background, both recent
+    rng = np.random.default_rng(0)
+    n_background = 60
+    lats = np.concatenate([np.full(25, 12.9716), 12.8 + rng.random(n_background) * 0.3])
+    lons = np.concatenate([np.full(25, 77.5946), 77.45 + rng.random(n_background) * 0.3])
+    engine.add_reports(lats, lons, ["assault"] * len(lats), np.full(len(lats), 0.8),
+                       np.full(len(lats), clock.now - HOUR_SECONDS))
+    assert engine.get_hotspots()
+    total = engine.grid.total_reports
+
+    # Cross the daily boundary: hotspots() now expires the old report itself
+    clock.now = (day + 1) * DAY_SECONDS + 60
+    result = []
+    worker = threading.Thread(target=lambda: result.append(engine.get_hotspots()), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+
+    assert not worker.is_alive(), "get_hotspots() deadlocked on bucket expiry"
+    assert engine.grid.total_reports == total - 1
+    assert result[0]
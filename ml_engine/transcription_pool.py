@@ -0,0 +1,385 @@
+import os
+import time
+import queue
+import logging
+import threading
+import itertools
+import importlib
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+THREADS_PER_WORKER = 2        # CTranslate2 intra-op threads per model
+MAX_QUEUE_DEPTH = 64          # Submissions beyond this are rejected straight away
+DEFAULT_TIMEOUT = 30.0        # Seconds a caller waits for its transcription
+BATCH_SIZE = 8                # Utterances decoded together in one batched call
+BATCH_MAX_SECONDS = 25.0      # Only clips that fit in one Whisper window are batched
+BATCH_WAIT_SECONDS = 0.02     # How long a worker waits for more work to batch
+LATENCY_WINDOW = 500          # Recent jobs kept for the latency percentiles
+READY_TIMEOUT = 300.0         # Seconds wait_ready() waits for the models to load
+HEALTH_CHECK_SECONDS = 1.0    # How often dead workers are looked for
+EXPIRY_GRACE_SECONDS = 5.0    # Past its deadline by this much, a job is given up on even without a result
+
+def _worker_main(worker_id, model_size, device, compute_type, threads, cores, tasks, results):
+    """
+    Worker process: one WhisperModel with a fixed thread count, pinned to its
+    own cores. Pulls (job_id, samples, options, deadline) from tasks; jobs
+    whose caller already gave up are skipped, and short jobs with identical
+    options that arrive together are decoded as one batch.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+    from faster_whisper import WhisperModel
+    try:
+        from faster_whisper import BatchedInferencePipeline
+    except ImportError:
+        BatchedInferencePipeline = None
+
+    model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=threads, num_workers=1)
+    batched = BatchedInferencePipeline(model=model) if BatchedInferencePipeline else None
+    results.put(("ready", worker_id, None))
+
+    backlog = deque()
+    while True:
+        job = backlog.popleft() if backlog else tasks.get()
+        if job is None:
+            break
+        if _expired(job, results):
+            continue
+
+        batch = [job]
+        if batched and _batchable(job):
+            # Gather more short jobs with the same options, waiting only briefly
+            deadline = time.time() + BATCH_WAIT_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    extra = tasks.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+                if extra is None:
+                    backlog.append(None)
+                    break
+                if _expired(extra, results):
+                    continue
+                if _batchable(extra) and extra[2] == job[2]:
+                    batch.append(extra)
+                else:
+                    backlog.append(extra)
+
+        started = time.time()
+        for job_id, *_ in batch:
+            results.put(("started", job_id, (os.getpid(), started)))
+        try:
+            if len(batch) > 1:
+                outputs = _transcribe_batch(batched, batch)
+            else:
+                outputs = [_transcribe_one(model, batch[0])]
+            for (job_id, *_), output in zip(batch, outputs):
+                output["batch_size"] = len(batch)
+                results.put(("done", job_id, output))
+        except Exception as e:
+            for job_id, *_ in batch:
+                results.put(("done", job_id, {"error": str(e)}))
+
+def _expired(job, results):
+    """Reports and skips a job whose deadline has passed."""
+    if job[3] >= time.time():
+        return False
+    results.put(("expired", job[0], None))
+    return True
+
+def _batchable(job):
+    _, samples, options, _ = job
+    # Batched decoding shares one language, so only jobs that name it qualify
+    return options.get("language") is not None and len(samples) <= BATCH_MAX_SECONDS * SAMPLE_RATE
+
+def _segment_dict(segment, offset=0.0):
+    return {
+        "start": round(segment.start - offset, 2),
+        "end": round(segment.end - offset, 2),
+        "text": segment.text,
+        "confidence": segment.avg_logprob
+    }
+
+def _transcribe_one(model, job):
+    _, samples, options, _ = job
+    segments, info = model.transcribe(samples, **options)
+    return {
+        "segments": [_segment_dict(segment) for segment in segments],
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "duration": info.duration
+    }
+
+def _transcribe_batch(batched, batch):
+    """
+    Concatenates the clips and hands their spans to the batched pipeline as
+    clip timestamps, so all of them are decoded in one generate call.
+    Segments are mapped back to their clip by start time.
+    """
+    offsets, spans, position = [], [], 0.0
+    for _, samples, _, _ in batch:
+        duration = len(samples) / SAMPLE_RATE
+        offsets.append(position)
+        spans.append({"start": position, "end": position + duration})
+        position += duration
+    audio = np.concatenate([samples for _, samples, _, _ in batch])
+
+    options = {k: v for k, v in batch[0][2].items() if k != "vad_filter"}
+    segments, info = batched.transcribe(audio, clip_timestamps=spans, batch_size=len(batch), vad_filter=False, **options)
+
+    outputs = [{"segments": [], "language": info.language, "language_probability": info.language_probability,
+                "duration": round(span["end"] - span["start"], 2)} for span in spans]
+    for segment in segments:
+        idx = max(i for i, offset in enumerate(offsets) if segment.start >= offset - 1e-3)
+        outputs[idx]["segments"].append(_segment_dict(segment, offsets[idx]))
+    return outputs
+
+class TranscriptionPool:
+    """
+    Whisper inference in dedicated worker processes behind a bounded queue.
+    Each worker owns one model with THREADS_PER_WORKER threads pinned to its
+    own cores, so concurrent calls neither serialize on one model nor
+    oversubscribe the CPU. Callers get a Future (submit) or wait with a
+    timeout (transcribe); stats() reports queue depth and latency. A worker
+    that dies fails the jobs it was running and is replaced.
+    """
+
+    def __init__(self, model_size="tiny", device="cpu", compute_type="int8", workers=None,
+                 threads_per_worker=THREADS_PER_WORKER, max_queue=MAX_QUEUE_DEPTH, timeout=DEFAULT_TIMEOUT):
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.workers = workers or max(1, len(cores) // threads_per_worker)
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        self._ctx = mp.get_context("spawn")  # CTranslate2 state must not be forked
+        self._tasks = self._ctx.Queue()
+        # Unbuffered, so a "started" message is sent before a crash can lose it
+        self._results = self._ctx.SimpleQueue()
+        self._ids = itertools.count()
+        self._jobs = {}  # job_id -> (future, submitted_at, started_at, worker pid, deadline)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._ready_workers = set()
+        self._failed_workers = set()  # Died before loading their model; not restarted
+        self._closed = threading.Event()
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._expired = 0
+        self._restarts = 0
+        self._queue_waits = deque(maxlen=LATENCY_WINDOW)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+        # Resolved by module name so the spawned workers import only this
+        # module's worker entry, even when this file is run as __main__
+        self._target = importlib.import_module("transcription_pool")._worker_main
+        self._worker_args = []
+        self._processes = []
+        for i in range(self.workers):
+            pinned = [cores[(i * threads_per_worker + k) % len(cores)] for k in range(threads_per_worker)]
+            self._worker_args.append((i, model_size, device, compute_type, threads_per_worker, pinned,
+                                      self._tasks, self._results))
+            self._processes.append(self._start_worker(i))
+
+        self._collector = threading.Thread(target=self._collect, name="whisper-results", daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._watch, name="whisper-health", daemon=True)
+        self._monitor.start()
+        logger.info(f"🎙️ Transcription pool: {self.workers} workers x {threads_per_worker} threads")
+
+    def _start_worker(self, worker_id):
+        process = self._ctx.Process(target=self._target, args=self._worker_args[worker_id],
+                                    name=f"whisper-{worker_id}", daemon=True)
+        process.start()
+        return process
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """Blocks until every worker has loaded its model; False on timeout or if a worker died while loading."""
+        deadline = time.time() + timeout
+        while not self._ready.wait(min(HEALTH_CHECK_SECONDS, max(deadline - time.time(), 0))):
+            with self._lock:
+                failed = [p for p in self._processes if p.exitcode is not None]
+            if failed or time.time() >= deadline:
+                return False
+        return True
+
+    def submit(self, samples, timeout=None, **options):
+        """
+        Queues a float32 16 kHz buffer; options go to WhisperModel.transcribe.
+        Workers skip the job once timeout (default: the pool's) has passed.
+        Returns a Future resolving to {segments, language, language_probability,
+        duration, queue_time, inference_time} or {error}.
+        """
+        return self._submit(samples, timeout, options)[1]
+
+    def _submit(self, samples, timeout, options):
+        """Returns (job_id, future); job_id is None if the queue was full."""
+        future = Future()
+        with self._lock:
+            if len(self._jobs) >= self.max_queue:
+                self._rejected += 1
+                future.set_result({"error": "Transcription queue full"})
+                return None, future
+            job_id = next(self._ids)
+            submitted = time.time()
+            deadline = submitted + (timeout or self.timeout)
+            self._jobs[job_id] = (future, submitted, None, None, deadline)
+        self._tasks.put((job_id, np.asarray(samples, dtype=np.float32), options, deadline))
+        return job_id, future
+
+    def transcribe(self, samples, timeout=None, **options):
+        """Submits and waits; returns an {error} dict if the result is not ready in time."""
+        timeout = timeout or self.timeout
+        job_id, future = self._submit(samples, timeout, options)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._timed_out += 1
+                # Frees its queue slot now; a late result for it is ignored
+                self._jobs.pop(job_id, None)
+            future.cancel()
+            return {"error": "Transcription timed out"}
+
+    def _collect(self):
+        while True:
+            try:
+                kind, key, payload = self._results.get()
+            except (EOFError, OSError):
+                return
+            now = time.time()
+            with self._lock:
+                if kind == "ready":
+                    self._ready_workers.add(key)
+                    if len(self._ready_workers) == self.workers:
+                        self._ready.set()
+                    continue
+                job = self._jobs.get(key)
+                if job is None:
+                    continue
+                future, submitted, started, pid, deadline = job
+                if kind == "started":
+                    pid, started = payload
+                    self._jobs[key] = (future, submitted, started, pid, deadline)
+                    self._queue_waits.append(started - submitted)
+                    continue
+                del self._jobs[key]
+                if kind == "expired":
+                    self._expired += 1
+                    started = now  # Never ran: all of its time was queueing
+                    payload = {"error": "Transcription timed out"}
+                else:
+                    self._completed += 1
+                    self._latencies.append(now - submitted)
+            started = started or submitted
+            payload["queue_time"] = round(started - submitted, 3)
+            payload["inference_time"] = round(now - started, 3)
+            if future.set_running_or_notify_cancel():
+                future.set_result(payload)
+
+    def _watch(self):
+        """
+        Replaces dead workers and fails the jobs they had started, plus any
+        job still unanswered EXPIRY_GRACE_SECONDS after its deadline (e.g.
+        one a worker had dequeued but not started when it crashed).
+        """
+        while not self._closed.wait(HEALTH_CHECK_SECONDS):
+            for worker_id, process in enumerate(list(self._processes)):
+                if process.is_alive() or self._closed.is_set():
+                    continue
+                with self._lock:
+                    was_ready = worker_id in self._ready_workers
+                    self._ready_workers.discard(worker_id)
+                if not was_ready:
+                    # Died while loading its model: respawning would just fail again
+                    if worker_id not in self._failed_workers:
+                        self._failed_workers.add(worker_id)
+                        logger.error(f"❌ Whisper worker {worker_id} failed to start (exit code {process.exitcode})")
+                    continue
+                logger.error(f"❌ Whisper worker {worker_id} died (exit code {process.exitcode}), restarting")
+                replacement = self._start_worker(worker_id)
+                with self._lock:
+                    self._processes[worker_id] = replacement
+                    self._restarts += 1
+
+            # Checked every round, so a "started" that arrives after the crash is still caught
+            now = time.time()
+            with self._lock:
+                alive = {p.pid for p in self._processes if p.is_alive()}
+                lost = [job_id for job_id, job in self._jobs.items() if job[3] is not None and job[3] not in alive]
+                crashed = [self._jobs.pop(job_id)[0] for job_id in lost]
+                stale = [job_id for job_id, job in self._jobs.items() if now > job[4] + EXPIRY_GRACE_SECONDS]
+                abandoned = [self._jobs.pop(job_id)[0] for job_id in stale]
+                self._expired += len(abandoned)
+            for futures, error in ((crashed, "Transcription worker crashed"), (abandoned, "Transcription timed out")):
+                for future in futures:
+                    if future.set_running_or_notify_cancel():
+                        future.set_result({"error": error})
+
+    def stats(self):
+        """Queue depth, in-flight jobs and latency percentiles (seconds) over recent jobs."""
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job[2] is None)
+            latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+            waits = np.array(self._queue_waits) if self._queue_waits else np.zeros(1)
+            return {
+                "workers": self.workers,
+                "workers_alive": sum(p.is_alive() for p in self._processes),
+                "queue_depth": queued,
+                "in_flight": len(self._jobs) - queued,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "expired": self._expired,
+                "restarts": self._restarts,
+                "latency_p50": round(float(np.percentile(latencies, 50)), 3),
+                "latency_p95": round(float(np.percentile(latencies, 95)), 3),
+                "queue_wait_p95": round(float(np.percentile(waits, 95)), 3)
+            }
+
+    def close(self):
+        self._closed.set()
+        self._monitor.join(timeout=HEALTH_CHECK_SECONDS * 2)
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+
+if __name__ == "__main__":
+    # Concurrency benchmark: throughput for 1, 2, 4, ... workers on synthetic speech-like clips
+    import sys
+
+    clips = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rng = np.random.default_rng(0)
+    t = np.arange(int(3.0 * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = [(0.3 * np.sin(2 * np.pi * (150 + 10 * (k % 7)) * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2
+                + rng.normal(0, 0.01, len(t))).astype(np.float32) for k in range(clips)]
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    workers = 1
+    while workers * THREADS_PER_WORKER <= max(cores, THREADS_PER_WORKER):
+        pool = TranscriptionPool(workers=workers, max_queue=clips, timeout=600)
+        if not pool.wait_ready():
+            print(f"{workers} workers: failed to start, {pool.stats()}")
+            pool.close()
+            break
+        start = time.perf_counter()
+        futures = [pool.submit(clip, beam_size=1, language="en") for clip in samples]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+        print(f"{workers} workers: {clips / elapsed:.2f} clips/s, {pool.stats()}")
+        pool.close()
+        workers *= 2
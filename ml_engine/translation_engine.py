@@ -1,10 +1,372 @@
-from deep_translator import GoogleTranslator
+import os
+import re
+import time
+import queue
+import sqlite3
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 
 logger = logging.getLogger(__name__)
 
+# Try to import the remote translator stack (cached and offline translations still work without it)
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from bs4 import BeautifulSoup
+    from deep_translator.constants import BASE_URLS
+    GOOGLE_URL = BASE_URLS["GOOGLE_TRANSLATE"]
+    HAS_TRANSLATOR = True
+except ImportError:
+    HAS_TRANSLATOR = False
+    logger.warning("⚠️ deep-translator not found. Only cached and offline translations are available.")
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_cache.db")
+
+TRANSLATE_TIMEOUT = 2.0       # Seconds a caller waits before the offline fallback answers
+HTTP_TIMEOUT = (1.0, 4.0)     # Connect / read timeout of one backend request
+POOL_CONNECTIONS = 8          # Pooled keep-alive connections = concurrent batch calls
+BATCH_WAIT_SECONDS = 0.01     # How long the dispatcher waits for more requests to batch
+MAX_BATCH = 16                # Texts per backend call
+MAX_BATCH_CHARS = 4500        # Google's endpoint rejects queries over 5000 characters
+BREAKER_FAILURES = 3          # Consecutive failed calls that open the circuit
+BREAKER_RESET_SECONDS = 30.0  # Open circuit cool-down before a trial call
+
+# Replies are translated sentence by sentence so template sentences are shared
+SENTENCE_SPLIT = re.compile(r"(?<=[.?!])\s+")
+# Words of any script (Indic vowel signs are not \w, so split on separators instead)
+TOKEN = re.compile(r"[^\s.,!?;:'\"()]+")
+
+# Emergency vocabulary into English (native script and common romanizations),
+# enough for keyword-based classification when the remote translator is down
+OFFLINE_GLOSSARY = {
+    'hi': {
+        "आग": "fire", "aag": "fire", "धुआं": "smoke", "dhuan": "smoke", "बचाओ": "help", "bachao": "help",
+        "मदद": "help", "madad": "help", "चोर": "thief", "chor": "thief", "पुलिस": "police", "खून": "blood",
+        "khoon": "blood", "दर्द": "pain", "dard": "pain", "दुर्घटना": "accident", "durghatna": "accident",
+        "अस्पताल": "hospital", "aspatal": "hospital", "चाकू": "knife", "chaku": "knife", "बंदूक": "gun", "bandook": "gun"
+    },
+    'kn': {
+        "ಬೆಂಕಿ": "fire", "benki": "fire", "ಹೊಗೆ": "smoke", "hoge": "smoke", "ಸಹಾಯ": "help", "sahaya": "help",
+        "ಕಾಪಾಡಿ": "help", "kaapaadi": "help", "ಕಳ್ಳ": "thief", "kalla": "thief", "ಪೊಲೀಸ್": "police",
+        "ರಕ್ತ": "blood", "raktha": "blood", "ನೋವು": "pain", "novu": "pain", "ಅಪಘಾತ": "accident",
+        "apaghata": "accident", "ಆಸ್ಪತ್ರೆ": "hospital", "aspatre": "hospital"
+    },
+    'ta': {
+        "தீ": "fire", "thee": "fire", "நெருப்பு": "fire", "neruppu": "fire", "புகை": "smoke", "pugai": "smoke",
+        "உதவி": "help", "udhavi": "help", "காப்பாத்து": "help", "kaapaathu": "help", "திருடன்": "thief",
+        "thirudan": "thief", "காவல்துறை": "police", "இரத்தம்": "blood", "ratham": "blood", "வலி": "pain",
+        "vali": "pain", "விபத்து": "accident", "vibathu": "accident", "மருத்துவமனை": "hospital"
+    },
+    'te': {
+        "మంట": "fire", "manta": "fire", "నిప్పు": "fire", "nippu": "fire", "పొగ": "smoke", "poga": "smoke",
+        "సహాయం": "help", "sahayam": "help", "కాపాడండి": "help", "kaapaadandi": "help", "దొంగ": "thief",
+        "donga": "thief", "పోలీసు": "police", "రక్తం": "blood", "raktham": "blood", "నొప్పి": "pain",
+        "noppi": "pain", "ప్రమాదం": "accident", "pramadam": "accident", "ఆసుపత్రి": "hospital"
+    }
+}
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_SPLIT.split(text.strip()) if sentence]
+
+class TranslationBackend:
+    """
+    Backend interface: translate_batch(texts, source_lang, target_lang)
+    returns one translation per text, in order, or raises.
+    """
+    name = "base"
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        raise NotImplementedError
+
+class GoogleBackend(TranslationBackend):
+    """
+    Google Translate's public endpoint (the one deep-translator scrapes) over
+    one pooled keep-alive session. A batch is sent as newline-joined text in
+    as few requests as the length limit allows.
+    """
+    name = "google"
+
+    def __init__(self, pool_size=POOL_CONNECTIONS, timeout=HTTP_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+
+    def _request(self, text, source_lang, target_lang):
+        response = self.session.get(GOOGLE_URL, params={"sl": source_lang, "tl": target_lang, "q": text},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "html.parser")
+        element = soup.find("div", {"class": "t0"}) or soup.find("div", {"class": "result-container"})
+        if element is None:
+            raise ValueError("No translation in response")
+        return element.get_text("\n", strip=True)
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        texts = [" ".join(text.split("\n")) for text in texts]
+        chunks, current = [], []
+        for text in texts:
+            if current and sum(len(t) + 1 for t in current) + len(text) > MAX_BATCH_CHARS:
+                chunks.append(current)
+                current = []
+            current.append(text)
+        chunks.append(current)
+
+        translations = []
+        for chunk in chunks:
+            lines = self._request("\n".join(chunk), source_lang, target_lang).split("\n")
+            if len(lines) != len(chunk):
+                # Line structure not preserved: one request per text
+                lines = [self._request(text, source_lang, target_lang) for text in chunk]
+            translations.extend(lines)
+        return translations
+
+class PhraseTableBackend(TranslationBackend):
+    """
+    Offline stand-in for tests and degraded mode: exact phrases from a table,
+    and word-by-word glossary translation into English so emergency keywords
+    survive. Anything else comes back unchanged.
+    """
+    name = "phrase_table"
+
+    def __init__(self, phrases=None, glossary=None):
+        self.phrases = {}  # (src, tgt) -> {text: translation}
+        for (text, src, tgt), translation in (phrases or {}).items():
+            self.add_phrase(text, src, tgt, translation)
+        self.glossary = {}
+        for words in (glossary or OFFLINE_GLOSSARY).values():
+            self.glossary.update({word.lower(): english for word, english in words.items()})
+
+    def add_phrase(self, text, source_lang, target_lang, translation):
+        self.phrases.setdefault((source_lang, target_lang), {})[text] = translation
+
+    def _gloss(self, text):
+        return TOKEN.sub(lambda m: self.glossary.get(m.group().lower(), m.group()), text)
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        table = self.phrases.get((source_lang, target_lang), {})
+        return [table[text] if text in table else self._gloss(text) if target_lang == 'en' else text for text in texts]
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed calls; while open, callers skip
+    the backend. After `reset_seconds` one trial call is let through.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._count = 0
+        self._opened_at = None
+        self._trial = False
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.time() - self._opened_at >= self.reset_seconds:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._count = 0
+                self._opened_at = None
+                return
+            self._count += 1
+            if self._count >= self.failures:
+                if self._opened_at is None:
+                    logger.warning(f"⚠️ Translation circuit open for {self.reset_seconds}s")
+                self._opened_at = time.time()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._trial else "open"
+
+class TranslationClient:
+    """
+    Non-blocking front for a backend. submit() returns a Future; identical
+    in-flight requests share one. A dispatcher thread coalesces whatever
+    arrives within BATCH_WAIT_SECONDS into per-language-pair batch calls that
+    run on a small thread pool. translate() waits at most `timeout`; on
+    timeout, error or an open circuit the fallback backend answers instead.
+    """
+
+    def __init__(self, backend, fallback=None, timeout=TRANSLATE_TIMEOUT, workers=POOL_CONNECTIONS,
+                 batch_wait=BATCH_WAIT_SECONDS, max_batch=MAX_BATCH):
+        self.backend = backend
+        self.fallback = fallback or PhraseTableBackend()
+        self.timeout = timeout
+        self.batch_wait = batch_wait
+        self.max_batch = max_batch
+        self.breaker = CircuitBreaker()
+
+        self._queue = queue.Queue()
+        self._pending = {}  # (text, src, tgt) -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+        self._batches = 0
+        self._coalesced = 0
+        self._timeouts = 0
+        self._fallbacks = 0
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="translate-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, text, source_lang, target_lang):
+        key = (text, source_lang, target_lang)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future
+            future = self._pending[key] = Future()
+        self._queue.put(key)
+        return future
+
+    def _dispatch(self):
+        while True:
+            keys = [self._queue.get()]
+            deadline = time.time() + self.batch_wait
+            while True:
+                try:
+                    keys.append(self._queue.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            groups = {}
+            for text, source_lang, target_lang in keys:
+                groups.setdefault((source_lang, target_lang), []).append(text)
+            for (source_lang, target_lang), texts in groups.items():
+                for i in range(0, len(texts), self.max_batch):
+                    self._executor.submit(self._run_batch, texts[i:i + self.max_batch], source_lang, target_lang)
+
+    def _run_batch(self, texts, source_lang, target_lang):
+        try:
+            translations = self.backend.translate_batch(texts, source_lang, target_lang)
+            if translations is None or len(translations) != len(texts):
+                # A short or padded answer can't be matched back to its texts
+                raise ValueError(f"backend returned {len(translations or [])} translations for {len(texts)} texts")
+            error = None
+        except Exception as e:
+            logger.error(f"Translation batch {source_lang}->{target_lang} failed: {e}")
+            translations, error = None, e
+        self.breaker.record(error is None)
+
+        with self._lock:
+            self._batches += 1
+            futures = [self._pending.pop((text, source_lang, target_lang)) for text in texts]
+        for i, future in enumerate(futures):
+            if error is None:
+                future.set_result(translations[i])
+            else:
+                future.set_exception(error)
+
+    def translate(self, texts, source_lang, target_lang, timeout=None):
+        """
+        Returns (translations, from_backend): from_backend[i] is False where
+        the fallback answered (open circuit, timeout or backend error).
+        """
+        if self.backend is self.fallback or not self.breaker.allow():
+            with self._lock:
+                self._fallbacks += len(texts)
+            return self.fallback.translate_batch(texts, source_lang, target_lang), [False] * len(texts)
+
+        futures = [self.submit(text, source_lang, target_lang) for text in texts]
+        deadline = time.time() + (timeout or self.timeout)
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(deadline - time.time(), 0)))
+            except FutureTimeout:
+                with self._lock:
+                    self._timeouts += 1
+                results.append(None)
+            except Exception:
+                results.append(None)
+
+        flags = [result is not None for result in results]
+        if not all(flags):
+            missing = [text for text, ok in zip(texts, flags) if not ok]
+            filled = iter(self.fallback.translate_batch(missing, source_lang, target_lang))
+            results = [result if ok else next(filled) for result, ok in zip(results, flags)]
+            with self._lock:
+                self._fallbacks += len(missing)
+        return results, flags
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "circuit": self.breaker.state,
+                "in_flight": len(self._pending),
+                "batches": self._batches,
+                "coalesced": self._coalesced,
+                "timeouts": self._timeouts,
+                "fallbacks": self._fallbacks
+            }
+
+class TranslationCache:
+    """
+    Persistent (text, src, tgt) -> translation store: SQLite on disk with an
+    in-memory dict in front, safe to share between request threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory = {}
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text TEXT NOT NULL, src TEXT NOT NULL, tgt TEXT NOT NULL, translated TEXT NOT NULL, "
+            "PRIMARY KEY (text, src, tgt))"
+        )
+        self._db.commit()
+
+    def get(self, text, src, tgt):
+        key = (text, src, tgt)
+        with self._lock:
+            if key in self._memory:
+                self.hits += 1
+                return self._memory[key]
+            row = self._db.execute(
+                "SELECT translated FROM translations WHERE text = ? AND src = ? AND tgt = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory[key] = row[0]
+            return row[0]
+
+    def put(self, text, src, tgt, translated):
+        with self._lock:
+            self._memory[(text, src, tgt)] = translated
+            self._db.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", (text, src, tgt, translated))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
 class TranslationEngine:
-    def __init__(self):
+    def __init__(self, cache_path=None, backend=None, timeout=TRANSLATE_TIMEOUT):
+        """
+        backend: any TranslationBackend (default: Google if available, else
+        the offline PhraseTableBackend, which also answers when it is down).
+        """
         self.supported_languages = {
             'en': 'English',
             'hi': 'Hindi',
@@ -12,6 +374,53 @@ class TranslationEngine:
             'ta': 'Tamil',
             'te': 'Telugu'
         }
+        self.cache = TranslationCache(cache_path or DEFAULT_CACHE_PATH)
+        self.offline = PhraseTableBackend()
+        if backend is None:
+            backend = GoogleBackend() if HAS_TRANSLATOR else self.offline
+        self.client = TranslationClient(backend, fallback=self.offline, timeout=timeout)
+
+    def _translate_many(self, texts, source_lang, target_lang, timeout=None):
+        """
+        Cache first, then one coalesced backend round for the misses.
+        Only backend translations are cached, never fallback output.
+        Returns (translations, all_cached).
+        """
+        found = {text: self.cache.get(text, source_lang, target_lang) for text in texts}
+        missing = [text for text, translated in found.items() if translated is None]
+        if missing:
+            translations, from_backend = self.client.translate(missing, source_lang, target_lang, timeout)
+            for text, translated, ok in zip(missing, translations, from_backend):
+                found[text] = translated or text
+                if ok and translated:
+                    self.cache.put(text, source_lang, target_lang, translated)
+        return [found[text] for text in texts], not missing
+
+    def translate(self, text, target_lang='en', source_lang='auto'):
+        """
+        Translates text, checking the persistent cache first.
+        Text from English is translated sentence by sentence, so replies built
+        from response templates (see precompute) are pure cache lookups.
+        Never blocks longer than the client timeout: if the backend is slow or
+        down, the offline phrase table answers (emergency words still come
+        through for classification).
+        Returns {translated_text, src_lang, tgt_lang, cached}; cached is False
+        when the text comes back untranslated because the target is unsupported.
+        """
+        result = {"translated_text": text, "src_lang": source_lang, "tgt_lang": target_lang, "cached": True}
+        if not text or source_lang == target_lang:
+            return result
+        if target_lang not in self.supported_languages:
+            result["cached"] = False
+            return result
+
+        pieces = split_sentences(text) if source_lang == 'en' else [text]
+        translations, result["cached"] = self._translate_many(pieces, source_lang, target_lang)
+        result["translated_text"] = " ".join(translations)
+
+        logger.info(f"Translated ({source_lang}->{target_lang}, cached={result['cached']}): "
+                    f"'{text}' -> '{result['translated_text']}'")
+        return result
 
     def translate_to_english(self, text, source_lang='auto'):
         """
@@ -21,41 +430,62 @@ class TranslationEngine:
         """
         if not text:
             return "", "en"
-
-        try:
-            # If source is already English, just return it
-            if source_lang == 'en':
-                return text, 'en'
-
-            # Translate
-            translator = GoogleTranslator(source=source_lang, target='en')
-            translated_text = translator.translate(text)
-            
-            # deep-translator doesn't always return the detected language code easily in the simple API
-            # We will assume the requested source_lang was correct, or if 'auto', we might not know the exact code
-            # For the purpose of replying, if 'auto' was used, we might need to rely on the user's preferred lang
-            # or try to detect it separately if needed. 
-            # For now, we return source_lang as passed (or 'en' if it was effectively English)
-            
-            logger.info(f"Translated to EN: '{text}' -> '{translated_text}'")
-            return translated_text, source_lang
-
-        except Exception as e:
-            logger.error(f"Translation to English failed: {e}")
-            return text, source_lang
+        result = self.translate(text, target_lang='en', source_lang=source_lang)
+        return result["translated_text"], result["src_lang"]
 
     def translate_from_english(self, text, target_lang):
         """
         Translates text from English to the target language.
         """
-        if not text or target_lang == 'en':
-            return text
+        return self.translate(text, target_lang=target_lang, source_lang='en')["translated_text"]
 
-        try:
-            translator = GoogleTranslator(source='en', target=target_lang)
-            translated_text = translator.translate(text)
-            logger.info(f"Translated from EN: '{text}' -> '{translated_text}' ({target_lang})")
-            return translated_text
-        except Exception as e:
-            logger.error(f"Translation to {target_lang} failed: {e}")
-            return text
+    def precompute(self, texts, languages=None, timeout=60.0):
+        """
+        Pre-translates English texts (response templates, safety tips) into
+        every supported language, sentence by sentence, one batched round per
+        language. Returns the number of new translations.
+        """
+        languages = languages or [lang for lang in self.supported_languages if lang != 'en']
+        sentences = sorted({sentence for text in texts for sentence in split_sentences(text)})
+        before = self.cache.stats()["entries"]
+        for lang in languages:
+            self._translate_many(sentences, 'en', lang, timeout=timeout)
+        added = self.cache.stats()["entries"] - before
+        logger.info(f"🌐 Pre-translated {added} template sentences ({len(sentences)} x {len(languages)} languages)")
+        return added
+
+    def stats(self):
+        return {"cache": self.cache.stats(), **self.client.stats()}
+
+if __name__ == "__main__":
+    # Coalescing demo against a slow fake backend, then an outage handled by the breaker
+    class SlowBackend(TranslationBackend):
+        name = "slow"
+
+        def __init__(self):
+            self.calls = 0
+            self.down = False
+
+        def translate_batch(self, texts, source_lang, target_lang):
+            self.calls += 1
+            time.sleep(0.2)
+            if self.down:
+                raise ConnectionError("backend down")
+            return [f"<{target_lang}> {text}" for text in texts]
+
+    import tempfile
+    backend = SlowBackend()
+    engine = TranslationEngine(cache_path=os.path.join(tempfile.mkdtemp(), "cache.db"), backend=backend)
+    texts = [f"message {i % 10}" for i in range(40)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        list(pool.map(lambda text: engine.translate(text, target_lang='en', source_lang='hi'), texts))
+    print(f"40 concurrent requests: {backend.calls} backend calls in {time.perf_counter() - start:.2f}s")
+
+    backend.down = True
+    for text in ["aag lagi hai bachao", "chor ghar mein hai", "khoon beh raha hai", "madad karo"]:
+        start = time.perf_counter()
+        result = engine.translate(text, target_lang='en', source_lang='hi')
+        print(f"{result['translated_text']!r} in {(time.perf_counter() - start) * 1000:.0f} ms ({engine.client.breaker.state})")
+    print(engine.stats())
@@ -1,8 +1,14 @@
 import edge_tts
+import aiohttp
 import asyncio
 import logging
 import os
 import base64
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,12 +16,160 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024   # In-memory LRU budget for rendered audio
+DISK_CACHE_BYTES = 512 * 1024 * 1024    # On-disk budget; least recently used files go first
+URGENCY_TIERS = (0.0, 0.5, 0.8)         # One urgency per prosody tier (<= 0.4, <= 0.7, > 0.7)
+WARMUP_CONCURRENCY = 4                  # Parallel syntheses during warm-up
+SYNTHESIS_TIMEOUT = 15.0                # Seconds generate_sync waits for audio
+SDK_WORKERS = 4                         # Threads for blocking SDK calls (OpenAI client)
+
+class SharedConnector(aiohttp.TCPConnector):
+    """
+    Connection pool shared by every edge-tts call. edge-tts opens a
+    ClientSession per call and closes its connector on exit, so close() is a
+    no-op here; TTSEngine.close() releases it with shutdown().
+    """
+
+    def close(self, *, abort_ssl=False):
+        return asyncio.sleep(0)
+
+    async def shutdown(self):
+        await super().close()
+
+class AudioCache:
+    """
+    Content-addressed store for rendered speech: the key is a hash of
+    (text, voice, rate, pitch, model), so any change to the text or the
+    voice settings is a different entry. MP3s live on disk under
+    <directory>/<key[:2]>/<key>.mp3 with an in-memory LRU in front; the
+    disk copy is capped at disk_bytes, evicting least recently used files.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, memory_bytes=MEMORY_CACHE_BYTES, disk_bytes=DISK_CACHE_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> mp3 bytes, least recently used first
+        self._memory_size = 0
+        self._disk = OrderedDict()    # key -> file size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Indexes the files already on disk, oldest first, and trims them to the budget."""
+        entries = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend((entry.stat().st_mtime, entry.name[:-4], entry.stat().st_size)
+                               for entry in os.scandir(shard.path) if entry.name.endswith(".mp3"))
+        with self._lock:
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_size += size
+            evicted = self._evict_disk()
+        self._remove(evicted)
+
+    def _evict_disk(self):
+        """Drops index entries until the disk budget holds; returns their keys (call under the lock)."""
+        evicted = []
+        while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    @staticmethod
+    def key(text, voice, rate, pitch, model):
+        return hashlib.sha256("\x1f".join([text, voice, str(rate), str(pitch), model]).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _load(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        if data is not None:
+            return data
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def get(self, key):
+        return self.get_first([key])
+
+    def get_first(self, keys):
+        """Audio for the first key that is cached (one hit or miss either way)."""
+        data = next((data for data in map(self._load, keys) if data is not None), None)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def contains(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)  # Readers never see a partial file
+        self._remember(key, data)
+        with self._lock:
+            self._disk_size += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            evicted = self._evict_disk()
+        self._remove(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self._memory), "memory_bytes": self._memory_size,
+                    "disk_entries": len(self._disk), "disk_bytes": self._disk_size,
+                    "hits": self.hits, "misses": self.misses}
+
 class TTSEngine:
-    def __init__(self):
+    def __init__(self, cache_dir=None):
         # OpenAI Setup
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.use_openai = bool(self.openai_api_key)
-        
+
         if self.use_openai:
             try:
                 from openai import OpenAI
@@ -35,87 +189,193 @@ class TTSEngine:
         }
         self.default_voice = 'en-US-ChristopherNeural'
 
+        # Rendered replies, keyed by (text, voice, rate, pitch, model)
+        self.cache = AudioCache(cache_dir or DEFAULT_CACHE_DIR)
+
+        # One long-lived event loop (and connection pool) for all synthesis,
+        # instead of a new loop per request; blocking SDK calls go to a thread pool
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="tts-loop", daemon=True)
+        self._loop_thread.start()
+        self._executor = ThreadPoolExecutor(max_workers=SDK_WORKERS, thread_name_prefix="tts-sdk")
+        self._connector = self._run(self._make_connector())
+
+    async def _make_connector(self):
+        return SharedConnector(limit=0, ttl_dns_cache=300)
+
+    def _run(self, coroutine, timeout=None):
+        """Runs a coroutine on the engine's loop and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
     async def generate_audio(self, text, lang='en', urgency=0.0):
         """
         Generate TTS audio.
         Prioritizes OpenAI if available, else uses Edge TTS.
+        Any cached render is returned without synthesis (an Edge render
+        stands in for an OpenAI one that failed earlier).
         Returns base64 encoded audio string.
         """
+        renders = self._renders(text, lang, urgency)
+        # Cache reads and writes hit the disk: keep them off the shared loop
+        audio_data = await self._blocking(self.cache.get_first, [key for key, _, _ in renders])
+        for key, settings, synthesize in renders:
+            if audio_data:
+                break
+            audio_data = await synthesize(text, settings)
+            if audio_data:
+                await self._blocking(self.cache.put, key, audio_data)
+        return base64.b64encode(audio_data).decode('utf-8') if audio_data else None
+
+    async def _blocking(self, function, *args, **kwargs):
+        """Runs a blocking call (disk, SDK) on the thread pool instead of the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor,
+                                                                functools.partial(function, *args, **kwargs))
+
+    def _renders(self, text, lang, urgency):
+        """(cache key, settings, synthesize) per backend, in the order they are tried."""
+        renders = []
         if self.use_openai:
-            return await self._generate_openai(text, lang, urgency)
-        else:
-            return await self._generate_edge(text, lang, urgency)
+            renders.append((self._openai_settings(urgency), self._generate_openai))
+        renders.append((self._edge_settings(lang, urgency), self._generate_edge))
+        return [(AudioCache.key(text, **settings), settings, synthesize) for settings, synthesize in renders]
 
-    async def _generate_openai(self, text, lang, urgency):
-        try:
-            # OpenAI Voice Selection based on Urgency/Context
-            # 'onyx': Authoritative, Deep (Good for Police/High Urgency)
-            # 'shimmer': Soothing, Clear (Good for Medical/Comfort)
-            # 'alloy': Neutral, Versatile
-            
-            voice = "alloy"
-            if urgency > 0.7:
-                voice = "onyx" # Authoritative
-            elif urgency > 0.4:
-                voice = "shimmer" # Reassuring
-            
-            # Speed: 1.0 is normal. Max 4.0.
-            # Increase speed slightly for urgency
-            speed = 1.0
-            if urgency > 0.7:
-                speed = 1.15
-            elif urgency > 0.4:
-                speed = 1.05
-
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text,
-                speed=speed,
-                response_format="mp3"
-            )
-            
-            # Get binary data directly
-            audio_data = response.content
-            return base64.b64encode(audio_data).decode('utf-8')
+    def _openai_settings(self, urgency):
+        # OpenAI Voice Selection based on Urgency/Context
+        # 'onyx': Authoritative, Deep (Good for Police/High Urgency)
+        # 'shimmer': Soothing, Clear (Good for Medical/Comfort)
+        # 'alloy': Neutral, Versatile
+        voice = "alloy"
+        if urgency > 0.7:
+            voice = "onyx" # Authoritative
+        elif urgency > 0.4:
+            voice = "shimmer" # Reassuring
 
-        except Exception as e:
-            logger.error(f"OpenAI TTS failed: {e}. Falling back to Edge TTS.")
-            return await self._generate_edge(text, lang, urgency)
+        # Speed: 1.0 is normal. Max 4.0.
+        # Increase speed slightly for urgency
+        speed = 1.0
+        if urgency > 0.7:
+            speed = 1.15
+        elif urgency > 0.4:
+            speed = 1.05
 
-    async def _generate_edge(self, text, lang, urgency):
+        return {"voice": voice, "rate": speed, "pitch": "", "model": "tts-1"}
+
+    def _edge_settings(self, lang, urgency):
         voice = self.voices.get(lang, self.default_voice)
-        
+
         # Adjust prosody based on urgency
         rate = "+0%"
         pitch = "+0Hz"
-        
+
         if urgency > 0.7:
             rate = "+15%"
             pitch = "+2Hz"
         elif urgency > 0.4:
             rate = "+5%"
-        
+
+        return {"voice": voice, "rate": rate, "pitch": pitch, "model": "edge-tts"}
+
+    async def _generate_openai(self, text, settings):
         try:
-            communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
-            
-            temp_file = f"temp_tts_{os.urandom(4).hex()}.mp3"
-            await communicate.save(temp_file)
-            
-            with open(temp_file, "rb") as f:
-                audio_data = f.read()
-                
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                
-            return base64.b64encode(audio_data).decode('utf-8')
-            
+            # The SDK call blocks: run it off the event loop
+            response = await self._blocking(
+                self.client.audio.speech.create,
+                model=settings["model"],
+                voice=settings["voice"],
+                input=text,
+                speed=settings["rate"],
+                response_format="mp3"
+            )
+
+            # Get binary data directly
+            return response.content
+
+        except Exception as e:
+            logger.error(f"OpenAI TTS failed: {e}. Falling back to Edge TTS.")
+            return None
+
+    async def _generate_edge(self, text, settings):
+        try:
+            communicate = edge_tts.Communicate(text, settings["voice"], rate=settings["rate"], pitch=settings["pitch"],
+                                               connector=self._connector)
+
+            # Collect the MP3 chunks in memory (no temp file round trip)
+            chunks = []
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunks.append(chunk["data"])
+            return b"".join(chunks) or None
+
         except Exception as e:
             logger.error(f"Edge TTS Generation failed: {e}")
             return None
 
-    def generate_sync(self, text, lang='en', urgency=0.0):
+    def generate_sync(self, text, lang='en', urgency=0.0, timeout=SYNTHESIS_TIMEOUT):
         """
-        Synchronous wrapper for generate_audio
+        Synchronous wrapper for generate_audio (runs on the engine's loop).
+        Returns None if no audio is ready within timeout.
         """
-        return asyncio.run(self.generate_audio(text, lang, urgency))
+        future = asyncio.run_coroutine_threadsafe(self.generate_audio(text, lang, urgency), self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            logger.error(f"TTS timed out after {timeout}s")
+            return None
+
+    async def warm_up(self, replies, urgencies=URGENCY_TIERS):
+        """
+        Pre-renders replies into the cache. replies: {lang: [text, ...]}
+        (e.g. every response template, translated). Each text is rendered at
+        every urgency tier; renders already cached under any backend's key
+        are skipped, and texts that share a key (OpenAI voices ignore the
+        language) are rendered once.
+        Returns the number of new renders.
+        """
+        slots = asyncio.Semaphore(WARMUP_CONCURRENCY)
+        jobs = await self._blocking(self._uncached_renders, replies, urgencies)
+
+        async def render(text, lang, urgency):
+            async with slots:
+                return await self.generate_audio(text, lang, urgency) is not None
+
+        rendered = sum(await asyncio.gather(*(render(*job) for job in jobs.values())))
+        logger.info(f"🔊 TTS warm-up: {rendered}/{len(jobs)} new renders")
+        return rendered
+
+    def _uncached_renders(self, replies, urgencies):
+        """{first-choice cache key: (text, lang, urgency)} for every render not cached yet (checks the disk)."""
+        jobs = {}
+        for lang, texts in replies.items():
+            for text in set(texts):
+                for urgency in urgencies:
+                    keys = [key for key, _, _ in self._renders(text, lang, urgency)]
+                    if keys[0] not in jobs and not any(map(self.cache.contains, keys)):
+                        jobs[keys[0]] = (text, lang, urgency)
+        return jobs
+
+    def warm_up_sync(self, replies, urgencies=URGENCY_TIERS):
+        """
+        Synchronous wrapper for warm_up
+        """
+        return self._run(self.warm_up(replies, urgencies))
+
+    def close(self):
+        """Releases the connection pool and stops the loop and SDK threads."""
+        self._run(self._connector.shutdown())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Latency of uncached syntheses on the shared loop (network needed for edge-tts)
+    engine = TTSEngine(cache_dir=os.path.join(DEFAULT_CACHE_DIR, "bench"))
+    text = sys.argv[1] if len(sys.argv) > 1 else "Help is on the way. Stay on the line."
+    for i in range(3):
+        start = time.perf_counter()
+        audio = engine.generate_sync(f"{text} ({i})")
+        print(f"{(time.perf_counter() - start) * 1000:.0f} ms, {len(audio or '')} base64 chars")
+    engine.close()